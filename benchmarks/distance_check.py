@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares SlownessModel.distanceCheck with and without the partial sums.
+
+For every model the slowness model is created twice, once summing the
+layers from the surface for every distance estimate as before and once
+continuing the kept partial sums. The time spent in distanceCheck and the
+number of layers summed are printed, and the exit status is non-zero if
+the two samplings differ.
+
+Usage:
+    python benchmarks/distance_check.py [-n 3] [--max-interp-error 0.05]
+        [iasp91 ak135 ...]
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from taupy.SlownessModel import SlownessModel  # NOQA
+from taupy.TauP_Create import TauP_Create  # NOQA
+
+
+class TimedSlownessModel(SlownessModel):
+    """
+    Times distanceCheck and counts the layers summed by approxDistance.
+    """
+    usePartialSums = True
+
+    def distanceCheck(self):
+        self.layerCount = 0
+        start = time.time()
+        SlownessModel.distanceCheck(self)
+        self.distanceCheckTime = time.time() - start
+
+    def approxDistance(self, slownessTurnLayer, p, isPWave,
+                       partialSums=None):
+        if not self.usePartialSums:
+            partialSums = None
+        return SlownessModel.approxDistance(self, slownessTurnLayer, p,
+                                            isPWave, partialSums)
+
+    def layerTimeDists(self, sphericalRayParams, layerNums, isPWave):
+        self.layerCount += len(layerNums)
+        return SlownessModel.layerTimeDists(self, sphericalRayParams,
+                                            layerNums, isPWave)
+
+
+class FullSumSlownessModel(TimedSlownessModel):
+    usePartialSums = False
+
+
+def create(cls, vMod, create):
+    return cls(vMod, create.min_delta_p, create.max_delta_p,
+               create.max_depth_interval,
+               create.max_range_interval * 3.141592653589793 / 180.0,
+               create.max_interp_error, create.allow_inner_core_s,
+               SlownessModel.DEFAULT_SLOWNESS_TOLERANCE)
+
+
+def layers(sMod):
+    return [[(l.topP, l.topDepth, l.botP, l.botDepth) for l in ls]
+            for ls in (sMod.PLayers, sMod.SLayers)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("models", nargs="*", default=["iasp91", "ak135"])
+    parser.add_argument("-n", "--runs", type=int, default=3)
+    parser.add_argument("--max-interp-error", type=float, default=0.05)
+    args = parser.parse_args()
+
+    identical = True
+    print("%-10s %-12s %10s %12s %8s" % ("model", "sums", "time [s]",
+                                         "layers", "samples"))
+    for model in args.models:
+        filename = model
+        if not os.path.exists(filename):
+            filename = os.path.join(ROOT, "taupy", "data", model + ".tvel")
+        tauPCreate = TauP_Create(input_filename=filename,
+                                 output_filename=None,
+                                 max_interp_error=args.max_interp_error)
+        vMod = tauPCreate.loadVMod()
+        results = {}
+        for name, cls in [("full", FullSumSlownessModel),
+                          ("partial", TimedSlownessModel)]:
+            runs = [create(cls, vMod, tauPCreate) for _ in range(args.runs)]
+            best = min(sMod.distanceCheckTime for sMod in runs)
+            sMod = runs[0]
+            results[name] = (best, sMod)
+            print("%-10s %-12s %10.3f %12i %8i" % (
+                model, name, best, sMod.layerCount,
+                len(sMod.PLayers) + len(sMod.SLayers)))
+        same = layers(results["full"][1]) == layers(results["partial"][1])
+        identical &= same
+        print("%-10s speed-up %.2fx, identical sampling: %s" % (
+            model, results["full"][0] / results["partial"][0], same))
+    return 0 if identical else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
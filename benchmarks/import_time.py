@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Records the cold start cost of ``import taupy.tau`` with ``-X importtime``.
+
+Every run imports the module in a fresh interpreter. The median cumulative
+import time of each module is written to a JSON file, so runs can be
+compared over time, and the slowest modules are printed. The exit status is
+non-zero if the median time of ``taupy.tau`` exceeds the budget.
+
+Usage:
+    python benchmarks/import_time.py [-n 10] [-o import_time.json]
+        [--budget-ms 250] [--module taupy.tau]
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Budget for the median cumulative import time of taupy.tau in ms, also
+# checked, with a margin, by taupy/tests/test_import_time.py.
+BUDGET_MS = 250.0
+
+
+def import_times(module):
+    """
+    Imports module in a fresh interpreter and returns a dictionary mapping
+    each imported module to its self and cumulative import time in µs.
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    # Bytecode caching makes the numbers depend on earlier runs.
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    out = subprocess.Popen(
+        [sys.executable, "-X", "importtime", "-c", "import " + module],
+        env=env, stderr=subprocess.PIPE,
+        universal_newlines=True).communicate()[1]
+    times = {}
+    for line in out.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        if not own.strip().isdigit():
+            # The header line.
+            continue
+        times[name.strip()] = (int(own), int(cumulative))
+    return times
+
+
+def median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    if len(values) % 2:
+        return values[mid]
+    return (values[mid - 1] + values[mid]) / 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("-n", "--runs", type=int, default=10)
+    parser.add_argument("-o", "--output", default="import_time.json")
+    parser.add_argument("--module", default="taupy.tau")
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    # One warm up run so every later run finds the compiled bytecode.
+    import_times(args.module)
+    runs = [import_times(args.module) for _ in range(args.runs)]
+    names = set().union(*runs)
+    result = {}
+    for name in names:
+        samples = [r[name] for r in runs if name in r]
+        result[name] = {"self_us": median([s[0] for s in samples]),
+                        "cumulative_us": median([s[1] for s in samples])}
+    total = result[args.module]["cumulative_us"] / 1000
+    report = {"module": args.module, "runs": args.runs,
+              "python": sys.version.split()[0], "total_ms": total,
+              "budget_ms": args.budget_ms, "modules": result}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1, sort_keys=True)
+
+    print("%-40s %10s %10s" % ("module", "self [ms]", "cum. [ms]"))
+    for name in sorted(result, key=lambda n: -result[n]["cumulative_us"])[
+            :args.top]:
+        print("%-40s %10.2f %10.2f" % (name, result[name]["self_us"] / 1000,
+                                       result[name]["cumulative_us"] / 1000))
+    print("\nimport %s: %.1f ms (budget %.1f ms), written to %s" % (
+        args.module, total, args.budget_ms, args.output))
+    return 0 if total <= args.budget_ms else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
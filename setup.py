@@ -24,24 +24,28 @@ ROOT = os.path.dirname(os.path.abspath(inspect.getfile(
 
 def build_models():
     """
-    Builds the models during install time. This is needed as the models are
-    pickled Python classes which are not compatible across Python versions.
+    Builds the models during install time. They are stored together in a
+    single bundle in the version independent array format, see
+    taupy.model_bundle.
     """
     taupy_path = os.path.join(ROOT, "taupy")
     model_input = os.path.join(taupy_path, "data")
 
     sys.path.insert(0, ROOT)
     from taupy.TauP_Create import TauP_Create
-    from taupy.utils import _get_model_filename
+    from taupy.model_bundle import write_bundle
+    from taupy.utils import _get_bundle_filename
 
+    models = []
     for model in glob.glob(os.path.join(model_input, "*.tvel")):
         print("Building model '%s'..." % model)
         sys.stdout.flush()
-        output_filename = _get_model_filename(model)
-        mod_create = TauP_Create(input_filename=model,
-                                 output_filename=output_filename)
-        mod_create.loadVMod()
-        mod_create.run()
+        mod_create = TauP_Create(input_filename=model, output_filename=None)
+        models.append(mod_create.createTauModel(mod_create.loadVMod()))
+    output_filename = _get_bundle_filename()
+    if not os.path.exists(os.path.dirname(output_filename)):
+        os.makedirs(os.path.dirname(output_filename))
+    write_bundle(models, output_filename)
 
 
 setup_config = dict(
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from future.builtins import *
+
+from collections import OrderedDict
+import os
+import threading
+
+from taupy.model_bundle import read_toc
+from taupy.TauModelLoader import find_model, load
+
+
+class ModelPool(object):
+    """
+    Process wide cache of loaded TauModels with a memory budget.
+
+    Models are keyed by the resolved path and modification time of their
+    file (and their name for bundled models), so a rebuilt model file is
+    picked up on the next request. When the total size of the pooled models
+    exceeds max_bytes, the least recently used models are dropped from the
+    pool. The size of a model is taken to be the size of its file or bundle
+    record. This is only an approximation of the memory it takes: it counts
+    the bytes read or memory mapped from the file, but not the Python
+    objects built from them, e.g. of unpickled models or the layers array
+    models create lazily, which can take several times as much.
+    """
+    def __init__(self, max_bytes=256 * 1024 ** 2):
+        """
+        :param max_bytes: Budget of the pool in bytes of model files, see
+            above. None means no limit.
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._models = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._models)
+
+    def __contains__(self, model_name):
+        return self._key(model_name, False) in self._models \
+            or self._key(model_name, True) in self._models
+
+    @staticmethod
+    def _key(model_name, mmap):
+        filename, bundled = find_model(model_name)
+        filename = os.path.realpath(filename)
+        try:
+            mtime = os.stat(filename).st_mtime
+        except OSError:
+            mtime = None
+        return filename, bundled, mtime, mmap
+
+    @staticmethod
+    def _size(key):
+        if key[1] is not None:
+            return read_toc(key[0])[key[1]]["size"]
+        return os.path.getsize(key[0])
+
+    def get(self, model_name, mmap=False):
+        """
+        Returns the TauModel for model_name, loading it if it is not pooled
+        yet. Arguments are the same as for TauModelLoader.load.
+        """
+        key = self._key(model_name, mmap)
+        with self._lock:
+            if key in self._models:
+                self.hits += 1
+                # Move to the end, i.e. mark as most recently used.
+                self._models[key] = self._models.pop(key)
+                return self._models[key][0]
+            self.misses += 1
+        # Load outside of the lock so other models stay available meanwhile.
+        tMod = load(model_name, mmap=mmap)
+        size = self._size(key)
+        with self._lock:
+            if key in self._models:
+                # Somebody else was faster.
+                return self._models[key][0]
+            # Drop entries for older versions of the same file.
+            for oldKey in [k for k in self._models
+                           if k[:2] == key[:2] and k[3] == mmap]:
+                self._remove(oldKey)
+            if self.max_bytes is None or size <= self.max_bytes:
+                self._models[key] = (tMod, size)
+                self.nbytes += size
+                self._evict()
+        return tMod
+
+    def reload(self, model_name, mmap=False):
+        """
+        Loads model_name again even if its file is unchanged and replaces
+        the pooled model with it. Returns the new TauModel. The old one is
+        left as it is for whoever still uses it.
+        """
+        key = self._key(model_name, mmap)
+        tMod = load(model_name, mmap=mmap)
+        size = self._size(key)
+        with self._lock:
+            self.misses += 1
+            for oldKey in [k for k in self._models
+                           if k[:2] == key[:2] and k[3] == mmap]:
+                self._remove(oldKey)
+            if self.max_bytes is None or size <= self.max_bytes:
+                self._models[key] = (tMod, size)
+                self.nbytes += size
+                self._evict()
+        return tMod
+
+    def _remove(self, key):
+        self.nbytes -= self._models.pop(key)[1]
+
+    def _evict(self):
+        while self.max_bytes is not None and self.nbytes > self.max_bytes:
+            self._remove(next(iter(self._models)))
+            self.evictions += 1
+
+    def resize(self, max_bytes):
+        """
+        Changes the memory budget, evicting models if necessary.
+        """
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        """
+        Drops all models and resets the counters.
+        """
+        with self._lock:
+            self._models.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """
+        Returns a dictionary with the hit, miss and eviction counts, the
+        number of pooled models and their total size.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "models": len(self._models),
+                    "nbytes": self.nbytes, "max_bytes": self.max_bytes}
+
+
+# The pool used by TauPyModel.
+default_pool = ModelPool()
@@ -621,7 +621,7 @@ class SeismicPhase(object):
         if self.maxRayParamIndex == 0 \
                 and self.minRayParamIndex == len(tMod.rayParams) - 1:
             # All ray parameters are valid so just copy:
-            self.rayParams = deepcopy(tMod.rayParams)
+            self.rayParams = list(tMod.rayParams)
         elif self.maxRayParamIndex == self.minRayParamIndex:
             # if "Sdiff" in self.name or "Pdiff" in self.name:
             # self.rayParams = [self.minRayParam, self.minRayParam]
@@ -633,7 +633,7 @@ class SeismicPhase(object):
                 self.rayParams = [self.minRayParam, self.minRayParam]
         else:
             # Only a subset of the ray parameters is valid so use these.
-            self.rayParams = deepcopy(
+            self.rayParams = list(
                 tMod.rayParams[self.maxRayParamIndex:
                 self.minRayParamIndex + 1])
         self.dist = [0 for i in range(len(self.rayParams))]
@@ -648,20 +648,26 @@ class SeismicPhase(object):
                 timesBranches[0][bs] += 1
             else:
                 timesBranches[1][bs] += 1
-        # Sum the branches with the appropriate multiplier.
+        # Sum the branches with the appropriate multiplier. The branch
+        # tables might be stored in reduced precision (see
+        # taupy.model_arrays), so always sum in double precision.
         for tb, tbs, taub, taubs in zip(timesBranches[0], timesBranches[1],
                                         tMod.tauBranches[0],
                                         tMod.tauBranches[1]):
             if tb != 0:
                 for i in range(self.maxRayParamIndex,
                                self.minRayParamIndex + 1):
-                    self.dist[i - self.maxRayParamIndex] += tb * taub.dist[i]
-                    self.time[i - self.maxRayParamIndex] += tb * taub.time[i]
+                    self.dist[i - self.maxRayParamIndex] += \
+                        tb * float(taub.dist[i])
+                    self.time[i - self.maxRayParamIndex] += \
+                        tb * float(taub.time[i])
             if tbs != 0:
                 for i in range(self.maxRayParamIndex,
                                self.minRayParamIndex + 1):
-                    self.dist[i - self.maxRayParamIndex] += tbs * taubs.dist[i]
-                    self.time[i - self.maxRayParamIndex] += tbs * taubs.time[i]
+                    self.dist[i - self.maxRayParamIndex] += \
+                        tbs * float(taubs.dist[i])
+                    self.time[i - self.maxRayParamIndex] += \
+                        tbs * float(taubs.time[i])
         if "Sdiff" in self.name or "Pdiff" in self.name:
             if tMod.sMod.depthInHighSlowness(tMod.cmbDepth - 1e-10,
                                              self.minRayParam,
@@ -729,19 +735,19 @@ class SeismicPhase(object):
                                                         tMod.tauBranches[0],
                                                         tMod.tauBranches[1]):
                             if tb != 0 and taub.topDepth < hszi.topDepth:
-                                newdist[hszIndex] += tb * taub.dist[
+                                newdist[hszIndex] += tb * float(taub.dist[
                                     self.maxRayParamIndex + hszIndex -
-                                    indexOffset]
-                                newtime[hszIndex] += tb * taub.time[
+                                    indexOffset])
+                                newtime[hszIndex] += tb * float(taub.time[
                                     self.maxRayParamIndex + hszIndex -
-                                    indexOffset]
+                                    indexOffset])
                             if tbs != 0 and taubs.topDepth < hszi.topDepth:
-                                newdist[hszIndex] += tbs * taubs.dist[
+                                newdist[hszIndex] += tbs * float(taubs.dist[
                                     self.maxRayParamIndex + hszIndex -
-                                    indexOffset]
-                                newtime[hszIndex] += tbs * taubs.time[
+                                    indexOffset])
+                                newtime[hszIndex] += tbs * float(taubs.time[
                                     self.maxRayParamIndex + hszIndex -
-                                    indexOffset]
+                                    indexOffset])
                         newdist += self.dist[hszIndex:]
                         newtime += self.time[hszIndex:]
                         newrayParams += self.rayParams[hszIndex:]
@@ -221,3 +221,443 @@ def create_from_vlayer(vLayer, isPWave, radiusOfEarth=6371,
     else:
         raise NotImplementedError("no flat models yet")
     return SlownessLayer(topP, topDepth, botP, botDepth)
+
+
+def bullen_radial_slowness(topP, topDepth, botP, botDepth, p, radiusOfEarth):
+    """
+    Vectorised form of SlownessLayer.bullenRadialSlowness. The layers are
+    given by arrays of their top and bottom slowness and depth, which are
+    broadcast against the array of ray parameters p, so e.g. p[:, None]
+    gives one row per ray parameter. Returns arrays of the time and
+    distance (in radians) increments.
+    """
+    topP, topDepth, botP, botDepth, p = np.broadcast_arrays(
+        *[np.asarray(a, dtype=np.float64)
+          for a in (topP, topDepth, botP, botDepth, p)])
+    time = np.zeros(p.shape)
+    distRadian = np.zeros(p.shape)
+    # Zero thickness layers and layers thinner than e.g. 1 micron give 0.
+    thick = ~(botDepth - topDepth < 0.000000001)
+    topP, topDepth, botP, botDepth, p = [
+        a[thick] for a in (topP, topDepth, botP, botDepth, p)]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        B = np.log(topP / botP) / np.log((radiusOfEarth - topDepth) /
+                                         (radiusOfEarth - botDepth))
+        sqrtTopTopMpp = np.sqrt(topP * topP - p * p)
+        sqrtBotBotMpp = np.sqrt(botP * botP - p * p)
+        distRadian[thick] = (np.arctan2(p, sqrtBotBotMpp) -
+                             np.arctan2(p, sqrtTopTopMpp)) / B
+        time[thick] = (sqrtTopTopMpp - sqrtBotBotMpp) / B
+    if not (np.all(distRadian >= 0) and np.all(time >= 0)):
+        raise SlownessModelError("timedist.time or .distRadian < 0 or Nan")
+    return time, distRadian
+
+
+def layer_time_dist(topP, topDepth, botP, botDepth, p, radiusOfEarth,
+                    slownessTolerance):
+    """
+    Vectorised form of SlownessModel.layerTimeDist, broadcasting the layers
+    against the ray parameters as bullen_radial_slowness does. It handles
+    the same cases: zero thickness layers, the layer containing the centre
+    of the Earth, constant velocity layers and else the Bullen law. Unlike
+    SlownessModel.layerTimeDist, it can't check that a layer at the centre
+    of the Earth is the last one. Returns arrays of the time and distance
+    (in radians) increments.
+    """
+    topP, topDepth, botP, botDepth, p = np.broadcast_arrays(
+        *[np.asarray(a, dtype=np.float64)
+          for a in (topP, topDepth, botP, botDepth, p)])
+    if np.any(p > np.maximum(topP, botP)):
+        raise SlownessModelError("Ray cannot propagate within this layer, "
+                                 "given ray param too large.")
+    if np.any(p < 0):
+        raise SlownessModelError("Ray parameter must not be negative!")
+    if np.any(p > np.minimum(topP, botP)):
+        raise SlownessModelError("Ray turns in the middle of this layer!")
+    time = np.zeros(p.shape)
+    distRadian = np.zeros(p.shape)
+    topRadius = radiusOfEarth - topDepth
+    botRadius = radiusOfEarth - botDepth
+    todo = topDepth != botDepth
+
+    # The centre of the Earth, see SlownessModel.layerTimeDist.
+    centre = todo & (p == 0) & (botDepth == radiusOfEarth)
+    distRadian[centre] = math.pi / 2
+    time[centre] = topP[centre]
+    if not np.all(time[centre] >= 0):
+        raise SlownessModelError("Centre of Earth timeDist < 0 or NaN.")
+    todo &= ~centre
+
+    # Constant velocity layers.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        constant = todo & (np.abs(topRadius / topP - botRadius / botP) <
+                           slownessTolerance)
+    if np.any(constant):
+        cTopRadius = topRadius[constant]
+        cBotRadius = botRadius[constant]
+        cP = p[constant]
+        vel = cBotRadius / botP[constant]
+        topTerm = cTopRadius * cTopRadius - cP * cP * vel * vel
+        topTerm[np.abs(topTerm) < slownessTolerance] = 0
+        # A ray turning at the bottom of the layer, see
+        # SlownessModel.layerTimeDist.
+        botTerm = np.where(cP == botP[constant], 0,
+                           cBotRadius * cBotRadius - cP * cP * vel * vel)
+        with np.errstate(invalid='ignore'):
+            b = np.sqrt(topTerm) - np.sqrt(botTerm)
+            time[constant] = b / vel
+            distRadian[constant] = np.arcsin(b * cP * vel /
+                                             (cTopRadius * cBotRadius))
+        if not (np.all(time[constant] >= 0) and
+                np.all(distRadian[constant] >= 0)):
+            raise SlownessModelError(
+                "Constant velocity layer timeDist < 0 or NaN.")
+    todo &= ~constant
+
+    if np.any(todo):
+        time[todo], distRadian[todo] = bullen_radial_slowness(
+            topP[todo], topDepth[todo], botP[todo], botDepth[todo], p[todo],
+            radiusOfEarth)
+    return time, distRadian
+
+
+class SlownessLayerList(list):
+    """
+    List of SlownessLayers, ordered by depth as in a SlownessModel, that
+    finds the layers containing a ray parameter or the position of a layer
+    with binary searches instead of walking the whole list.
+
+    The layers are divided into runs in which the slowness is monotonic and
+    continuous, so within a run at most one layer strictly contains a given
+    ray parameter. The runs and an array of the layers, see getArray, are
+    cached; splitting a layer with split() keeps them up to date, any other
+    change to the list discards them.
+    SlownessLayers themselves are never modified in place, so the cache can
+    not go stale otherwise.
+    """
+    def __init__(self, *args):
+        list.__init__(self, *args)
+        self._runs = None
+        self._array = None
+
+    def __reduce__(self):
+        # Don't store the cache.
+        return self.__class__, (list(self),)
+
+    def _invalidate(self):
+        self._runs = None
+        self._array = None
+
+    def getArray(self):
+        """
+        Returns the topP, topDepth, botP and botDepth of the layers as the
+        columns of an array, e.g. for taupy.SlownessLayer.layer_time_dist.
+        The array is cached and must not be modified.
+        """
+        if self._array is None:
+            self._array = np.array(
+                [(layer.topP, layer.topDepth, layer.botP, layer.botDepth)
+                 for layer in self], dtype=np.float64).reshape(-1, 4)
+        return self._array
+
+    def _getRuns(self):
+        """
+        Returns the runs as a list of [start, stop, direction], where the
+        layers start to stop - 1 connect at their boundaries and the slowness
+        decreases with depth if direction is 1, increases if it is -1 and is
+        constant if it is 0.
+        """
+        if self._runs is not None:
+            return self._runs
+        runs = []
+        prevLayer = None
+        for i, layer in enumerate(self):
+            direction = (int(layer.topP > layer.botP) -
+                         int(layer.topP < layer.botP))
+            if prevLayer is None or layer.topP != prevLayer.botP or (
+                    direction and runs[-1][2] and direction != runs[-1][2]):
+                runs.append([i, i + 1, direction])
+            else:
+                runs[-1][1] = i + 1
+                if direction and not runs[-1][2]:
+                    runs[-1][2] = direction
+            prevLayer = layer
+        self._runs = runs
+        return runs
+
+    def findSlowness(self, p):
+        """
+        Returns the indices, in increasing order, of all layers that strictly
+        contain the ray parameter p, i.e. (topP - p) * (p - botP) > 0.
+        """
+        found = []
+        for start, stop, direction in self._getRuns():
+            # Within a run, the slowness at the boundaries is monotonic, so
+            # bisect for the first boundary beyond p. Boundary k is the top
+            # of layer k and the bottom of layer k - 1.
+            if not direction \
+                    or direction * (self[start].topP - p) <= 0 \
+                    or direction * (p - self[stop - 1].botP) <= 0:
+                continue
+            low = start
+            high = stop - 1
+            while low < high:
+                mid = (low + high) // 2
+                if direction * (self[mid].botP - p) < 0:
+                    high = mid
+                else:
+                    low = mid + 1
+            layer = self[low]
+            if (layer.topP - p) * (p - layer.botP) > 0:
+                found.append(low)
+        found.sort()
+        return found
+
+    def index(self, layer, *args):
+        """
+        Returns the index of the given layer itself, searching only the
+        layers at its depth. SlownessLayers don't define equality, so this is
+        the same as list.index.
+        """
+        if args:
+            return list.index(self, layer, *args)
+        low = 0
+        high = len(self)
+        while low < high:
+            mid = (low + high) // 2
+            if self[mid].botDepth < layer.topDepth:
+                low = mid + 1
+            else:
+                high = mid
+        while low < len(self) and self[low].topDepth <= layer.botDepth:
+            if self[low] is layer:
+                return low
+            low += 1
+        raise ValueError("SlownessLayer is not in list")
+
+    def split(self, i, topLayer, botLayer):
+        """
+        Replaces layer i by topLayer and botLayer, which must divide it at a
+        ray parameter strictly between its top and bottom slowness.
+        """
+        list.__setitem__(self, i, botLayer)
+        list.insert(self, i, topLayer)
+        if self._array is not None:
+            self._array = np.insert(self._array, i, [
+                (topLayer.topP, topLayer.topDepth, topLayer.botP,
+                 topLayer.botDepth)], axis=0)
+            self._array[i + 1] = (botLayer.topP, botLayer.topDepth,
+                                  botLayer.botP, botLayer.botDepth)
+        if self._runs is not None:
+            for run in self._runs:
+                if run[1] > i:
+                    run[1] += 1
+                    if run[0] > i:
+                        run[0] += 1
+
+    def __setitem__(self, *args):
+        self._invalidate()
+        return list.__setitem__(self, *args)
+
+    def __delitem__(self, *args):
+        self._invalidate()
+        return list.__delitem__(self, *args)
+
+    def __setslice__(self, *args):
+        self._invalidate()
+        return list.__setslice__(self, *args)
+
+    def __delslice__(self, *args):
+        self._invalidate()
+        return list.__delslice__(self, *args)
+
+    def __iadd__(self, *args):
+        self._invalidate()
+        return list.__iadd__(self, *args)
+
+    def __imul__(self, *args):
+        self._invalidate()
+        return list.__imul__(self, *args)
+
+    def append(self, *args):
+        self._invalidate()
+        return list.append(self, *args)
+
+    def extend(self, *args):
+        self._invalidate()
+        return list.extend(self, *args)
+
+    def insert(self, *args):
+        self._invalidate()
+        return list.insert(self, *args)
+
+    def pop(self, *args):
+        self._invalidate()
+        return list.pop(self, *args)
+
+    def remove(self, *args):
+        self._invalidate()
+        return list.remove(self, *args)
+
+    def reverse(self, *args):
+        self._invalidate()
+        return list.reverse(self, *args)
+
+    def sort(self, *args, **kwargs):
+        self._invalidate()
+        return list.sort(self, *args, **kwargs)
+
+    def clear(self):
+        self._invalidate()
+        return list.__delitem__(self, slice(None))
+
+
+class SlownessLayerArray(object):
+    """
+    Alternative to SlownessLayerList that stores the topP, topDepth, botP
+    and botDepth of the layers as the columns of a single array, see
+    getArray, instead of one SlownessLayer object per layer. This takes
+    less memory and makes copies and bulk operations cheap, and the
+    vectorised methods of SlownessModel use the array directly.
+
+    Indexing and iterating create SlownessLayers on the fly, so code
+    written for lists of layers keeps working, but they are new objects
+    every time. Layers are therefore identified by their values, e.g. by
+    index and in. In fluids, the P and S layers of a SlownessModel are the
+    same objects in lists; in arrays they are the same values instead.
+    """
+    def __init__(self, layers=()):
+        if isinstance(layers, np.ndarray):
+            # Used as it is, it's only copied before changing it in place.
+            self._array = np.asarray(layers, dtype=np.float64).reshape(-1, 4)
+        elif isinstance(layers, (SlownessLayerArray, SlownessLayerList)):
+            self._array = layers.getArray().copy()
+        else:
+            self._array = np.array(
+                [(layer.topP, layer.topDepth, layer.botP, layer.botDepth)
+                 for layer in layers], dtype=np.float64).reshape(-1, 4)
+
+    def __reduce__(self):
+        return self.__class__, (self._array,)
+
+    def __copy__(self):
+        return self.__class__(self._array.copy())
+
+    def __deepcopy__(self, memo):
+        return self.__copy__()
+
+    def getArray(self):
+        """
+        Returns the topP, topDepth, botP and botDepth of the layers as the
+        columns of an array. This is the storage of the layers itself and
+        must not be modified.
+        """
+        return self._array
+
+    @property
+    def topP(self):
+        return self._array[:, 0]
+
+    @property
+    def topDepth(self):
+        return self._array[:, 1]
+
+    @property
+    def botP(self):
+        return self._array[:, 2]
+
+    @property
+    def botDepth(self):
+        return self._array[:, 3]
+
+    @staticmethod
+    def _row(layer):
+        return (layer.topP, layer.topDepth, layer.botP, layer.botDepth)
+
+    def __len__(self):
+        return len(self._array)
+
+    def __iter__(self):
+        for row in self._array.tolist():
+            yield SlownessLayer(*row)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self.__class__(self._array[i].copy())
+        return SlownessLayer(*self._array[i].tolist())
+
+    def __setitem__(self, i, layer):
+        if not self._array.flags.writeable:
+            self._array = self._array.copy()
+        self._array[i] = self._row(layer)
+
+    def __delitem__(self, i):
+        self._array = np.delete(self._array, i, axis=0)
+
+    def __contains__(self, layer):
+        try:
+            self.index(layer)
+        except ValueError:
+            return False
+        return True
+
+    def __add__(self, other):
+        return self.__class__(np.concatenate(
+            [self._array, self.__class__(other).getArray()]))
+
+    def insert(self, i, layer):
+        if i < 0:
+            i = max(len(self._array) + i, 0)
+        self._array = np.insert(self._array, min(i, len(self._array)),
+                                [self._row(layer)], axis=0)
+
+    def append(self, layer):
+        self.insert(len(self._array), layer)
+
+    def pop(self, i=-1):
+        layer = self[i]
+        del self[i]
+        return layer
+
+    def index(self, layer, start=0, stop=None):
+        """
+        Returns the index of the first layer with the same values as the
+        given one.
+        """
+        start, stop, _ = slice(start, stop).indices(len(self._array))
+        found = np.flatnonzero(
+            (self._array[start:stop] == self._row(layer)).all(axis=1))
+        if not len(found):
+            raise ValueError("SlownessLayer is not in array")
+        return start + int(found[0])
+
+    def findSlowness(self, p):
+        """
+        Returns the indices, in increasing order, of all layers that strictly
+        contain the ray parameter p, i.e. (topP - p) * (p - botP) > 0.
+        """
+        return np.flatnonzero((self.topP - p) * (p - self.botP) > 0).tolist()
+
+    def split(self, i, topLayer, botLayer):
+        """
+        Replaces layer i by topLayer and botLayer.
+        """
+        self._array = np.insert(self._array, i, [self._row(topLayer)],
+                                axis=0)
+        self._array[i + 1] = self._row(botLayer)
+
+
+def shared_layers(PLayers, SLayers):
+    """
+    Returns, for every S layer, the index of the P layer it is shared with
+    in a fluid or -1. Layers are shared if they are the same objects, or,
+    in SlownessLayerArrays, have the same values.
+    """
+    if isinstance(PLayers, SlownessLayerArray) \
+            or isinstance(SLayers, SlownessLayerArray):
+        pIndex = dict((tuple(row), i) for i, row in reversed(list(
+            enumerate(SlownessLayerArray(PLayers).getArray().tolist()))))
+        return [pIndex.get(tuple(row), -1)
+                for row in SlownessLayerArray(SLayers).getArray().tolist()]
+    pIndex = dict((id(l), i) for i, l in enumerate(PLayers))
+    return [pIndex.get(id(l), -1) for l in SLayers]
@@ -5,13 +5,15 @@ from __future__ import (absolute_import, division, print_function,
 from future.builtins import *
 from math import pi
 import math
-from decimal import *
 import numpy as np
 from taupy.VelocityLayer import VelocityLayer
-from taupy.SlownessLayer import SlownessLayer, create_from_vlayer
+from taupy.SlownessLayer import SlownessLayer, SlownessLayerArray, \
+    SlownessLayerList, create_from_vlayer, layer_time_dist, shared_layers
 from taupy.helper_classes import DepthRange, CriticalDepth, TimeDist, \
     SlownessModelError, SplitLayerInfo
-from copy import deepcopy
+from collections import OrderedDict
+from copy import copy, deepcopy
+import time
 
 
 class SlownessModel(object):
@@ -40,6 +42,13 @@ class SlownessModel(object):
     fluidLayerDepths = []
     PLayers = []
     SLayers = []
+    # Timings and counters of createSample if it was asked to record them,
+    # see createSample.
+    report = None
+    # The counters while createSample records them.
+    _counts = None
+    # Sample for maxInterpError only, see createSample.
+    minimal = False
     # For methods that have an isPWave parameter
     SWAVE = False
     PWAVE = True
@@ -47,7 +56,14 @@ class SlownessModel(object):
     def __init__(self, vMod, minDeltaP=0.1, maxDeltaP=11, maxDepthInterval=115,
                  maxRangeInterval=2.5 * pi / 180, maxInterpError=0.05,
                  allowInnerCoreS=True,
-                 slowness_tolerance=DEFAULT_SLOWNESS_TOLERANCE):
+                 slowness_tolerance=DEFAULT_SLOWNESS_TOLERANCE, report=False,
+                 minimal=False):
+        """
+        :param report: Record timings and counters of the sampling, see
+            createSample.
+        :param minimal: Sample only as densely as maxInterpError requires,
+            see createSample.
+        """
 
         self.vMod = vMod
         self.minDeltaP = minDeltaP
@@ -57,7 +73,8 @@ class SlownessModel(object):
         self.maxInterpError = maxInterpError
         self.allowInnerCoreS = allowInnerCoreS
         self.slowness_tolerance = slowness_tolerance
-        self.createSample()
+        self.minimal = minimal
+        self.createSample(report)
 
     def __str__(self):
         desc = (
@@ -98,13 +115,54 @@ class SlownessModel(object):
             desc += str(l) + "\n"
         return desc
 
-    def createSample(self):
+    def createSample(self, report=False):
         """
         This method takes a velocity model and creates a vector containing
         slowness-depth layers that, hopefully, adequately sample both slowness
         and depth so that the travel time as a function of distance can be
         reconstructed from the theta function.
+
+        If minimal is True, the fixed increments maxDeltaP and
+        maxDepthInterval are not enforced, i.e. rayParamIncCheck and
+        depthIncCheck are skipped, so the sampling is only refined by
+        distanceCheck. Afterwards, removeRedundantSamples removes the samples
+        that are not needed to stay within maxInterpError and
+        maxRangeInterval. This gives fewer ray parameters, and so a smaller
+        and faster TauModel, for the same error budget.
+
+        :param report: If True, the report attribute is set to an
+            OrderedDict with the wall "times" in seconds of the stages of
+            the sampling, the number of "calls" of addSlowness and
+            approxDistance, the number of "layer_splits" and of
+            "removed_samples" and the final numbers of "p_layers" and
+            "s_layers".
+        """
+        self.report = None
+        if report:
+            self.report = OrderedDict([
+                ("times", OrderedDict()),
+                ("calls", OrderedDict([("addSlowness", 0),
+                                       ("approxDistance", 0)])),
+                ("layer_splits", 0), ("removed_samples", 0)])
+            self._counts = self.report
+        try:
+            self._createSample()
+        finally:
+            self._counts = None
+        if report:
+            self.report["p_layers"] = len(self.PLayers)
+            self.report["s_layers"] = len(self.SLayers)
+
+    def _runStage(self, name):
+        """
+        Runs the method of the given name, timing it for the report.
         """
+        start = time.time()
+        getattr(self, name)()
+        if self._counts is not None:
+            self._counts["times"][name] = time.time() - start
+
+    def _createSample(self):
         # Some checks on the velocity model
         if self.vMod.validate() is False:
             raise SlownessModelError(
@@ -123,24 +181,29 @@ class SlownessModel(object):
 
         if self.DEBUG:
             print("findCriticalPoints")
-        self.findCriticalPoints()
+        self._runStage("findCriticalPoints")
         if self.DEBUG:
             print("coarseSample")
-        self.coarseSample()
+        self._runStage("coarseSample")
         if self.DEBUG and self.validate() is False:
             raise (SlownessModelError('validate failed after coarseSample'))
-        if self.DEBUG:
-            print("rayParamCheck")
-        self.rayParamIncCheck()
-        if self.DEBUG:
-            print("depthIncCheck")
-        self.depthIncCheck()
+        if not self.minimal:
+            if self.DEBUG:
+                print("rayParamCheck")
+            self._runStage("rayParamIncCheck")
+            if self.DEBUG:
+                print("depthIncCheck")
+            self._runStage("depthIncCheck")
         if self.DEBUG:
             print("distanceCheck")
-        self.distanceCheck()
+        self._runStage("distanceCheck")
+        if self.minimal:
+            if self.DEBUG:
+                print("removeRedundantSamples")
+            self._runStage("removeRedundantSamples")
         if self.DEBUG:
             print("fixCriticalPoints")
-        self.fixCriticalPoints()
+        self._runStage("fixCriticalPoints")
 
         if self.validate() is True:
             if self.DEBUG:
@@ -148,6 +211,155 @@ class SlownessModel(object):
         else:
             raise SlownessModelError('SlownessModel.validate failed!')
 
+    def resample(self, vMod):
+        """
+        Returns a slowness model of vMod, a perturbed version of the velocity
+        model of this one, that keeps the slowness layers of the velocity
+        layers both models have in common at the top and at the bottom.
+
+        Only the velocity layers in between are sampled anew, at the ray
+        parameters of this model as well. Ray parameters they introduce
+        are added to the whole model, and the usual checks are made again
+        on the result, so it satisfies the same criteria as a model created
+        from scratch. The sampling is usually somewhat finer than that of a
+        model created from scratch, though. This model is not modified.
+        Models with a different radius or inner core boundary are created
+        from scratch, as are models whose critical depths outside of the
+        perturbed layers or whose high slowness zones or fluid layers above
+        them differ.
+        """
+        if isinstance(self.PLayers, SlownessLayerArray):
+            # The sampling relies on the layers shared by P and S in fluids
+            # being the same objects.
+            sMod = copy(self)
+            sMod.useLayerArrays(False)
+            sMod = sMod.resample(vMod)
+            sMod.useLayerArrays()
+            return sMod
+        oldLayers = self.vMod.layers
+        newLayers = vMod.layers
+        numCommon = min(len(oldLayers), len(newLayers))
+        top = 0
+        while top < numCommon and _same_layer(oldLayers[top],
+                                              newLayers[top]):
+            top += 1
+        bot = 0
+        while bot < numCommon - top and _same_layer(oldLayers[-1 - bot],
+                                                    newLayers[-1 - bot]):
+            bot += 1
+        sMod = copy(self)
+        sMod.vMod = vMod
+        sMod.report = None
+        if top == len(oldLayers) == len(newLayers) \
+                and vMod.radiusOfEarth == self.vMod.radiusOfEarth \
+                and vMod.iocbDepth == self.vMod.iocbDepth:
+            # Nothing has changed.
+            sMod.PLayers = SlownessLayerList(self.PLayers)
+            sMod.SLayers = SlownessLayerList(self.SLayers)
+            sMod.criticalDepths = deepcopy(self.criticalDepths)
+            return sMod
+        if vMod.radiusOfEarth != self.vMod.radiusOfEarth \
+                or vMod.iocbDepth != self.vMod.iocbDepth \
+                or top + bot >= len(newLayers):
+            sMod.createSample()
+            return sMod
+        if vMod.validate() is False:
+            raise SlownessModelError(
+                "Error in velocity model (vMod.validate failed)!")
+        if newLayers[0].topSVelocity == 0:
+            raise SlownessModelError(
+                "Unable to handle zero S velocity layers at surface.")
+        sMod.findCriticalPoints()
+
+        # The new layers, including the discontinuity below them.
+        topDepth = newLayers[top].topDepth
+        botDepth = newLayers[-1 - bot].botDepth
+        if not self._sameCriticalPoints(sMod, topDepth, botDepth):
+            # The sampling of the layers above and below depends on them.
+            sMod.createSample()
+            return sMod
+        pLayers, sLayers = sMod.coarseLayers(
+            top, min(len(newLayers) - bot + 1, len(newLayers)))
+        numNew = len([l for l in pLayers if l.botDepth <= botDepth])
+        middle = copy(sMod)
+        middle.PLayers = SlownessLayerList(pLayers[:numNew])
+        middle.SLayers = SlownessLayerList(sLayers[:numNew])
+        oldPs = set()
+        for layers in [self.PLayers, self.SLayers]:
+            oldPs.update(layers.getArray()[:, 0].tolist())
+            oldPs.update(layers.getArray()[:, 2].tolist())
+        for p in sorted(oldPs):
+            middle.addSlowness(p, self.PWAVE)
+            middle.addSlowness(p, self.SWAVE)
+
+        # The layers above end at topDepth, the ones below start at
+        # botDepth, without the discontinuities there.
+        for isPWave in [self.PWAVE, self.SWAVE]:
+            old = self.PLayers if isPWave else self.SLayers
+            array = old.getArray()
+            above = np.searchsorted(array[:, 1], topDepth, side="left")
+            below = np.searchsorted(array[:, 3], botDepth, side="right")
+            layers = SlownessLayerList(
+                old[:above] + (middle.PLayers if isPWave else middle.SLayers)
+                + old[below:])
+            if isPWave:
+                sMod.PLayers = layers
+            else:
+                sMod.SLayers = layers
+        newPs = set()
+        for layers in [middle.PLayers, middle.SLayers]:
+            newPs.update(layers.getArray()[:, 0].tolist())
+            newPs.update(layers.getArray()[:, 2].tolist())
+        for p in sorted(newPs - oldPs):
+            sMod.addSlowness(p, self.PWAVE)
+            sMod.addSlowness(p, self.SWAVE)
+        # The ray parameter at the bottom of a high slowness zone must be
+        # sampled everywhere, as the tau model needs it, but it may have
+        # been sampled only in some layers of this model, so it isn't in
+        # newPs and sampleHighSlownessZones finds it sampled already.
+        for highZones, isPWave in [(sMod.highSlownessLayerDepthsP, True),
+                                   (sMod.highSlownessLayerDepthsS, False)]:
+            for highZone in highZones:
+                sMod.addSlowness(highZone.rayParam, isPWave)
+                sMod.addSlowness(highZone.rayParam, not isPWave)
+        sMod.sampleHighSlownessZones()
+        if not sMod.minimal:
+            sMod.rayParamIncCheck()
+            sMod.depthIncCheck()
+        # The layers above the new ones passed before. Some may have been
+        # split since, but, as in distanceCheck itself, that only refines
+        # layers that have been checked.
+        firstLayerNums = {}
+        for isPWave in [self.PWAVE, self.SWAVE]:
+            firstLayerNums[isPWave] = int(np.searchsorted(
+                sMod.getLayerArray(isPWave)[:, 1], topDepth, side="left"))
+        sMod.distanceCheck(firstLayerNums)
+        if sMod.minimal:
+            sMod.removeRedundantSamples()
+        sMod.fixCriticalPoints()
+        if sMod.validate() is False:
+            raise SlownessModelError('SlownessModel.validate failed!')
+        return sMod
+
+    def _sameCriticalPoints(self, other, topDepth, botDepth):
+        """
+        Checks whether other, a slowness model of a perturbed version of the
+        velocity model of this one, has the same critical depths as this one
+        outside of topDepth to botDepth, the depths of the perturbed layers,
+        and the same high slowness zones and fluid layers starting above
+        them. resample keeps the layers above without checking them again,
+        which is only right if those are the same.
+        """
+        def outside(sMod):
+            ranges = [[(r.topDepth, r.botDepth, r.rayParam)
+                       for r in getattr(sMod, name) if r.topDepth < topDepth]
+                      for name in ["highSlownessLayerDepthsP",
+                                   "highSlownessLayerDepthsS",
+                                   "fluidLayerDepths"]]
+            return ranges, [cd.depth for cd in sMod.criticalDepths
+                            if not topDepth <= cd.depth <= botDepth]
+        return outside(self) == outside(other)
+
     def findCriticalPoints(self):
         """ Finds all critical points within a velocity model.
 
@@ -553,17 +765,49 @@ class SlownessModel(object):
         well as sampling each point specified within the VelocityModel. The
         P and S sampling will also be compatible.
         """
-        self.PLayers = []
-        self.SLayers = []
-        # to initialise prevVLayer
-        origVLayer = self.vMod.layers[0]
-        origVLayer = VelocityLayer(
-            0, origVLayer.topDepth, origVLayer.topDepth,
-            origVLayer.topPVelocity, origVLayer.topPVelocity,
-            origVLayer.topSVelocity, origVLayer.topSVelocity,
-            origVLayer.topDensity, origVLayer.topDensity, origVLayer.topQp,
-            origVLayer.topQp, origVLayer.topQs, origVLayer.topQs)
-        for layer in self.vMod.layers:
+        pLayers, sLayers = self.coarseLayers(0, self.vMod.getNumLayers())
+        self.PLayers = SlownessLayerList(pLayers)
+        self.SLayers = SlownessLayerList(sLayers)
+        self.sampleHighSlownessZones()
+        # Make sure P and S are consistent
+        botP = -1
+        for layer in self.PLayers:
+            topP = layer.topP
+            if topP != botP:
+                self.addSlowness(topP, self.SWAVE)
+            botP = layer.botP
+            self.addSlowness(botP, self.SWAVE)
+        botP = -1
+        for layer in self.SLayers:
+            topP = layer.topP
+            if topP != botP:
+                self.addSlowness(topP, self.PWAVE)
+            botP = layer.botP
+            self.addSlowness(botP, self.PWAVE)
+
+    def coarseLayers(self, start, stop):
+        """
+        Returns lists of the P and S slowness layers of the velocity layers
+        start to stop - 1, each preceded by the zero thickness layer of the
+        discontinuity at its top if there is one. Layers of the same
+        velocity layer are at the same index in both lists, and in fluids
+        the S layer is the P layer.
+        """
+        pLayers = []
+        sLayers = []
+        if start == 0:
+            # to initialise prevVLayer
+            origVLayer = self.vMod.layers[0]
+            origVLayer = VelocityLayer(
+                0, origVLayer.topDepth, origVLayer.topDepth,
+                origVLayer.topPVelocity, origVLayer.topPVelocity,
+                origVLayer.topSVelocity, origVLayer.topSVelocity,
+                origVLayer.topDensity, origVLayer.topDensity,
+                origVLayer.topQp, origVLayer.topQp, origVLayer.topQs,
+                origVLayer.topQs)
+        else:
+            origVLayer = self.vMod.layers[start - 1]
+        for layer in self.vMod.layers[start:stop]:
             prevVLayer = origVLayer
             origVLayer = layer
             # Check for first order discontinuity. However, we only
@@ -593,7 +837,7 @@ class SlownessModel(object):
                     origVLayer.topPVelocity, topSVel, botSVel)
                 currPLayer = create_from_vlayer(currVLayer,
                                                 self.PWAVE)
-                self.PLayers.append(currPLayer)
+                pLayers.append(currPLayer)
                 if (prevVLayer.botSVelocity == 0
                     and origVLayer.topSVelocity == 0) \
                         or (self.allowInnerCoreS is False
@@ -602,10 +846,10 @@ class SlownessModel(object):
                 else:
                     currSLayer = create_from_vlayer(currVLayer,
                                                     self.SWAVE)
-                self.SLayers.append(currSLayer)
+                sLayers.append(currSLayer)
             currPLayer = create_from_vlayer(origVLayer,
                                             self.PWAVE)
-            self.PLayers.append(currPLayer)
+            pLayers.append(currPLayer)
             if self.depthInFluid(origVLayer.topDepth) or (
                     self.allowInnerCoreS is False
                     and origVLayer.topDepth >= self.vMod.iocbDepth):
@@ -613,9 +857,14 @@ class SlownessModel(object):
             else:
                 currSLayer = create_from_vlayer(origVLayer,
                                                 self.SWAVE)
-            self.SLayers.append(currSLayer)
-        # Make sure that all high slowness layers are sampled exactly
-        # at their bottom
+            sLayers.append(currSLayer)
+        return pLayers, sLayers
+
+    def sampleHighSlownessZones(self):
+        """
+        Makes sure that all high slowness layers are sampled exactly at their
+        bottom.
+        """
         for highZone in self.highSlownessLayerDepthsS:
             sLayerNum = self.layerNumberAbove(highZone.botDepth, self.SWAVE)
             highSLayer = self.SLayers[sLayerNum]
@@ -636,21 +885,6 @@ class SlownessModel(object):
                 highSLayer = self.PLayers[sLayerNum]
             if highZone.rayParam != highSLayer.botP:
                 self.addSlowness(highZone.rayParam, self.PWAVE)
-        # Make sure P and S are consistent
-        botP = -1
-        for layer in self.PLayers:
-            topP = layer.topP
-            if topP != botP:
-                self.addSlowness(topP, self.SWAVE)
-            botP = layer.botP
-            self.addSlowness(botP, self.SWAVE)
-        botP = -1
-        for layer in self.SLayers:
-            topP = layer.topP
-            if topP != botP:
-                self.addSlowness(topP, self.PWAVE)
-            botP = layer.botP
-            self.addSlowness(botP, self.PWAVE)
 
     def layerNumberAbove(self, depth, isPWave):
         """
@@ -660,13 +894,7 @@ class SlownessModel(object):
         thickness layers)layers. Error occurs if no layer in the slowness
         model contains the given depth.
         """
-        foundLayerNum = self.layerNumForDepth(depth, isPWave)
-        tempLayer = self.getSlownessLayer(foundLayerNum, isPWave)
-        # Check if given depth is on a boundary.
-        while tempLayer.topDepth == depth and foundLayerNum > 0:
-            foundLayerNum -= 1
-            tempLayer = self.getSlownessLayer(foundLayerNum, isPWave)
-        return foundLayerNum
+        return int(self.layerNumbersAbove(depth, isPWave))
 
     def layerNumberBelow(self, depth, isPWave):
         """
@@ -676,49 +904,51 @@ class SlownessModel(object):
         layers) layers. Error occurs if no layer in the slowness model
         contains the given depth.
         """
-        foundLayerNum = self.layerNumForDepth(depth, isPWave)
-        if isPWave:
-            layers = self.PLayers
-        else:
-            layers = self.SLayers
-        tempLayer = self.getSlownessLayer(foundLayerNum, isPWave)
-        while tempLayer.botDepth == depth and foundLayerNum < len(layers) - 1:
-            foundLayerNum += 1
-            tempLayer = self.getSlownessLayer(foundLayerNum, isPWave)
-        return foundLayerNum
+        return int(self.layerNumbersBelow(depth, isPWave))
 
     def layerNumForDepth(self, depth, isPWave):
-        if isPWave:
-            layers = self.PLayers
+        """
+        Finds the index of a slowness layer that contains the given depth,
+        i.e. the one layerNumberAbove returns.
+        """
+        return self.layerNumberAbove(depth, isPWave)
+
+    def layerNumbersAbove(self, depths, isPWave):
+        """
+        layerNumberAbove for an array of depths at once, returns an array of
+        the layer numbers.
+        """
+        # The first layer whose bottom is not above the depth.
+        return np.searchsorted(self._getLayerArray(depths, isPWave)[:, 3],
+                               depths, side="left")
+
+    def layerNumbersBelow(self, depths, isPWave):
+        """
+        layerNumberBelow for an array of depths at once, returns an array of
+        the layer numbers.
+        """
+        # The last layer whose top is not below the depth.
+        return np.searchsorted(self._getLayerArray(depths, isPWave)[:, 1],
+                               depths, side="right") - 1
+
+    def _getLayerArray(self, depths, isPWave):
+        """
+        Returns the array of the layers, see SlownessLayerList.getArray,
+        after checking that the layers contain all depths.
+        """
+        self._checkLayerContainers()
+        array = (self.PLayers if isPWave else self.SLayers).getArray()
+        if not len(array):
+            raise SlownessModelError("No layer contains this depth")
+        if np.ndim(depths):
+            # Also fails for NaN.
+            inside = np.all((array[0, 1] <= depths) &
+                            (depths <= array[-1, 3]))
         else:
-            layers = self.SLayers
-        # check to make sure depth is within the range available
-        if depth < layers[0].topDepth or depth > layers[-1].botDepth:
+            inside = array[0, 1] <= depths <= array[-1, 3]
+        if not inside:
             raise SlownessModelError("No layer contains this depth")
-        tooSmallNum = 0
-        tooLargeNum = len(layers) - 1
-        while True:
-            if tooLargeNum - tooSmallNum < 3:
-                #  "end of Newton, just check" (what?)
-                currentNum = tooSmallNum
-                while currentNum <= tooLargeNum:
-                    tempLayer = self.getSlownessLayer(currentNum, isPWave)
-                    if tempLayer.topDepth <= depth <= tempLayer.botDepth:
-                        return currentNum
-                    currentNum += 1
-            else:
-                currentNum = int(Decimal((tooSmallNum + tooLargeNum) / 2.0)
-                                 .to_integral_value(ROUND_HALF_EVEN))
-            tempLayer = self.getSlownessLayer(currentNum, isPWave)
-            if tempLayer.topDepth > depth:
-                tooLargeNum = currentNum - 1
-            elif tempLayer.botDepth < depth:
-                tooSmallNum = currentNum + 1
-            else:
-                return currentNum
-            if tooSmallNum > tooLargeNum:
-                raise ArithmeticError("tooSmallNum: " + str(tooSmallNum) +
-                                      " >= tooLargeNum: " + str(tooLargeNum))
+        return array
 
     def getSlownessLayer(self, layerNum, isPWave):
         """
@@ -738,6 +968,9 @@ class SlownessModel(object):
         velocity model, so all interpolation is linear in velocity, not in
         slowness!
         """
+        self._checkLayerContainers()
+        if self._counts is not None:
+            self._counts["calls"]["addSlowness"] += 1
         if isPWave:
             # NB Just like Java (fortunately) these are shallow copies --
             # values are modified in place!
@@ -746,19 +979,12 @@ class SlownessModel(object):
         else:
             layers = self.SLayers
             otherLayers = self.PLayers
-        for i, sLayer in enumerate(layers):
-            if sLayer.topDepth != sLayer.botDepth:
-                topVelocity = self.vMod.evaluateBelow(
-                    sLayer.topDepth, 'P' if isPWave else 'S')
-                botVelocity = self.vMod.evaluateAbove(
-                    sLayer.botDepth, 'P' if isPWave else 'S')
-            else:
-                # If depths are the same only need topVelocity, and just
-                # to verify we are not in a fluid
-                topVelocity = self.vMod.evaluateAbove(
-                    sLayer.botDepth, 'P' if isPWave else 'S')
-                botVelocity = self.vMod.evaluateBelow(
-                    sLayer.topDepth, 'P' if isPWave else 'S')
+        # Only the layers that contain p have to be looked at, which the
+        # layer list finds by bisection.
+        splits = []
+        for i in layers.findSlowness(p):
+            sLayer = layers[i]
+            topVelocity, botVelocity = self._splitVelocities(sLayer, isPWave)
             # Don't need to check for S waves in a fluid or in inner core if
             # allowInnerCoreS is False.
             if not isPWave:
@@ -767,41 +993,89 @@ class SlownessModel(object):
                     break
                 elif topVelocity == 0:
                     continue
-            if (sLayer.topP - p) * (p - sLayer.botP) > 0:
-                botDepth = sLayer.botDepth
-                if sLayer.botDepth != sLayer.topDepth:
-                    # Not a zero thickness layer, so calculate the depth for
-                    #  the ray parameter.
-                    slope = (botVelocity - topVelocity) / \
-                        (sLayer.botDepth - sLayer.topDepth)
-                    botDepth = self.interpolate(p, topVelocity,
-                                                sLayer.topDepth, slope)
-                botLayer = SlownessLayer(p, botDepth, sLayer.botP,
-                                         sLayer.botDepth)
-                topLayer = SlownessLayer(sLayer.topP, sLayer.topDepth, p,
-                                         botDepth)
-                # The list operations here should really be correct,
-                # after painstakingly working through Java and Python
-                # documentations and trying the behaviour of both.
-                layers.pop(i)
-                layers.insert(i, botLayer)
-                layers.insert(i, topLayer)
-                # To mimic the Java behaviour of returning -1 when item not
-                # in list.
-                try:
-                    otherIndex = otherLayers.index(sLayer)
-                except ValueError:
-                    otherIndex = -1
-                if otherIndex != -1:
-                    otherLayers.pop(otherIndex)
-                    otherLayers.insert(otherIndex, botLayer)
-                    otherLayers.insert(otherIndex, topLayer)
-
-    def rayParamIncCheck(self):
+            splits.append((i, sLayer, topVelocity, botVelocity))
+        # Split from the bottom up so the remaining indices stay valid.
+        for i, sLayer, topVelocity, botVelocity in reversed(splits):
+            split = self._splitLayer(sLayer, p, topVelocity, botVelocity)
+            if split is None:
+                continue
+            topLayer, botLayer = split
+            layers.split(i, topLayer, botLayer)
+            # Layers shared with the other wave type, i.e. in fluids, have
+            # to be split there as well.
+            try:
+                otherIndex = otherLayers.index(sLayer)
+            except ValueError:
+                otherIndex = -1
+            if otherIndex != -1:
+                otherLayers.split(otherIndex, topLayer, botLayer)
+            if self._counts is not None:
+                self._counts["layer_splits"] += 1 + (otherIndex != -1)
+
+    def _splitVelocities(self, sLayer, isPWave):
+        """
+        Returns the velocities at the top and bottom of a slowness layer that
+        addSlowness interpolates between to split it.
+        """
+        waveType = 'P' if isPWave else 'S'
+        if sLayer.topDepth != sLayer.botDepth:
+            topVelocity = self.vMod.evaluateBelow(sLayer.topDepth, waveType)
+            botVelocity = self.vMod.evaluateAbove(sLayer.botDepth, waveType)
+        else:
+            # If depths are the same only need topVelocity, and just
+            # to verify we are not in a fluid
+            topVelocity = self.vMod.evaluateAbove(sLayer.botDepth, waveType)
+            botVelocity = self.vMod.evaluateBelow(sLayer.topDepth, waveType)
+        return topVelocity, botVelocity
+
+    def _splitLayer(self, sLayer, p, topVelocity, botVelocity):
+        """
+        Returns the two slowness layers sLayer is split into at the ray
+        parameter p, or None if p is so close to the top or bottom slowness
+        that the depth for it rounds to outside of the layer.
+        """
+        botDepth = sLayer.botDepth
+        if sLayer.botDepth != sLayer.topDepth:
+            # Not a zero thickness layer, so calculate the depth for
+            #  the ray parameter.
+            slope = (botVelocity - topVelocity) / \
+                (sLayer.botDepth - sLayer.topDepth)
+            botDepth = self.interpolate(p, topVelocity, sLayer.topDepth, slope)
+            if not sLayer.topDepth <= botDepth <= sLayer.botDepth:
+                # E.g. a ray parameter that differs from a sample only by
+                # rounding, as when resample subdivides a layer between
+                # samples of the old model again.
+                return None
+        botLayer = SlownessLayer(p, botDepth, sLayer.botP, sLayer.botDepth)
+        topLayer = SlownessLayer(sLayer.topP, sLayer.topDepth, p, botDepth)
+        return topLayer, botLayer
+
+    def _batch(self):
+        """
+        Returns a _SlownessBatch for the layer lists, or None if the layers
+        are in SlownessLayerArrays, whose layer objects are not persistent.
+        """
+        self._checkLayerContainers()
+        if isinstance(self.PLayers, SlownessLayerList) \
+                and isinstance(self.SLayers, SlownessLayerList):
+            return _SlownessBatch(self)
+        return None
+
+    def rayParamIncCheck(self, batched=True):
         """
         Checks to make sure that no slowness layer spans more than maxDeltaP.
+
+        :param batched: Collect the new slownesses in a _SlownessBatch and
+            put the split layers into the layer lists once at the end,
+            instead of calling addSlowness for each. The result is the same.
         """
-        for layers in [self.SLayers, self.PLayers]:
+        batch = self._batch() if batched else None
+        addSlowness = batch.addSlowness if batch else self.addSlowness
+        for isPWave in [self.SWAVE, self.PWAVE]:
+            if batch:
+                layers = batch.iterLayers(isPWave)
+            else:
+                layers = self.PLayers if isPWave else self.SLayers
             for sLayer in layers:
                 if abs(sLayer.topP - sLayer.botP) > self.maxDeltaP:
                     numNewP = math.ceil(abs(sLayer.topP - sLayer.botP) /
@@ -809,63 +1083,134 @@ class SlownessModel(object):
                     deltaP = (sLayer.topP - sLayer.botP) / numNewP
                     rayNum = 1
                     while rayNum < numNewP:
-                        self.addSlowness(sLayer.topP + rayNum * deltaP,
-                                         self.PWAVE)
-                        self.addSlowness(sLayer.topP + rayNum * deltaP,
-                                         self.SWAVE)
+                        addSlowness(sLayer.topP + rayNum * deltaP,
+                                    self.PWAVE)
+                        addSlowness(sLayer.topP + rayNum * deltaP,
+                                    self.SWAVE)
                         rayNum += 1
+        if batch:
+            batch.apply()
 
-    def depthIncCheck(self):
+    def depthIncCheck(self, batched=True):
         """
         Checks to make sure no slowness layer spans more than maxDepthInterval.
+
+        :param batched: See rayParamIncCheck.
         """
-        for which_codeblock, layers in enumerate([self.SLayers, self.PLayers]):
+        batch = self._batch() if batched else None
+        addSlowness = batch.addSlowness if batch else self.addSlowness
+        # The velocities are evaluated from arrays cached by the velocity
+        # model, whose layers may have been changed in place since.
+        self.vMod.clearCache()
+        for isPWave in [self.SWAVE, self.PWAVE]:
+            # The slownesses for the current layers are calculated at once.
+            # Those for layers split since are calculated one at a time,
+            # which is faster for the few depths of a single layer.
+            slownesses = self._depthIncSlownesses(
+                self.PLayers if isPWave else self.SLayers, isPWave)
+            if batch:
+                layers = batch.iterLayers(isPWave)
+            else:
+                layers = self.PLayers if isPWave else self.SLayers
             for sLayer in layers:
                 if (sLayer.botDepth - sLayer.topDepth) > self.maxDepthInterval:
-                    newNumDepths = math.ceil(
-                        (sLayer.botDepth - sLayer.topDepth) /
-                        self.maxDepthInterval)
-                    deltaDepth = (sLayer.botDepth - sLayer.topDepth) / \
-                        newNumDepths
-                    depthNum = 1
-                    while depthNum < newNumDepths:
-                        # Could do if layers == self.SLayers, but that would
-                        # be a bit heavy. In fact, any comparison here might
-                        #  be quite slow, I have a feeling this runs a lot... ?
-                        if which_codeblock == 0:
-                            velocity = self.vMod.evaluateAbove(
-                                sLayer.topDepth + depthNum * deltaDepth, 'S')
-                            if velocity == 0 \
-                                    or (self.allowInnerCoreS is False
-                                        and sLayer.topDepth + depthNum *
-                                        deltaDepth >= self.vMod.iocbDepth):
-                                velocity = self.vMod.evaluateAbove(
-                                    sLayer.topDepth + depthNum * deltaDepth,
-                                    'P')
-                            p = self.toSlowness(
-                                velocity,
-                                sLayer.topDepth + depthNum * deltaDepth)
-                        else:
-                            p = self.toSlowness(self.vMod.evaluateAbove(
-                                sLayer.topDepth + depthNum * deltaDepth, 'P'),
-                                sLayer.topDepth + depthNum * deltaDepth)
-                        self.addSlowness(p, self.PWAVE)
-                        self.addSlowness(p, self.SWAVE)
-                        depthNum += 1
+                    key = (sLayer.topDepth, sLayer.botDepth)
+                    if key not in slownesses:
+                        newNumDepths = math.ceil(
+                            (sLayer.botDepth - sLayer.topDepth) /
+                            self.maxDepthInterval)
+                        deltaDepth = (sLayer.botDepth - sLayer.topDepth) / \
+                            newNumDepths
+                        slownesses[key] = [
+                            self._depthIncSlowness(
+                                sLayer.topDepth + depthNum * deltaDepth,
+                                isPWave)
+                            for depthNum in range(1, newNumDepths)]
+                    for p in slownesses[key]:
+                        addSlowness(p, self.PWAVE)
+                        addSlowness(p, self.SWAVE)
+        if batch:
+            batch.apply()
+
+    def _depthIncSlowness(self, depth, isPWave):
+        """
+        Returns the slowness depthIncCheck adds for the given depth. For S
+        waves, it is that of P in fluids and, unless allowInnerCoreS is True,
+        in the inner core.
+        """
+        velocity = self.vMod.evaluateAbove(depth, 'P' if isPWave else 'S')
+        if not isPWave and (velocity == 0 or (
+                self.allowInnerCoreS is False
+                and depth >= self.vMod.iocbDepth)):
+            velocity = self.vMod.evaluateAbove(depth, 'P')
+        return self.toSlowness(velocity, depth)
+
+    def _depthIncSlownesses(self, sLayers, isPWave):
+        """
+        Returns a dictionary of the slownesses depthIncCheck adds for each of
+        the given slowness layers that spans more than maxDepthInterval, by
+        the top and bottom depth of the layer. Same as _depthIncSlowness,
+        but with the velocities at the depths of all of them evaluated at
+        once.
+        """
+        bounds = sorted(set(
+            (sLayer.topDepth, sLayer.botDepth) for sLayer in sLayers
+            if (sLayer.botDepth - sLayer.topDepth) > self.maxDepthInterval))
+        if not bounds:
+            return {}
+        topDepth, botDepth = np.array(bounds, dtype=np.float64).T
+        newNumDepths = np.ceil((botDepth - topDepth) /
+                               self.maxDepthInterval).astype(np.int_)
+        deltaDepth = (botDepth - topDepth) / newNumDepths
+        # Depths 1 to newNumDepths - 1 of all layers, one after the other.
+        counts = newNumDepths - 1
+        layerNums = np.repeat(np.arange(len(bounds)), counts)
+        depthNums = np.arange(len(layerNums)) - np.repeat(
+            np.cumsum(counts) - counts, counts) + 1
+        depths = topDepth[layerNums] + depthNums * deltaDepth[layerNums]
+        if not isPWave:
+            velocities = self.vMod.evaluate_above(depths, 'S')
+            useP = velocities == 0
+            if self.allowInnerCoreS is False:
+                useP |= depths >= self.vMod.iocbDepth
+            if useP.any():
+                velocities = np.where(
+                    useP, self.vMod.evaluate_above(depths, 'P'), velocities)
+        else:
+            velocities = self.vMod.evaluate_above(depths, 'P')
+        slownesses = [self.toSlowness(velocity, depth) for depth, velocity
+                      in zip(depths.tolist(), velocities.tolist())]
+        stops = np.cumsum(counts).tolist()
+        return dict((bound, slownesses[stop - count:stop])
+                    for bound, stop, count in zip(bounds, stops,
+                                                  counts.tolist()))
 
-    def distanceCheck(self):
+    def distanceCheck(self, firstLayerNums=None):
         """
         Checks to make sure no slowness layer spans more than maxRangeInterval
         and that the (estimated) error due to linear interpolation is less
         than maxInterpError.
+
+        :param firstLayerNums: Dictionary of the number of the first layer to
+            check by wave type (isPWave), e.g. when the layers above have
+            been checked before and not changed since. The distance estimates
+            for them only depend on the layers above. By default, all layers
+            are checked.
+
+        The sums over the layers above the turning layer are kept by ray
+        parameter, so recalculating a distance for the same ray parameter,
+        e.g. after backing up, only adds the layers below. addSlowness only
+        ever splits layers, so a sum is still valid as long as the last layer
+        it includes is still at the same index, see approxDistance.
         """
+        partialSums = {}
         for currWaveType in [self.SWAVE, self.PWAVE]:
             isCurrOK = False
             isPrevOK = False
             prevPrevTD = None
             prevTD = None
             currTD = None
-            j = 0
+            j = firstLayerNums[currWaveType] if firstLayerNums else 0
             sLayer = self.getSlownessLayer(j, currWaveType)
             while j < self.getNumLayers(currWaveType):
                 prevSLayer = sLayer
@@ -875,7 +1220,9 @@ class SlownessModel(object):
                     and self.depthInHighSlowness(sLayer.topDepth, sLayer.topP,
                                                  currWaveType) is False):
                     # Don't calculate prevTD if we can avoid it
-                    if isCurrOK:
+                    # currTD is lost if we backed up right after a new
+                    # start.
+                    if isCurrOK and currTD is not None:
                         if isPrevOK:
                             prevPrevTD = prevTD
                         else:
@@ -884,9 +1231,11 @@ class SlownessModel(object):
                         isPrevOK = True
                     else:
                         prevTD = self.approxDistance(j - 1, sLayer.topP,
-                                                     currWaveType)
+                                                     currWaveType,
+                                                     partialSums)
                         isPrevOK = True
-                    currTD = self.approxDistance(j, sLayer.botP, currWaveType)
+                    currTD = self.approxDistance(j, sLayer.botP, currWaveType,
+                                                 partialSums)
                     isCurrOK = True
                     # Check for jump of too great distance
                     if (abs(prevTD.distRadian - currTD.distRadian) >
@@ -911,32 +1260,8 @@ class SlownessModel(object):
                         # the nice, if unintended, consequence of adding
                         # extra samples in the neighborhood of poorly
                         # sampled caustics.
-                        splitRayParam = (sLayer.topP + sLayer.botP) / 2
-                        allButLayer = self.approxDistance(j-1, splitRayParam,
-                                                          currWaveType)
-                        splitLayer = SlownessLayer(
-                            sLayer.topP, sLayer.topDepth, splitRayParam,
-                            sLayer.bullenDepthFor(splitRayParam,
-                                                  self.radiusOfEarth))
-                        justLayer = splitLayer.bullenRadialSlowness(
-                            splitRayParam, self.radiusOfEarth)
-                        splitTD = TimeDist(
-                            splitRayParam, allButLayer.time +
-                            2 * justLayer.time,
-                            allButLayer.distRadian + 2 * justLayer.distRadian)
-                        # Python standard division is not IEEE compliant,
-                        # as “The IEEE 754 standard specifies that every
-                        # floating point arithmetic operation, including
-                        # division by zero, has a well-defined result”.
-                        # Use numpy's division instead by using np.array:
-                        with np.errstate(divide='ignore', invalid='ignore'):
-                            diff = (currTD.time -
-                                    ((splitTD.time - prevTD.time)
-                                     * ((currTD.distRadian
-                                        - prevTD.distRadian) /
-                                    np.array(splitTD.distRadian
-                                             - prevTD.distRadian))
-                                    + prevTD.time))
+                        diff = self.interpError(j, prevTD, currTD,
+                                                currWaveType, partialSums)
                         if abs(diff) > self.maxInterpError:
                             self.addSlowness((prevSLayer.topP
                                               + prevSLayer. botP) / 2,
@@ -978,6 +1303,139 @@ class SlownessModel(object):
                 print("Number of " + ("P" if currWaveType else "S") +
                       " slowness layers: " + str(j))
 
+    def interpError(self, layerNum, prevTD, currTD, isPWave,
+                    partialSums=None):
+        """
+        Estimates the error of the travel time due to linear interpolation
+        between the rays turning at the top and the bottom of the given
+        slowness layer, prevTD and currTD (see approxDistance), from a ray
+        turning in the middle of the layer.
+        """
+        sLayer = self.getSlownessLayer(layerNum, isPWave)
+        splitRayParam = (sLayer.topP + sLayer.botP) / 2
+        allButLayer = self.approxDistance(layerNum - 1, splitRayParam,
+                                          isPWave, partialSums)
+        splitLayer = SlownessLayer(
+            sLayer.topP, sLayer.topDepth, splitRayParam,
+            sLayer.bullenDepthFor(splitRayParam, self.radiusOfEarth))
+        justLayer = splitLayer.bullenRadialSlowness(splitRayParam,
+                                                    self.radiusOfEarth)
+        splitTD = TimeDist(
+            splitRayParam, allButLayer.time + 2 * justLayer.time,
+            allButLayer.distRadian + 2 * justLayer.distRadian)
+        # Python standard division is not IEEE compliant, as “The IEEE 754
+        # standard specifies that every floating point arithmetic operation,
+        # including division by zero, has a well-defined result”. Use
+        # numpy's division instead by using np.array:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            diff = (currTD.time -
+                    ((splitTD.time - prevTD.time)
+                     * ((currTD.distRadian - prevTD.distRadian) /
+                        np.array(splitTD.distRadian - prevTD.distRadian))
+                     + prevTD.time))
+        return diff
+
+    def removeRedundantSamples(self):
+        """
+        Removes the ray parameters that are not needed to keep the estimated
+        interpolation error, see interpError, within maxInterpError and the
+        distance between neighbouring samples within maxRangeInterval.
+
+        Only samples within velocity layers can be removed, not those at
+        their boundaries or bottoming high slowness zones, and they are
+        removed for both wave types at all depths they occur at, so the
+        sampling of P and S stays consistent. The two slowness layers at
+        each sample are merged, which gives the layer there would have been
+        without it, and the sample is kept if the merged layer or the one
+        below it then fails one of the checks of distanceCheck. The
+        samples are tried from the largest ray parameter down.
+        """
+        if isinstance(self.PLayers, SlownessLayerArray):
+            # Merging relies on the layers shared by P and S in fluids being
+            # the same objects.
+            self.useLayerArrays(False)
+            try:
+                self.removeRedundantSamples()
+            finally:
+                self.useLayerArrays()
+            return
+        self._checkLayerContainers()
+        velocityDepths = set()
+        for vLayer in self.vMod.layers:
+            velocityDepths.add(vLayer.topDepth)
+            velocityDepths.add(vLayer.botDepth)
+        samples = set()
+        fixed = set(zone.rayParam for zone in
+                    self.highSlownessLayerDepthsP +
+                    self.highSlownessLayerDepthsS)
+        for isPWave in [self.PWAVE, self.SWAVE]:
+            layers = self.getLayerArray(isPWave).tolist()
+            samples.update(layer[0] for layer in layers)
+            fixed.add(layers[0][0])
+            fixed.add(layers[-1][2])
+            for above, below in zip(layers[:-1], layers[1:]):
+                p = above[2]
+                if p != below[0] or above[3] in velocityDepths \
+                        or above[1] == above[3] or below[1] == below[3] \
+                        or (above[0] - p) * (p - below[2]) <= 0:
+                    fixed.add(above[2])
+                    fixed.add(below[0])
+        for p in sorted(samples - fixed, reverse=True):
+            if self._removeSample(p) and self._counts is not None:
+                self._counts["removed_samples"] += 1
+
+    def _removeSample(self, p):
+        """
+        Merges the slowness layers at the ray parameter p for both wave
+        types if the interpolation error stays within maxInterpError, see
+        removeRedundantSamples. Returns whether they were merged.
+        """
+        merged = {}
+        saved = {}
+        checks = []
+        for isPWave in [self.PWAVE, self.SWAVE]:
+            layers = self.PLayers if isPWave else self.SLayers
+            saved[isPWave] = list(layers)
+            boundaries = np.nonzero(
+                self.getLayerArray(isPWave)[:-1, 2] == p)[0].tolist()
+            # Merge from the bottom up so the remaining indices stay valid.
+            for i in reversed(boundaries):
+                top = layers[i]
+                # Layers shared by P and S in fluids stay shared.
+                if id(top) not in merged:
+                    merged[id(top)] = SlownessLayer(
+                        top.topP, top.topDepth, layers[i + 1].botP,
+                        layers[i + 1].botDepth)
+                layers[i:i + 2] = [merged[id(top)]]
+            checks.extend((i - num, isPWave)
+                          for num, i in enumerate(boundaries))
+        ok = True
+        for i, isPWave in checks:
+            for j in range(i, min(i + 2, self.getNumLayers(isPWave))):
+                sLayer = self.getSlownessLayer(j, isPWave)
+                if self.depthInHighSlowness(sLayer.botDepth, sLayer.botP,
+                                            isPWave) \
+                        or self.depthInHighSlowness(sLayer.topDepth,
+                                                    sLayer.topP, isPWave):
+                    ok = False
+                    break
+                prevTD = self.approxDistance(j - 1, sLayer.topP, isPWave)
+                currTD = self.approxDistance(j, sLayer.botP, isPWave)
+                if (abs(prevTD.distRadian - currTD.distRadian) >
+                        self.maxRangeInterval and
+                        abs(sLayer.topP - sLayer.botP) > 2 * self.minDeltaP) \
+                        or abs(self.interpError(j, prevTD, currTD,
+                                                isPWave)) > \
+                        self.maxInterpError:
+                    ok = False
+                    break
+            if not ok:
+                break
+        if not ok:
+            self.PLayers[:] = saved[self.PWAVE]
+            self.SLayers[:] = saved[self.SWAVE]
+        return ok
+
     def depthInHighSlowness(self, depth, rayParam, isPWave):
         """
         Determines if the given depth and corresponding slowness is contained
@@ -1005,11 +1463,20 @@ class SlownessModel(object):
                     return True
         return False
 
-    def approxDistance(self, slownessTurnLayer, p, isPWave):
+    def approxDistance(self, slownessTurnLayer, p, isPWave,
+                       partialSums=None):
         """
         Generates approximate distance, in radians, for a ray from a surface
         source that turns at the bottom of the given slowness layer.
+
+        :param partialSums: Optional dictionary to keep the sums over the
+            layers by wave type and ray parameter. A later call for the same
+            ray parameter continues from there if the layers the sum
+            includes are unchanged, which holds if layers have only been
+            split below them.
         """
+        if self._counts is not None:
+            self._counts["calls"]["approxDistance"] += 1
         # First, if the slowness model contains less than slownessTurnLayer
         # elements we can't calculate a distance.
         if slownessTurnLayer >= self.getNumLayers(isPWave):
@@ -1019,8 +1486,42 @@ class SlownessModel(object):
         if p < 0:
             raise SlownessModelError("Ray parameter must not be negative!")
         td = TimeDist(p)
-        for layerNum in range(0, slownessTurnLayer + 1):
-            td.add(self.layerTimeDist(p, layerNum, isPWave))
+        firstLayerNum = 0
+        checkpoints = []
+        if partialSums is not None:
+            key = (isPWave, p)
+            # As layers are only ever inserted, a layer is still at its index
+            # only if none were inserted above it.
+            for checkpoint in reversed(partialSums.get(key, [])):
+                layerNum, layer, time, distRadian = checkpoint
+                if layerNum <= slownessTurnLayer and self.getSlownessLayer(
+                        layerNum, isPWave) is layer:
+                    td.time = time
+                    td.distRadian = distRadian
+                    firstLayerNum = layerNum + 1
+                    checkpoints.append(checkpoint)
+                    break
+        if firstLayerNum <= slownessTurnLayer:
+            time, distRadian = self.layerTimeDists(
+                p, np.arange(firstLayerNum, slownessTurnLayer + 1), isPWave)
+            # Add up in order, as the running sums are kept.
+            time = np.add.accumulate(np.append(td.time, time))
+            distRadian = np.add.accumulate(np.append(td.distRadian,
+                                                     distRadian))
+            td.time = float(time[-1])
+            td.distRadian = float(distRadian[-1])
+            if partialSums is not None:
+                for layerNum in range(max(firstLayerNum,
+                                          slownessTurnLayer - 1),
+                                      slownessTurnLayer + 1):
+                    i = layerNum - slownessTurnLayer - 1
+                    checkpoints.append((
+                        layerNum, self.getSlownessLayer(layerNum, isPWave),
+                        float(time[i]), float(distRadian[i])))
+        if partialSums is not None:
+            # distanceCheck splits the turning layer and the one above, so
+            # keep the sum down to the layer above the turning layer as well.
+            partialSums[key] = checkpoints[-2:]
         # Return 2* distance and time because there is a downgoing as well
         # as an upgoing leg, which are equal since this is for a surface
         # source.
@@ -1136,19 +1637,85 @@ class SlownessModel(object):
         return sphericalLayer.bullenRadialSlowness(sphericalRayParam,
                                                    self.radiusOfEarth)
 
+    def getLayerArray(self, isPWave):
+        """
+        Returns the topP, topDepth, botP and botDepth of the slowness layers
+        of the given wave type as the columns of an array, see
+        SlownessLayerList.getArray and SlownessLayerArray.getArray. It must
+        not be modified.
+        """
+        self._checkLayerContainers()
+        return (self.PLayers if isPWave else self.SLayers).getArray()
+
+    def _checkLayerContainers(self):
+        """
+        Makes sure the layers of both wave types are in SlownessLayerLists
+        or SlownessLayerArrays, not in plain lists.
+        """
+        if not isinstance(self.PLayers,
+                          (SlownessLayerList, SlownessLayerArray)):
+            self.PLayers = SlownessLayerList(self.PLayers)
+        if not isinstance(self.SLayers,
+                          (SlownessLayerList, SlownessLayerArray)):
+            self.SLayers = SlownessLayerList(self.SLayers)
+
+    def useLayerArrays(self, layerArrays=True):
+        """
+        Stores the layers of both wave types in SlownessLayerArrays, which
+        take less memory and are cheaper to copy than lists of layers, or, if
+        layerArrays is False, in SlownessLayerLists with the layers in fluids
+        shared by P and S again.
+        """
+        if layerArrays:
+            if not isinstance(self.PLayers, SlownessLayerArray):
+                self.PLayers = SlownessLayerArray(self.PLayers)
+            if not isinstance(self.SLayers, SlownessLayerArray):
+                self.SLayers = SlownessLayerArray(self.SLayers)
+        elif not isinstance(self.PLayers, SlownessLayerList) \
+                or not isinstance(self.SLayers, SlownessLayerList):
+            shared = shared_layers(self.PLayers, self.SLayers)
+            PLayers = SlownessLayerList(self.PLayers)
+            self.SLayers = SlownessLayerList(
+                PLayers[i] if i != -1 else layer
+                for layer, i in zip(self.SLayers, shared))
+            self.PLayers = PLayers
+
+    def layerTimeDists(self, sphericalRayParams, layerNums, isPWave):
+        """
+        Vectorised form of layerTimeDist. The ray parameters and layer
+        numbers are arrays that are broadcast against each other, see
+        taupy.SlownessLayer.layer_time_dist. Returns arrays of the time and
+        distance (in radians) increments.
+        """
+        layerNums = np.asarray(layerNums, dtype=np.int_)
+        layers = self.getLayerArray(isPWave)[layerNums]
+        if np.any((np.asarray(sphericalRayParams) == 0)
+                  & (layers[..., 3] == self.radiusOfEarth)
+                  & (layers[..., 1] != layers[..., 3])
+                  & (layerNums != self.getNumLayers(isPWave) - 1)):
+            raise SlownessModelError("There are layers deeper than the "
+                                     "centre of the Earth!")
+        return layer_time_dist(layers[..., 0], layers[..., 1], layers[..., 2],
+                               layers[..., 3], sphericalRayParams,
+                               self.radiusOfEarth, self.slowness_tolerance)
+
     def fixCriticalPoints(self):
         """
         Resets the slowness layers that correspond to critical points.
         """
-        for cd in self.criticalDepths:
-            cd.pLayerNum = self.layerNumberBelow(cd.depth, self.PWAVE)
+        depths = [cd.depth for cd in self.criticalDepths]
+        pLayerNums = self.layerNumbersBelow(depths, self.PWAVE).tolist()
+        sLayerNums = self.layerNumbersBelow(depths, self.SWAVE).tolist()
+        for cd, pLayerNum, sLayerNum in zip(self.criticalDepths, pLayerNums,
+                                            sLayerNums):
+            cd.pLayerNum = pLayerNum
             sLayer = self.getSlownessLayer(cd.pLayerNum, self. PWAVE)
             if cd.pLayerNum == len(self.PLayers) - 1 \
                     and sLayer.botDepth == cd.depth:
                 # We want the last critical point to be the bottom of the
                 # last layer.
                 cd.pLayerNum += 1
-            cd.sLayerNum = self.layerNumberBelow(cd.depth, self.SWAVE)
+            cd.sLayerNum = sLayerNum
             sLayer = self.getSlownessLayer(cd.sLayerNum, self.SWAVE)
             if cd.sLayerNum == len(self.SLayers) - 1 \
                     and sLayer .botDepth == cd.depth:
@@ -1284,6 +1851,7 @@ class SlownessModel(object):
         """
         layerNum = self.layerNumberAbove(depth, isPWave)
         sLayer = self.getSlownessLayer(layerNum, isPWave)
+        self._checkLayerContainers()
         if sLayer.topDepth == depth or sLayer.botDepth == depth:
             # Depth is already on a slowness layer boundary so no need to
             # split any slowness layers.
@@ -1375,22 +1943,193 @@ class SlownessModel(object):
             # but must not break program flow. I.e. that's ok, no error
             # should be raised, the try clause can be seen like an if.
             pass
-        for otherLayerNum, sLayer in enumerate(out[:]):
-            if (sLayer.topP - p) * (p - sLayer.botP) > 0:
-                # Found a slowness layer with the other wave type that
-                # contains the new slowness sample.
-                topLayer = SlownessLayer(
-                    sLayer.topP, sLayer.topDepth, p,
-                    sLayer.bullenDepthFor(p, self.radiusOfEarth))
-                botLayer = SlownessLayer(p, topLayer.botDepth, sLayer.botP,
-                                         sLayer.botDepth)
-                del out[otherLayerNum]
-                out.insert(otherLayerNum, botLayer)
-                out.insert(otherLayerNum, topLayer)
-                # Fix critical layers since we have added a slowness layer.
-                self.fixCriticalDepths(criticalDepths, otherLayerNum,
-                                       not isPWave)
-                # Skip next layer as it was just added: achieved by slicing
-                # the list iterator.
+        # The slowness layers with the other wave type that contain the new
+        # slowness sample, found before any of them is split.
+        found = [(otherLayerNum, out[otherLayerNum])
+                 for otherLayerNum in out.findSlowness(p)]
+        for otherLayerNum, sLayer in found:
+            topLayer = SlownessLayer(
+                sLayer.topP, sLayer.topDepth, p,
+                sLayer.bullenDepthFor(p, self.radiusOfEarth))
+            botLayer = SlownessLayer(p, topLayer.botDepth, sLayer.botP,
+                                     sLayer.botDepth)
+            del out[otherLayerNum]
+            out.insert(otherLayerNum, botLayer)
+            out.insert(otherLayerNum, topLayer)
+            # Fix critical layers since we have added a slowness layer.
+            self.fixCriticalDepths(criticalDepths, otherLayerNum,
+                                   not isPWave)
 
         return out
+
+
+def _same_layer(layer, other):
+    """
+    Checks whether two velocity layers have the same depths and values,
+    regardless of their layer numbers.
+    """
+    return all(getattr(layer, name) == getattr(other, name)
+               for name in ["topDepth", "botDepth", "topPVelocity",
+                            "botPVelocity", "topSVelocity", "botSVelocity",
+                            "topDensity", "botDensity", "topQp", "botQp",
+                            "topQs", "botQs"])
+
+
+class _LayerCounts(object):
+    """
+    Numbers of pieces the layers of a list have been split into, as a
+    Fenwick tree, to find the layer a position in the list of pieces falls
+    into in logarithmic time while the pieces are added.
+    """
+    def __init__(self, n):
+        self.n = n
+        self.total = n
+        self.tree = [0] * (n + 1)
+        for i in range(1, n + 1):
+            self.tree[i] += 1
+            j = i + (i & -i)
+            if j <= n:
+                self.tree[j] += self.tree[i]
+        self.step = 1
+        while self.step * 2 <= n:
+            self.step *= 2
+
+    def add(self, i, delta=1):
+        """
+        Adds delta pieces to layer i.
+        """
+        self.total += delta
+        i += 1
+        while i <= self.n:
+            self.tree[i] += delta
+            i += i & -i
+
+    def find(self, position):
+        """
+        Returns the index of the layer the piece at the given position
+        belongs to and the index of the piece within the layer.
+        """
+        i = 0
+        step = self.step
+        while step:
+            j = i + step
+            if j <= self.n and self.tree[j] <= position:
+                i = j
+                position -= self.tree[j]
+            step //= 2
+        return i, position
+
+
+class _SlownessBatch(object):
+    """
+    Adds slownesses to the sampling of a SlownessModel like a sequence of
+    SlownessModel.addSlowness calls, but leaves the layer lists alone until
+    apply. Meanwhile, every split layer is kept as the list of pieces it was
+    split into, shared by both wave types for the layers of fluids, so
+    looking up the layers containing a slowness doesn't need the current
+    lists and apply rebuilds each list once, instead of inserting into them
+    for every split.
+
+    iterLayers walks the current, split, layers the way a for loop over the
+    layer list would while addSlowness is called in its body, so a check
+    pass gives the same layers as with addSlowness.
+    """
+    def __init__(self, sMod):
+        self.sMod = sMod
+        self.layers = {True: sMod.PLayers, False: sMod.SLayers}
+        self.counts = dict((isPWave, _LayerCounts(len(layers)))
+                           for isPWave, layers in self.layers.items())
+        # The indices of each layer in the lists it is in, and the pieces of
+        # the split layers, by id of the original layer.
+        self.indices = {}
+        for isPWave, layers in self.layers.items():
+            for i, layer in enumerate(layers):
+                self.indices.setdefault(id(layer), []).append((isPWave, i))
+        self.pieces = {}
+
+    def iterLayers(self, isPWave):
+        """
+        Yields the layers of the given wave type, including the pieces of
+        layers split before or while iterating.
+        """
+        layers = self.layers[isPWave]
+        counts = self.counts[isPWave]
+        position = 0
+        while position < counts.total:
+            i, j = counts.find(position)
+            position += 1
+            pieces = self.pieces.get(id(layers[i]))
+            yield pieces[j] if pieces else layers[i]
+
+    def addSlowness(self, p, isPWave):
+        """
+        Same as SlownessModel.addSlowness.
+        """
+        sMod = self.sMod
+        if sMod._counts is not None:
+            sMod._counts["calls"]["addSlowness"] += 1
+        layers = self.layers[isPWave]
+        splits = []
+        # The pieces of a layer only contain p if the layer does.
+        for i in layers.findSlowness(p):
+            pieces = self.pieces.get(id(layers[i]))
+            j = _findPiece(pieces, p) if pieces else 0
+            if j is None:
+                continue
+            sLayer = pieces[j] if pieces else layers[i]
+            topVelocity, botVelocity = sMod._splitVelocities(sLayer, isPWave)
+            if not isPWave:
+                if sMod.allowInnerCoreS is False \
+                        and sLayer.botDepth > sMod.vMod.iocbDepth:
+                    break
+                elif topVelocity == 0:
+                    continue
+            splits.append((layers[i], j, sLayer, topVelocity, botVelocity))
+        for layer, j, sLayer, topVelocity, botVelocity in splits:
+            split = sMod._splitLayer(sLayer, p, topVelocity, botVelocity)
+            if split is None:
+                continue
+            pieces = self.pieces.setdefault(id(layer), [layer])
+            pieces[j:j + 1] = split
+            for otherIsPWave, index in self.indices[id(layer)]:
+                self.counts[otherIsPWave].add(index)
+            if sMod._counts is not None:
+                sMod._counts["layer_splits"] += len(self.indices[id(layer)])
+
+    def apply(self):
+        """
+        Replaces the layer lists of the SlownessModel by ones with the
+        pieces of the split layers, in one sweep over each.
+        """
+        for isPWave, layers in self.layers.items():
+            split = SlownessLayerList()
+            for layer in layers:
+                pieces = self.pieces.get(id(layer))
+                if pieces:
+                    split.extend(pieces)
+                else:
+                    split.append(layer)
+            if isPWave:
+                self.sMod.PLayers = split
+            else:
+                self.sMod.SLayers = split
+
+
+def _findPiece(pieces, p):
+    """
+    Returns the index of the piece of a split layer that strictly contains
+    the ray parameter p, or None if p is at a boundary of the pieces.
+    """
+    direction = 1 if pieces[0].topP > pieces[-1].botP else -1
+    low = 0
+    high = len(pieces) - 1
+    while low < high:
+        mid = (low + high) // 2
+        if direction * (pieces[mid].botP - p) < 0:
+            high = mid
+        else:
+            low = mid + 1
+    layer = pieces[low]
+    if (layer.topP - p) * (p - layer.botP) > 0:
+        return low
+    return None
@@ -4,6 +4,8 @@ from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 from future.builtins import *
 
+import numpy as np
+
 from taupy.helper_classes import TauModelError, TimeDist, SlownessModelError
 from taupy.SlownessLayer import SlownessLayer
 
@@ -33,10 +35,15 @@ class TauBranch(object):
     def __eq__(self, other):
         return self.__dict__ == other.__dict__
 
-    def createBranch(self, sMod, minPSoFar, rayParams):
+    def createBranch(self, sMod, minPSoFar, rayParams, reuse=None):
         """
         Calculates tau for this branch, between slowness layers topLayerNum and
         botLayerNum, inclusive.
+
+        :param reuse: Tuple of a branch created from the same slowness layers
+            with the same minPSoFar and of the ray parameters it was created
+            for. Its values are taken for the ray parameters in both, and
+            only the others are calculated.
         """
         topLayerNum = sMod.layerNumberBelow(self.topDepth, self.isPWave)
         botLayerNum = sMod.layerNumberAbove(self.botDepth, self.isPWave)
@@ -70,31 +77,75 @@ class TauBranch(object):
                                                        self.isPWave)
         self.minRayParam = sMod.getMinRayParam(self.botDepth, self.isPWave)
 
-        timeDist = [self.calcTimeDist(sMod, topLayerNum, botLayerNum, p)
-                    for p in rayParams]
-        self.dist = [_t.distRadian for _t in timeDist]
-        self.time = [_t.time for _t in timeDist]
-        # This would maybe be easier using numpy arrays?
-        self.tau = [time - p * dist for (time, dist, p)
-                    in zip(self.time, self.dist, rayParams)]
+        rayParams = np.asarray(rayParams, dtype=np.float64)
+        if reuse is None:
+            time, dist = self.calcTimeDists(sMod, topLayerNum, botLayerNum,
+                                            rayParams)
+        else:
+            oldBranch, oldRayParams = reuse
+            # Both are strictly decreasing.
+            oldRayParams = np.asarray(oldRayParams, dtype=np.float64)
+            index = np.minimum(np.searchsorted(-oldRayParams, -rayParams),
+                               len(oldRayParams) - 1)
+            found = oldRayParams[index] == rayParams
+            time = np.empty(len(rayParams))
+            dist = np.empty(len(rayParams))
+            time[found] = np.take(oldBranch.time, index[found])
+            dist[found] = np.take(oldBranch.dist, index[found])
+            if not found.all():
+                time[~found], dist[~found] = self.calcTimeDists(
+                    sMod, topLayerNum, botLayerNum, rayParams[~found])
+        self.dist = dist.tolist()
+        self.time = time.tolist()
+        self.tau = (time - rayParams * dist).tolist()
 
     def calcTimeDist(self, sMod, topLayerNum, botLayerNum, p):
         timeDist = TimeDist(p)
         if p <= self.maxRayParam:
-            layerNum = topLayerNum
-            layer = sMod.getSlownessLayer(layerNum, self.isPWave)
-            while layerNum <= botLayerNum \
-                    and p <= layer.topP \
-                    and p <= layer.botP:
-                timeDist.add(sMod.layerTimeDist(p, layerNum, self.isPWave))
-                layerNum += 1
-                if layerNum <= botLayerNum:
-                    layer = sMod.getSlownessLayer(layerNum, self.isPWave)
-            if (layer.topP - p) * (p - layer.botP) > 0:
+            layers = sMod.getLayerArray(self.isPWave)[
+                topLayerNum:botLayerNum + 1]
+            # The ray passes through the layers down to the first one it
+            # can't penetrate.
+            blocked = (p > layers[:, 0]) | (p > layers[:, 2])
+            numLayers = np.argmax(blocked) if blocked.any() else len(layers)
+            timeDist.time, timeDist.distRadian = _sum(*sMod.layerTimeDists(
+                p, np.arange(topLayerNum, topLayerNum + numLayers),
+                self.isPWave))
+            layer = layers[min(numLayers, len(layers) - 1)]
+            if (layer[0] - p) * (p - layer[2]) > 0:
                 raise SlownessModelError(
                     "Ray turns in the middle of this layer!")
         return timeDist
 
+    def calcTimeDists(self, sMod, topLayerNum, botLayerNum, rayParams):
+        """
+        calcTimeDist for an array of ray parameters at once. The increments
+        are calculated for the whole (ray parameter x layer) matrix, leaving
+        out the layers below the one where each ray turns, and then summed
+        over the layers. Returns arrays of the times and distances.
+        """
+        layerNums = np.arange(topLayerNum, botLayerNum + 1)
+        layers = sMod.getLayerArray(self.isPWave)[layerNums]
+        p = rayParams[:, np.newaxis]
+        # A ray passes through the layers down to the first one it can't
+        # penetrate, and through none if it can't enter the branch at all.
+        passes = np.logical_and.accumulate(
+            (p <= layers[:, 0]) & (p <= layers[:, 2]), axis=1)
+        inBranch = rayParams <= self.maxRayParam
+        passes &= inBranch[:, np.newaxis]
+        rays, cols = np.nonzero(passes)
+        time = np.zeros(passes.shape)
+        dist = np.zeros(passes.shape)
+        time[rays, cols], dist[rays, cols] = sMod.layerTimeDists(
+            rayParams[rays], layerNums[cols], self.isPWave)
+        layer = layers[np.minimum(passes.sum(axis=1), len(layers) - 1)]
+        if np.any(inBranch & ((layer[:, 0] - rayParams) *
+                              (rayParams - layer[:, 2]) > 0)):
+            raise SlownessModelError("Ray turns in the middle of this layer!")
+        # Sum in order, as calcTimeDist does.
+        return (np.add.accumulate(time, axis=1)[:, -1],
+                np.add.accumulate(dist, axis=1)[:, -1])
+
     def insert(self, rayParam, sMod, index):
         """
         Inserts the distance, time, and tau increment for the slowness sample
@@ -111,29 +162,27 @@ class TauBranch(object):
                 "TauBranch depths not compatible with slowness sampling.")
         td = TimeDist(rayParam, 0, 0)
         if topSLayer.botP >= rayParam and topSLayer.topP >= rayParam:
-            for i in range(botLayerNum + 1):
-                if sMod.getSlownessLayer(i, self.isPWave).botP < rayParam:
-                    # So we don't sum below the turning depth.
-                    break
-                else:
-                    temptd = sMod.layerTimeDist(rayParam, i, self.isPWave)
-                    td.distRadian += temptd.distRadian
-                    td.time += temptd.time
+            # So we don't sum below the turning depth.
+            turned = sMod.getLayerArray(self.isPWave)[:botLayerNum + 1, 2] \
+                < rayParam
+            numLayers = np.argmax(turned) if turned.any() else botLayerNum + 1
+            td.time, td.distRadian = _sum(*sMod.layerTimeDists(
+                rayParam, np.arange(numLayers), self.isPWave))
         self.shiftBranch(index)
         self.dist[index] = td.distRadian
         self.time[index] = td.time
         self.tau[index] = td.time - rayParam * td.distRadian
 
     def shiftBranch(self, index):
-        newDist = self.dist[:index]
+        newDist = list(self.dist[:index])
         newDist.append(0)
         newDist += self.dist[index:]
         self.dist = newDist
-        newTime = self.time[:index]
+        newTime = list(self.time[:index])
         newTime.append(0)
         newTime += self.time[index:]
         self.time = newTime
-        newTau = self.tau[:index]
+        newTau = list(self.tau[:index])
         newTau.append(0)
         newTau += self.tau[index:]
         self.tau = newTau
@@ -309,15 +358,12 @@ class TauBranch(object):
             sLayerNum = topLayerNum
             sLayer = sMod.getSlownessLayer(sLayerNum, self.isPWave)
             while sLayer.botP >= rayParam and sLayerNum <= botLayerNum:
-                if not sLayer.hasZeroThickness():
-                    thePath[pathIndex] = sMod.layerTimeDist(rayParam,
-                                                            sLayerNum,
-                                                            self.isPWave)
-                    thePath[pathIndex].depth = sLayer.botDepth
-                    pathIndex += 1
                 sLayerNum += 1
                 if sLayerNum <= botLayerNum:
                     sLayer = sMod.getSlownessLayer(sLayerNum, self.isPWave)
+            pathIndex = self._addPath(
+                thePath, pathIndex, sMod, rayParam,
+                np.arange(topLayerNum, sLayerNum), downgoing)
             if sLayerNum <= botLayerNum and not sLayer.hasZeroThickness():
                 turnDepth = sLayer.bullenDepthFor(rayParam, sMod.radiusOfEarth)
                 turnSLayer = SlownessLayer(sLayer.topP, sLayer.topDepth,
@@ -345,19 +391,41 @@ class TauBranch(object):
                 sLayerNum -= 1
                 if sLayerNum >= topLayerNum:
                     sLayer = sMod.getSlownessLayer(sLayerNum, self.isPWave)
-            while sLayerNum >= topLayerNum:
-                if not sLayer.hasZeroThickness():
-                    thePath[pathIndex] = sMod.layerTimeDist(rayParam,
-                                                            sLayerNum,
-                                                            self.isPWave)
-                    thePath[pathIndex].depth = sLayer.topDepth
-                    pathIndex += 1
-                sLayerNum -= 1
-                if sLayerNum >= topLayerNum:
-                    sLayer = sMod.getSlownessLayer(sLayerNum, self.isPWave)
+            pathIndex = self._addPath(
+                thePath, pathIndex, sMod, rayParam,
+                np.arange(sLayerNum, topLayerNum - 1, -1), downgoing)
         tempPath = thePath[0:pathIndex]
         return tempPath
 
+    def _addPath(self, thePath, pathIndex, sMod, rayParam, layerNums,
+                 downgoing):
+        """
+        Puts the time and distance increments through the given layers, except
+        zero thickness ones, into thePath from pathIndex on, together with
+        the depth the ray leaves each layer at. Returns the next pathIndex.
+        """
+        layers = sMod.getLayerArray(self.isPWave)[layerNums]
+        thick = layers[:, 1] != layers[:, 3]
+        time, distRadian = sMod.layerTimeDists(rayParam, layerNums[thick],
+                                               self.isPWave)
+        depths = layers[thick, 3 if downgoing else 1]
+        for t, d, depth in zip(time.tolist(), distRadian.tolist(),
+                               depths.tolist()):
+            thePath[pathIndex] = TimeDist(rayParam, t, d, depth)
+            pathIndex += 1
+        return pathIndex
+
+
+def _sum(time, distRadian):
+    """
+    Sums arrays of time and distance increments in order, like adding them
+    up one by one does.
+    """
+    if len(time) == 0:
+        return 0, 0
+    return (float(np.add.accumulate(time)[-1]),
+            float(np.add.accumulate(distRadian)[-1]))
+
 
 
 
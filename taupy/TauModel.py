@@ -6,10 +6,14 @@ from future.builtins import *
 
 from taupy.helper_classes import SlownessModelError, TauModelError
 from taupy.TauBranch import TauBranch
+from collections import OrderedDict
 from itertools import count
 from math import pi
 import pickle
 from copy import deepcopy
+import threading
+
+import numpy as np
 
 
 class TauModel(object):
@@ -30,8 +34,21 @@ class TauModel(object):
     # happens to fall on a real discontinuity then then it is not
     # included.
     noDisconDepths = []
+    # Source depth corrected variants of this model, a DepthCache that is
+    # looked up by loadFromDepthCache and filled by depthCorrect.
+    depthCache = None
+    # SeismicPhases calculated for this (depth corrected) model by name,
+    # reused by TauP_Time if it is not None. Set by DepthCache.put.
+    phaseCache = None
 
-    def __init__(self, sMod, spherical=True, debug=False):
+    def __init__(self, sMod, spherical=True, debug=False, processes=1,
+                 oldModel=None):
+        """
+        :param processes: Number of processes to create the tau branches
+            with, see calcTauIncFrom.
+        :param oldModel: TauModel to reuse the branches of, see
+            calcTauIncFrom.
+        """
         self.debug = debug
         self.radiusOfEarth = 6371.0
         # True if this is a spherical slowness model. False if flat.
@@ -50,11 +67,21 @@ class TauModel(object):
         self.tauBranches = [[], []]
 
         self.sMod = sMod
-        self.calcTauIncFrom()
+        self.calcTauIncFrom(processes, oldModel)
 
-    def calcTauIncFrom(self):
+    def calcTauIncFrom(self, processes=1, oldModel=None):
         """
         Calculates tau for each branch within a slowness model.
+
+        :param processes: Number of processes to create the branches with.
+            With 1, they are created one after the other in this process,
+            otherwise on a multiprocessing pool of that size, or of one
+            process per CPU for None. The branches are the same either way.
+        :param oldModel: TauModel whose slowness model shares slowness layers
+            with this one, e.g. the one this was rebuilt from. A branch
+            with the same slowness layers and maximum ray parameter as one
+            of its branches takes the values for the ray parameters both
+            models have from it, see TauBranch.createBranch.
         """
         # First, we must have at least 1 slowness layer to calculate a
         #  distance. Otherwise we must signal an exception.
@@ -106,6 +133,16 @@ class TauModel(object):
         self.rayParams = tempRayParams[:rayNum]
         if self.debug:
             print("Number of slowness samples for tau:" + str(rayNum))
+        # The branches only depend on the slowness model, the ray
+        # parameters and the minimum slowness above them, so first collect
+        # what is needed to create each of them.
+        branchNums = []
+        branchArgs = []
+        oldBranches = {}
+        if oldModel is not None:
+            for branch in oldModel.tauBranches[0] + oldModel.tauBranches[1]:
+                oldBranches[branch.topDepth, branch.botDepth,
+                            branch.isPWave] = branch
         for waveNum, isPWave in enumerate([True, False]):
             # The minimum slowness seen so far.
             minPSoFar = self.sMod.getSlownessLayer(0, isPWave).topP
@@ -119,11 +156,16 @@ class TauModel(object):
                     if isPWave else topCritDepth.sLayerNum
                 botCritLayerNum = (botCritDepth.pLayerNum if isPWave
                                    else botCritDepth.sLayerNum) - 1
-                self.tauBranches[waveNum][critNum] = \
-                    TauBranch(topCritDepth.depth, botCritDepth.depth, isPWave)
-                self.tauBranches[waveNum][critNum].DEBUG = self.debug
-                self.tauBranches[waveNum][critNum].createBranch(
-                    self.sMod, minPSoFar, self.rayParams)
+                branchNums.append((waveNum, critNum))
+                reuse = None
+                oldBranch = oldBranches.get((topCritDepth.depth,
+                                             botCritDepth.depth, isPWave))
+                if oldBranch is not None \
+                        and oldBranch.maxRayParam == minPSoFar \
+                        and self._sameLayers(oldModel.sMod, oldBranch):
+                    reuse = (oldBranch, oldModel.rayParams)
+                branchArgs.append((topCritDepth.depth, botCritDepth.depth,
+                                   isPWave, minPSoFar, self.debug, reuse))
                 # Update minPSoFar. Note that the new minPSoFar could be at
                 # the start of a discontinuity over a high slowness zone,
                 # so we need to check the top, bottom and the layer just
@@ -137,6 +179,20 @@ class TauModel(object):
                     self.sMod.layerNumberAbove(botCritDepth.depth, isPWave),
                     isPWave)
                 minPSoFar = min(minPSoFar, botSLayer.botP)
+        if processes == 1:
+            branches = [_createBranch(self.sMod, self.rayParams, *args)
+                        for args in branchArgs]
+        else:
+            import multiprocessing
+            pool = multiprocessing.Pool(processes, _initBranchWorker,
+                                        (self.sMod, self.rayParams))
+            try:
+                branches = pool.map(_createBranchInWorker, branchArgs)
+            finally:
+                pool.close()
+                pool.join()
+        for (waveNum, critNum), tBranch in zip(branchNums, branches):
+            self.tauBranches[waveNum][critNum] = tBranch
         # Here we decide which branches are the closest to the Moho, CMB,
         # and IOCB by comparing the depth of the top of the branch with the
         # depths in the Velocity Model.
@@ -161,10 +217,45 @@ class TauModel(object):
         if not self.validate():
             raise TauModelError("TauModel.calcTauIncFrom: Validation failed!")
 
+    def _sameLayers(self, oldSMod, branch):
+        """
+        Checks whether the slowness model has the same slowness layers
+        between the top and bottom depth of the branch as the old one, see
+        TauBranch.createBranch.
+        """
+        layers = []
+        for sMod in [oldSMod, self.sMod]:
+            top = sMod.layerNumberBelow(branch.topDepth, branch.isPWave)
+            bot = sMod.layerNumberAbove(branch.botDepth, branch.isPWave)
+            layers.append(sMod.getLayerArray(branch.isPWave)[top:bot + 1])
+        return np.array_equal(*layers)
+
+    def rebuild(self, vMod, processes=1):
+        """
+        Returns a TauModel of vMod, a perturbed version of the velocity model
+        of this one, e.g. in an inversion. Only the part of the slowness
+        model that changed is sampled anew, see SlownessModel.resample, and
+        branches whose slowness layers did not change only calculate the
+        ray parameters that are new.
+        """
+        return TauModel(self.sMod.resample(vMod), self.spherical,
+                        self.debug, processes, oldModel=self)
+
     def writeModel(self, outfile):
         with open(outfile, 'w+b') as f:
             pickle.dump(self, f, protocol=-1)
 
+    def writeArrays(self, outfile, slim=False, dtype="float64"):
+        """
+        Writes the model in the version independent array format, see
+        taupy.model_arrays. With slim=True only what queries need is
+        written, which gives a smaller file that can't be used to create
+        new models from. dtype="float32" stores the branch tables in single
+        precision.
+        """
+        from taupy.model_arrays import write_model
+        write_model(self, outfile, slim=slim, dtype=dtype)
+
     def __str__(self):
         desc = "Delta tau for each slowness sample and layer.\n"
         for j, rayParam in enumerate(self.rayParams):
@@ -207,13 +298,15 @@ class TauModel(object):
             depthCorrected.sourceDepth = depth
             depthCorrected.sourceBranch = depthCorrected.findBranch(depth)
             depthCorrected.validate()
-            # Put in cache somehow: self.depthCache.put(depthCorrected)
+            if self.depthCache is not None:
+                self.depthCache.put(depthCorrected)
         return depthCorrected
 
     def loadFromDepthCache(self, depth):
-        # Could speed up by implementing cache.
         # Must return None if loading fails.
-        return None
+        if self.depthCache is None:
+            return None
+        return self.depthCache.get(depth)
 
     def splitBranch(self, depth):
         """
@@ -232,7 +325,7 @@ class TauModel(object):
         indexS = -1
         SWaveRayParam = -1
         outSMod = self.sMod
-        outRayParams = deepcopy(self.rayParams)  # necessary?
+        outRayParams = list(self.rayParams)  # necessary?
         oldRayParams = self.rayParams
         # Do S wave first since the S ray param is > P ray param.
         for isPWave in [False, True]:
@@ -246,9 +339,10 @@ class TauModel(object):
                 for index, trp, brp in zip(count(), oldRayParams[:-1],
                                            oldRayParams[1:]):
                     if trp < newRayParam < brp:
-                        outRayParams = oldRayParams[:index]
+                        outRayParams = list(oldRayParams[:index])
                         outRayParams.append(newRayParam)
-                        outRayParams = outRayParams + oldRayParams[index:]
+                        outRayParams = outRayParams + list(
+                            oldRayParams[index:])
                         if isPWave:
                             indexP = index
                             PWaveRayParam = newRayParam
@@ -359,3 +453,77 @@ class TauModel(object):
         branchDepths += [self.getTauBranch(
             i - 1, True).botDepth for i in range(1,len(self.tauBranches[0]))]
         return branchDepths
+
+
+def _createBranch(sMod, rayParams, topDepth, botDepth, isPWave, minPSoFar,
+                  debug, reuse=None):
+    tBranch = TauBranch(topDepth, botDepth, isPWave)
+    tBranch.DEBUG = debug
+    tBranch.createBranch(sMod, minPSoFar, rayParams, reuse)
+    return tBranch
+
+
+# The slowness model and ray parameters of a worker process of
+# TauModel.calcTauIncFrom, so they are only sent once per process.
+_branchWorkerArgs = None
+
+
+def _initBranchWorker(sMod, rayParams):
+    global _branchWorkerArgs
+    _branchWorkerArgs = (sMod, rayParams)
+
+
+def _createBranchInWorker(args):
+    return _createBranch(*(_branchWorkerArgs + args))
+
+
+class DepthCache(object):
+    """
+    The most recently used depth corrected variants of a TauModel, see
+    TauModel.depthCorrect.
+
+    Everything cached is derived from the one TauModel the cache is attached
+    to, so replacing that model also drops its cache. The cache is not
+    copied along with the model.
+    """
+    def __init__(self, max_size=32):
+        """
+        :param max_size: Maximum number of depths to keep. None means no
+            limit.
+        """
+        self.max_size = max_size
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._models)
+
+    def __deepcopy__(self, memo):
+        # Depth corrected copies of a model don't get a cache of their own.
+        return None
+
+    def get(self, depth):
+        """
+        Returns the model corrected for the given source depth, or None.
+        """
+        with self._lock:
+            tMod = self._models.pop(float(depth), None)
+            if tMod is not None:
+                self._models[float(depth)] = tMod
+        return tMod
+
+    def put(self, tMod):
+        """
+        Adds a depth corrected model, giving it an empty phase cache.
+        """
+        tMod.phaseCache = {}
+        with self._lock:
+            self._models.pop(float(tMod.sourceDepth), None)
+            self._models[float(tMod.sourceDepth)] = tMod
+            while self.max_size is not None \
+                    and len(self._models) > self.max_size:
+                self._models.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
@@ -7,18 +7,60 @@ from future.builtins import *
 import os
 import pickle
 
-from .utils import _get_model_filename
+from .model_arrays import is_array_model, read_model
+from .model_bundle import read_bundle_model, read_toc
+from .utils import (_get_array_model_filename, _get_bundle_filename,
+                    _get_model_filename)
 
 
-def load(model_name):
+def find_model(model_name):
     """
-    Load a pickled model. It first tries to load a TauPy internal model with
-    the given name. Otherwise it is treated as a filename.
+    Returns the file load would read for the given model name and, if that
+    file is a bundle, the name of the model in the bundle, else None.
+
+    Only bare names, e.g. "iasp91", are looked up among the internal
+    models. Paths and the names of existing files are read as they are,
+    even if they are named like an internal model.
     """
-    #
+    if os.sep in model_name or os.path.exists(model_name):
+        return model_name, None
+    filename = _get_array_model_filename(model_name)
+    if os.path.exists(filename):
+        return filename, None
+    bundle = _get_bundle_filename()
+    name = os.path.splitext(os.path.basename(model_name))[0]
+    if os.path.exists(bundle) and name in read_toc(bundle):
+        return bundle, name
     filename = _get_model_filename(model_name)
     if not os.path.exists(filename):
         filename = model_name
+    return filename, None
+
+
+def find_model_file(model_name):
+    """
+    Returns the file load would read for the given model name.
+    """
+    return find_model(model_name)[0]
 
+
+def load(model_name, mmap=False, lazy=True):
+    """
+    Load a model. It first tries to load a TauPy internal model with the
+    given name, preferring the version independent array format (a single
+    model file, then the bundle of internal models) over the pickle of the
+    running Python version. Otherwise it is treated as a filename, which
+    can be either a pickle or an array model.
+
+    :param mmap: Memory map array models instead of reading them, see
+        taupy.model_arrays.read_model. Ignored for pickles.
+    :param lazy: Only create the slowness and velocity layers of array
+        models when they are first used. Ignored for pickles.
+    """
+    filename, bundled = find_model(model_name)
+    if bundled is not None:
+        return read_bundle_model(filename, bundled, mmap=mmap, lazy=lazy)
+    if is_array_model(filename):
+        return read_model(filename, mmap=mmap, lazy=lazy)
     with open(filename, 'rb') as f:
         return pickle.load(f)
@@ -4,9 +4,11 @@ from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 from future.builtins import *
 
+from collections import OrderedDict
+from copy import deepcopy
+import json
 import os
-import inspect
-import argparse
+import time
 from taupy.VelocityModel import VelocityModel
 from taupy.SlownessModel import SlownessModel
 from taupy.TauModel import TauModel
@@ -20,10 +22,13 @@ class TauP_Create(object):
     pp 1271-1302. This creates the SlownessModel and tau branches and
     saves them for later use.
     """
+    # Timings and counters of the last createTauModel with report=True.
+    report = None
+
     def __init__(self, input_filename, output_filename, verbose=False,
                  min_delta_p=0.1, max_delta_p=11.0, max_depth_interval=115.0,
                  max_range_interval=2.5, max_interp_error=0.05,
-                 allow_inner_core_s=True):
+                 allow_inner_core_s=True, processes=1, minimal=False):
         self.input_filename = input_filename
         self.output_filename = output_filename
         self.debug = verbose
@@ -33,6 +38,12 @@ class TauP_Create(object):
         self.max_range_interval = max_range_interval
         self.max_interp_error = max_interp_error
         self.allow_inner_core_s = allow_inner_core_s
+        # Sample only as densely as max_interp_error and max_range_interval
+        # require, see SlownessModel.createSample.
+        self.minimal = minimal
+        # Number of processes to create the tau branches with, see
+        # TauModel.calcTauIncFrom. Doesn't change the model.
+        self.processes = processes
 
     def loadVMod(self):
         """ Tries to load a velocity model via readVelocityFile from the
@@ -64,9 +75,17 @@ class TauP_Create(object):
         #    print("velocity mode: " + self.vMod)
         return self.vMod
 
-    def createTauModel(self, vMod):
+    def createTauModel(self, vMod, report=False):
         """ Takes a velocity model and makes a slowness model out of it,
-        then passes that to TauModel. """
+        then passes that to TauModel.
+
+        :param report: If True, the report attribute is set to an
+            OrderedDict of the "model" name, the creation "params", the
+            report of SlownessModel.createSample with the time of
+            TauModel.calcTauIncFrom and the "total" time added to its
+            "times", and the final number of "ray_params".
+        """
+        start = time.time()
         if vMod is None:
             raise ValueError("vMod is None.")
         if vMod.isSpherical is False:
@@ -81,7 +100,8 @@ class TauP_Create(object):
             vMod, self.min_delta_p, self.max_delta_p, self.max_depth_interval,
             self.max_range_interval * pi / 180.0, self.max_interp_error,
             self.allow_inner_core_s,
-            SlownessModel.DEFAULT_SLOWNESS_TOLERANCE)
+            SlownessModel.DEFAULT_SLOWNESS_TOLERANCE, report=report,
+            minimal=self.minimal)
         if self.debug:
             print("Parameters are:")
             print("taup.create.min_delta_p = " + str(self.sMod.minDeltaP) +
@@ -96,6 +116,7 @@ class TauP_Create(object):
                   str(self.sMod.maxInterpError) + " seconds")
             print("taup.create.allowInnerCoreS = " +
                   str(self.sMod.allowInnerCoreS))
+            print("taup.create.minimal = " + str(self.sMod.minimal))
             print("Slow model " + " " + str(self.sMod.getNumLayers(True)) +
                   " P layers," + str(self.sMod.getNumLayers(False)) +
                   " S layers")
@@ -105,16 +126,32 @@ class TauP_Create(object):
         TauModel.DEBUG = self.debug
         SlownessModel.DEBUG = self.debug
         # Creates tau model from slownesses.
-        return TauModel(self.sMod)
+        tauStart = time.time()
+        tMod = TauModel(self.sMod, processes=self.processes)
+        if report:
+            from taupy.model_cache import CREATE_PARAMS
+            self.report = OrderedDict([
+                ("model", vMod.modelName),
+                ("params", OrderedDict((name, getattr(self, name))
+                                       for name in CREATE_PARAMS))])
+            self.report.update(deepcopy(self.sMod.report))
+            self.report["times"]["calcTauIncFrom"] = time.time() - tauStart
+            self.report["times"]["total"] = time.time() - start
+            self.report["ray_params"] = len(tMod.rayParams)
+        return tMod
 
-    def run(self):
+    def run(self, report=False):
         """ Creates a tau model from a velocity model. Called by
         TauP_Create.main after loadVMod; calls createTauModel and
         writes the result to a .taup file in ./data/taup_models/ (if not
         specified differently).
+
+        :param report: Also write the timings and counters of the creation,
+            see createTauModel, as JSON next to the model, to the output
+            filename with the extension replaced by .report.json.
         """
         try:
-            self.tMod = self.createTauModel(self.vMod)
+            self.tMod = self.createTauModel(self.vMod, report)
             # this reassigns tMod! Used to be TauModel() class,
             # now it's an instance of it.
             if self.debug:
@@ -122,9 +159,15 @@ class TauP_Create(object):
 
             if not os.path.exists(os.path.dirname(self.output_filename)):
                 os.makedirs(os.path.dirname(self.output_filename))
-            self.tMod.writeModel(self.output_filename)
+            if self.output_filename.endswith(os.path.extsep + "taupy"):
+                self.tMod.writeArrays(self.output_filename)
+            else:
+                self.tMod.writeModel(self.output_filename)
             if self.debug:
                 print("Done Saving " + self.output_filename)
+            if report:
+                with open(report_filename(self.output_filename), "w") as f:
+                    json.dump(self.report, f, indent=1)
         except IOError as e:
             print("Tried to write!\n Caught IOError. Do you have write "
                   "permission in this directory?", e)
@@ -135,7 +178,15 @@ class TauP_Create(object):
                 print("Method run is done, but not necessarily successful.")
 
 
+def report_filename(output_filename):
+    """
+    Returns the name of the report TauP_Create.run writes for a model.
+    """
+    return os.path.splitext(output_filename)[0] + ".report.json"
+
+
 if __name__ == '__main__':
+    import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument('-v', '--verbose', '-d', '--debug',
                         action='store_true',
@@ -151,9 +202,16 @@ if __name__ == '__main__':
     parser.add_argument('-mod', '--filename',
                         help='the velocity model name '
                              '(default: iasp91.tvel)')
+    parser.add_argument('--minimal', action='store_true',
+                        help='only sample as densely as the interpolation '
+                             'error and range interval require')
+    parser.add_argument('--report', action='store_true',
+                        help='write timings and counters of the creation '
+                             'next to the model')
     args = parser.parse_args()
 
     tauPCreate = TauP_Create(modelFilename=args.mod, output_dir=args.o,
-                             input_dir=args.i, verbose=args.verbose)
+                             input_dir=args.i, verbose=args.verbose,
+                             minimal=args.minimal)
     tauPCreate.loadVMod()
-    tauPCreate.run()
+    tauPCreate.run(report=args.report)
@@ -4,9 +4,6 @@ from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 from future.builtins import *
 
-import os
-import inspect
-import argparse
 import math
 
 import taupy.TauModelLoader as TauModelLoader
@@ -108,11 +105,19 @@ class TauP_Time(object):
                         newPhases.append(seismicPhase)
                         alreadyAdded = True
                         break
+            phaseCache = self.tModDepth.phaseCache
+            if not alreadyAdded and phaseCache is not None \
+                    and tempPhaseName in phaseCache:
+                # Calculated before for this model, see DepthCache.
+                newPhases.append(phaseCache[tempPhaseName])
+                alreadyAdded = True
             if not alreadyAdded:
                 # Didn't find it precomputed, so recalculate:
                 try:
                     seismicPhase = SeismicPhase(tempPhaseName, self.tModDepth)
                     newPhases.append(seismicPhase)
+                    if phaseCache is not None:
+                        phaseCache[tempPhaseName] = seismicPhase
                 except TauModelError:
                     print("Error with this phase, skipping it: " +
                           str(tempPhaseName))
@@ -187,6 +192,7 @@ class TauP_Time(object):
         """
         Reads the command line arguments, if present.
         """
+        import argparse
         parser = argparse.ArgumentParser()
         parser.add_argument('-v', '--verbose', '--debug',
                             action='store_true',
@@ -6,9 +6,13 @@ Package for storage and manipulation of seismic earth models.
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 from future.builtins import *
+from bisect import bisect_left, bisect_right
 import os
+import re
 import sys
 
+import numpy as np
+
 from taupy.header import TauPException
 from taupy.VelocityLayer import VelocityLayer
 
@@ -19,6 +23,11 @@ class VelocityModel(object):
     default_moho = 35
     default_cmb = 2889.0
     default_iocb = 5153.9
+    # The list of layers the depths were taken from and lists of the top and
+    # bottom depths of the layers, see _getDepthIndex.
+    _depthIndex = None
+    # Arrays of the layers for evaluate_above and evaluate_below.
+    _layerArrays = None
 
     def __init__(self, modelName="unknown",
                  radiusOfEarth=radiusOfEarth, mohoDepth=default_moho,
@@ -99,9 +108,15 @@ class VelocityModel(object):
 
         :returns: the layer number
         """
-        for i, layer in enumerate(self.layers):
-            if layer.topDepth < depth <= layer.botDepth:
-                return i
+        for rebuild in [False, True]:
+            botDepths = self._getDepthIndex(rebuild)[1]
+            layerNum = bisect_left(botDepths, depth)
+            # The index may be out of date if layers were changed in place,
+            # so make sure the layer really contains the depth.
+            if layerNum < len(self.layers) \
+                    and self.layers[layerNum].topDepth < depth \
+                    <= self.layers[layerNum].botDepth:
+                return layerNum
         raise TauPException("No such layer.")
 
     def layerNumberBelow(self, depth):
@@ -111,11 +126,65 @@ class VelocityModel(object):
 
         :returns: the layer number
         """
-        for i, layer in enumerate(self.layers):
-            if layer.topDepth <= depth < layer.botDepth:
-                return i
+        for rebuild in [False, True]:
+            topDepths = self._getDepthIndex(rebuild)[0]
+            layerNum = bisect_right(topDepths, depth) - 1
+            if 0 <= layerNum < len(self.layers) \
+                    and self.layers[layerNum].topDepth <= depth \
+                    < self.layers[layerNum].botDepth:
+                return layerNum
         raise TauPException("No such layer.")
 
+    def _getDepthIndex(self, rebuild=False):
+        """
+        Returns lists of the top and of the bottom depths of the layers to
+        bisect. They are cached for the list of layers, see clearCache.
+        """
+        if rebuild or self._depthIndex is None \
+                or self._depthIndex[0] is not self.layers \
+                or len(self._depthIndex[1]) != len(self.layers):
+            self._depthIndex = (self.layers,
+                                [layer.topDepth for layer in self.layers],
+                                [layer.botDepth for layer in self.layers])
+            self._layerArrays = None
+        return self._depthIndex[1:]
+
+    def _getLayerArrays(self):
+        """
+        Returns a dictionary of arrays of the top and bottom depths ("depth")
+        and values ("p", "s", "d") of the layers, cached like the depth index.
+        """
+        self._getDepthIndex()
+        if self._layerArrays is None:
+            arrays = {}
+            for key, top, bot in [
+                    ("depth", "topDepth", "botDepth"),
+                    ("p", "topPVelocity", "botPVelocity"),
+                    ("s", "topSVelocity", "botSVelocity"),
+                    ("d", "topDensity", "botDensity")]:
+                arrays[key] = np.array(
+                    [(getattr(layer, top), getattr(layer, bot))
+                     for layer in self.layers],
+                    dtype=np.float64).reshape(-1, 2)
+            self._layerArrays = arrays
+        return self._layerArrays
+
+    def clearCache(self):
+        """
+        Drops the depth index and layer arrays cached for evaluating the
+        model. Needed after changing the values of layers in place before
+        calling evaluate_above or evaluate_below, which use the cached
+        arrays. The other methods check the index themselves.
+        """
+        self._depthIndex = None
+        self._layerArrays = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_depthIndex", None)
+        state.pop("_layerArrays", None)
+        return state
+
     def evaluateAbove(self, depth, materialProperty):
 
         """Returns the value of the given material property, usually P or S
@@ -135,6 +204,49 @@ class VelocityModel(object):
         layer = self.layers[self.layerNumberBelow(depth)]
         return layer.evaluateAt(depth, materialProperty)
 
+    def evaluate_above(self, depths, materialProperty):
+        """
+        evaluateAbove for an array of depths at once, returns an array of the
+        values. See clearCache if layers have been changed in place.
+        """
+        return self._evaluate(depths, materialProperty, True)
+
+    def evaluate_below(self, depths, materialProperty):
+        """
+        evaluateBelow for an array of depths at once, returns an array of the
+        values. See clearCache if layers have been changed in place.
+        """
+        return self._evaluate(depths, materialProperty, False)
+
+    def _evaluate(self, depths, materialProperty, above):
+        materialProperty = materialProperty.lower()
+        if materialProperty in ("r", "d"):
+            materialProperty = "d"
+        elif materialProperty not in ("p", "s"):
+            raise TauPException("Unknown material property, use p, s, or d.")
+        arrays = self._getLayerArrays()
+        depths = np.asarray(depths, dtype=np.float64)
+        topDepth = arrays["depth"][:, 0]
+        botDepth = arrays["depth"][:, 1]
+        if above:
+            layerNums = np.searchsorted(botDepth, depths, side="left")
+        else:
+            layerNums = np.searchsorted(topDepth, depths, side="right") - 1
+        valid = (layerNums >= 0) & (layerNums < len(topDepth))
+        layerNums = np.where(valid, layerNums, 0)
+        top = topDepth[layerNums]
+        bot = botDepth[layerNums]
+        if above:
+            valid &= (top < depths) & (depths <= bot)
+        else:
+            valid &= (top <= depths) & (depths < bot)
+        if not valid.all():
+            raise TauPException("No such layer.")
+        values = arrays[materialProperty][layerNums]
+        # As in VelocityLayer.evaluateAt.
+        slope = (values[..., 1] - values[..., 0]) / (bot - top)
+        return slope * (depths - top) + values[..., 0]
+
     def depthAtTop(self, layerNumber):
         """ returns the depth at the top of the given layer. """
         layer = self.layers[layerNumber]
@@ -277,9 +389,8 @@ class VelocityModel(object):
         """
         Reads in a velocity file by given file name (must be a
         string). The type of file is determined from the file name
-        (changed from the java!). Calls readTVelFile.
+        (changed from the java!). Calls readTVelFile or readNDFile.
         Raises exception if the type of file cannot be determined.
-        .nd files are not currently supported!
         """
         # filename formatting
         if filename.endswith(".nd"):
@@ -293,9 +404,8 @@ class VelocityModel(object):
 
         # the actual reading of the velocity file
         if fileType.lower() == "nd":
-            raise NotImplementedError(".nd files are not curently supported."
-                                      "Sorry.")
-            #vMod = cls.readNDFile(filename)
+            # Fixes the discontinuities it doesn't name itself.
+            return cls.readNDFile(filename)
         elif fileType.lower() == "tvel":
             vMod = cls.readTVelFile(filename)
         else:
@@ -320,72 +430,24 @@ class VelocityModel(object):
         radiusOfEarth - the largest depth in the model
         meanDensity - 5517.0 G - 6.67e-11
         Comments using # are also allowed.
+
+        The whole file is converted and checked at once, see
+        layers_from_rows.
         """
-        layers = []
-        myLayerNumber = 0  # needed for calling the layer maker later
-
-        # Read all lines in the file. Each Layer needs top and bottom values,
-        # i.e. info from two lines.
-        with open(filename, 'rt') as f:
-            # skip first two lines as they should be the header
-            # (for line in itertools.islice(f, 2, None): also works,
-            # but less elegant)
-            f.readline()
-            f.readline()
-            # Read the first line to provide initial top values.
-            line = f.readline()
-            line = line.partition('#')[0]
-            line = line.rstrip()  # or just .strip()?'
-            columns = line.split()
-            topDepth = float(columns[0])
-            topPVel = float(columns[1])
-            topSVel = float(columns[2])
-            if topSVel > topPVel:
-                raise TauPException(
-                    "S velocity, ", topSVel, " at depth ", topDepth,
-                    " is greater than the P velocity, ", topPVel)
-            # if density is present,read it.
-            if len(columns) != 4:
-                raise ValueError("Top density not specified.")
-            topDensity = float(columns[3])
-
-                # Iterate over the rest of the file.
-            for line in f:
-                line = line.partition('#')[0]
-                # needs the other comment options
-                line = line.rstrip()  # or just .strip()?'
-                columns = line.split()
-                botDepth = float(columns[0])
-                botPVel = float(columns[1])
-                botSVel = float(columns[2])
-                if botSVel > botPVel:
-                    raise TauPException(
-                        "S velocity, ", botSVel, " at depth ", botDepth,
-                        " is greater than the P velocity, ", botPVel)
-                # if density is present,read it.
-                if len(columns) != 4:
-                    raise ValueError("Bottom density not specified.")
-                botDensity = float(columns[3])
-
-                if len(columns) > 4:
-                    raise TauPException("Your file has too much information. "
-                                        "Stick to 4 columns.")
-
-                tempLayer = VelocityLayer(
-                    myLayerNumber, topDepth, botDepth, topPVel, botPVel,
-                    topSVel, botSVel, topDensity, botDensity)
-                topDepth = botDepth
-                topPVel = botPVel
-                topSVel = botSVel
-                topDensity = botDensity
-                if tempLayer.topDepth != tempLayer.botDepth:
-                    # Don't use zero thickness layers, first order
-                    # discontinuities
-                    # are taken care of by storing top and bottom depths.
-                    layers.append(tempLayer)
-                    myLayerNumber += 1
-        radiusOfEarth = topDepth
-        maxRadius = topDepth
+        # skip first two lines as they should be the header
+        rows, names = _read_rows(filename, 2)
+        if names:
+            raise TauPException("Named discontinuities are not allowed in "
+                                "tvel files: " + ", ".join(
+                                    name for name, _ in names))
+        if rows.shape[1] < 4:
+            raise ValueError("Density not specified.")
+        if rows.shape[1] > 4:
+            raise TauPException("Your file has too much information. "
+                                "Stick to 4 columns.")
+        layers = layers_from_rows(rows)
+        radiusOfEarth = float(rows[-1, 0])
+        maxRadius = float(rows[-1, 0])
         modelName = os.path.basename(filename)  # remove leading path
         modelName = modelName[:-5]  # strip .tvel
         # I assume that this is a whole earth model
@@ -394,6 +456,62 @@ class VelocityModel(object):
                              cls.default_cmb, cls.default_iocb, 0,
                              maxRadius, True, layers)
 
+    @classmethod
+    def readNDFile(cls, filename):
+        """
+        Reads in a velocity model from a "nd" (named discontinuities) ASCII
+        text file. Each line has the depth, P velocity, S velocity and
+        density, optionally followed by Qp and Qs, with the values linear
+        in between. Lines with only a name, between the two lines of a
+        discontinuity, mark it: "mantle" (or "moho") for the moho,
+        "outer-core" (or "cmb") for the core mantle boundary and
+        "inner-core" (or "iocb") for the inner core outer core boundary.
+        Discontinuities that are not named are found by fixDisconDepths.
+        Comments using # are allowed.
+
+        The model name is the file name without ".nd", and the radius is
+        the largest depth in the model.
+        """
+        rows, names = _read_rows(filename)
+        if rows.shape[1] not in (4, 6):
+            raise TauPException(
+                "Lines of nd files need 4 columns (depth, P and S velocity, "
+                "density) or 6 (with Qp and Qs), not %i." % rows.shape[1])
+        depths = {}
+        rowNums = []
+        for name, rowNum in names:
+            key = _ND_NAMES.get(name.lower())
+            if key is None:
+                raise TauPException(
+                    "Unknown discontinuity '%s', use one of %s." % (
+                        name, ", ".join(sorted(_ND_NAMES))))
+            if rowNum == 0:
+                raise TauPException("Discontinuity '%s' is above the first "
+                                    "depth." % name)
+            depths[key] = float(rows[rowNum - 1, 0])
+            rowNums.append(rowNum)
+        # A name must be between the two rows of a discontinuity.
+        rowNums = np.array(rowNums, dtype=np.int_)
+        below = np.minimum(rowNums, len(rows) - 1)
+        notDiscon = rows[rowNums - 1, 0] != rows[below, 0]
+        notDiscon |= rowNums == len(rows)
+        if notDiscon.any():
+            name, rowNum = names[int(np.flatnonzero(notDiscon)[0])]
+            raise TauPException(
+                "Discontinuity '%s' is named at %g, which is not the depth "
+                "of a discontinuity." % (name, rows[rowNum - 1, 0]))
+        layers = layers_from_rows(rows)
+        modelName = os.path.basename(filename)[:-3]  # strip .nd
+        radiusOfEarth = float(rows[-1, 0])
+        vMod = VelocityModel(modelName, radiusOfEarth, cls.default_moho,
+                             cls.default_cmb, cls.default_iocb, 0,
+                             radiusOfEarth, True, layers)
+        if len(depths) < len(set(_ND_NAMES.values())):
+            vMod.fixDisconDepths()
+        for key, depth in depths.items():
+            setattr(vMod, key, depth)
+        return vMod
+
     def fixDisconDepths(self):
         """
         Resets depths of major discontinuities to match those existing in the
@@ -441,3 +559,102 @@ class VelocityModel(object):
                           if tempCmbDepth != tempIocbDepth
                           else self.radiusOfEarth)
         return changeMade
+
+
+# Names of discontinuities in nd files and the attributes they set.
+_ND_NAMES = {"mantle": "mohoDepth", "moho": "mohoDepth",
+             "outer-core": "cmbDepth", "cmb": "cmbDepth",
+             "inner-core": "iocbDepth", "iocb": "iocbDepth"}
+
+
+# Whether a byte is whitespace, as in bytes.split.
+_WHITESPACE = np.zeros(256, dtype=bool)
+_WHITESPACE[list(bytearray(b" \t\n\r\v\f"))] = True
+
+
+def _read_rows(filename, skip=0):
+    """
+    Reads the numbers of a velocity model file into an array with a row per
+    line, skipping the first lines, comments and empty lines. Returns the
+    array and a list of the names on lines of their own with the number of
+    the row below them.
+
+    The lines aren't looked at one by one: the tokens are counted per line
+    on the bytes of the file, and all numbers are converted at once.
+    """
+    with open(filename, "rb") as f:
+        for _ in range(skip):
+            f.readline()
+        data = f.read()
+    if b"#" in data:
+        data = re.sub(b"#[^\n]*", b"", data)
+    buf = np.frombuffer(data, dtype=np.uint8)
+    space = _WHITESPACE[buf]
+    starts = np.flatnonzero(~space & np.concatenate(([True], space[:-1])))
+    lineNums = np.cumsum(buf == ord("\n"))[starts]
+    tokens = data.split()
+    # Names start with a letter and are alone on their line. Other tokens,
+    # e.g. "nan" within a row, are left for the conversion to reject.
+    first = buf[starts] | 0x20
+    isName = (first >= ord("a")) & (first <= ord("z")) & (
+        np.bincount(lineNums)[lineNums] == 1)
+    numbers = [token for token, name in zip(tokens, isName) if not name] \
+        if isName.any() else tokens
+    counts = np.bincount(lineNums[~isName])
+    numColumns = np.unique(counts[counts > 0])
+    if len(numColumns) != 1:
+        raise TauPException("All lines of %s need the same number of "
+                            "columns." % filename)
+    try:
+        rows = np.array(numbers, dtype=np.float64)
+    except ValueError as e:
+        raise TauPException("Invalid number in %s: %s" % (filename, e))
+    notFinite = np.flatnonzero(~np.isfinite(rows))
+    if len(notFinite):
+        raise TauPException("Invalid number in %s: %s" % (
+            filename, numbers[notFinite[0]].decode("utf-8")))
+    rows = rows.reshape(-1, numColumns[0])
+    # The row below a name is the number of numbers before it divided by
+    # the number of columns.
+    names = [(tokens[i].decode("utf-8"),
+              int(np.sum(~isName[:i])) // numColumns[0])
+             for i in np.flatnonzero(isName)]
+    return rows, names
+
+
+def layers_from_rows(rows):
+    """
+    Returns the VelocityLayers between consecutive rows of depth, P
+    velocity, S velocity, density and optionally Qp and Qs, leaving out
+    the zero thickness ones at discontinuities. The rows are checked all at
+    once: depths must not decrease, P velocities must be positive and S
+    velocities must not be negative or greater than P velocities.
+    """
+    rows = np.asarray(rows, dtype=np.float64)
+    if len(rows) < 2:
+        raise TauPException("A velocity model needs at least two depths.")
+    bad = np.flatnonzero((rows[:, 1] <= 0) | (rows[:, 2] < 0))
+    if len(bad):
+        raise TauPException(
+            "Negative velocity at depth %s: P %s, S %s." % (
+                rows[bad[0], 0], rows[bad[0], 1], rows[bad[0], 2]))
+    bad = np.flatnonzero(rows[:, 2] > rows[:, 1])
+    if len(bad):
+        raise TauPException(
+            "S velocity, %s at depth %s is greater than the P velocity, %s"
+            % (rows[bad[0], 2], rows[bad[0], 0], rows[bad[0], 1]))
+    bad = np.flatnonzero(np.diff(rows[:, 0]) < 0)
+    if len(bad):
+        raise TauPException("Depth %s is above the depth before it, %s." % (
+            rows[bad[0] + 1, 0], rows[bad[0], 0]))
+    top = rows[:-1]
+    bot = rows[1:]
+    # Don't use zero thickness layers, first order discontinuities are taken
+    # care of by storing top and bottom depths.
+    thick = top[:, 0] != bot[:, 0]
+    # VelocityLayer takes the top and bottom value of every property in
+    # turn.
+    values = np.empty((thick.sum(), 2 * rows.shape[1]))
+    values[:, 0::2] = top[thick]
+    values[:, 1::2] = bot[thick]
+    return list(map(VelocityLayer, range(len(values)), *values.T.tolist()))
@@ -0,0 +1,530 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Version independent on-disk format for TauModels.
+
+Pickled TauModels are tied to the Python version that created them and
+loading one means rebuilding thousands of small objects. This module stores
+the same information as a handful of contiguous NumPy arrays in a flat
+binary file, so it can be read by any Python version in a single pass.
+
+File layout (all integers little endian)::
+
+    offset  size  content
+    0       8     magic bytes b"TAUPYMOD"
+    8       4     uint32, format version (currently 1)
+    12      4     uint32, length n of the JSON header in bytes
+    16      n     UTF-8 encoded JSON header
+    ...           zero padding up to the next multiple of 64 bytes
+    ...           raw array data, every array starting on a 64 byte boundary
+
+The JSON header is a dictionary with two keys. ``"attrs"`` holds the scalar
+attributes of the TauModel, its SlownessModel (``"sMod"``) and its
+VelocityModel (``"vMod"``). ``"arrays"`` maps array names to a dictionary
+with the NumPy ``"dtype"`` string, the ``"shape"`` and the byte ``"offset"``
+of the array, counted from the start of the record. The arrays are:
+
+``rayParams``                 (nRay,) ray parameters of the tau model.
+``tau_dist``, ``tau_time``,   (2, nBranch, nRay) distance, time and tau
+``tau_tau``                   increments of every branch, P first then S.
+``branch_depths``             (2, nBranch, 2) top and bottom branch depth.
+``branch_ray_params``         (2, nBranch, 3) maxRayParam, minTurnRayParam
+                              and minRayParam of every branch.
+``p_layers``, ``s_layers``    (nLayer, 4) slowness layers as topP,
+                              topDepth, botP, botDepth.
+``s_layers_shared``           (nSLayer,) index of the P layer an S layer
+                              shares its object with (fluids), or -1.
+``critical_depths``           (nCrit,) depths of the critical points.
+``critical_layers``           (nCrit, 3) velLayerNum, pLayerNum, sLayerNum.
+``high_slowness_p``,          (nZone, 3) high slowness zones as topDepth,
+``high_slowness_s``           botDepth, rayParam.
+``fluid_layers``              (nZone, 3) fluid zones, same columns.
+``velocity_layers``           (nVLayer, 13) velocity layers in the order of
+                              the VelocityLayer constructor arguments.
+
+Slim models (``write_model(..., slim=True)``) only keep what travel time,
+pierce and path queries need. They have no ``critical_depths`` and
+``critical_layers``, only the first 7 columns (depths and velocities) of
+``velocity_layers``, and the SlownessModel creation parameters are dropped
+from the attributes. ``tau_tau`` is left out as well if it is exactly
+``tau_time - rayParams * tau_dist``, as it is for models straight from
+TauP_Create, and recalculated when reading. Such a model can be queried
+but not be used to create new models from. ``size_report`` shows how many
+bytes each part of a file takes.
+
+The branch tables ``tau_dist``, ``tau_time`` and ``tau_tau`` can be stored
+as float32 (``write_model(..., dtype="float32")``), which halves their size
+on disk and in memory. Sums over the branches are still done in double
+precision; ``precision_report`` gives the resulting travel time errors.
+``rayParams`` stays float64 because it is matched exactly against the ray
+parameters of the slowness layers and high slowness zones.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from future.builtins import *
+
+from collections import OrderedDict
+import json
+import struct
+
+import numpy as np
+
+from taupy.helper_classes import CriticalDepth, DepthRange, TauModelError
+from taupy.SlownessLayer import SlownessLayerArray, shared_layers
+from taupy.SlownessModel import SlownessModel
+from taupy.TauBranch import TauBranch
+from taupy.TauModel import TauModel
+from taupy.VelocityLayer import VelocityLayer
+from taupy.VelocityModel import VelocityModel
+
+MAGIC = b"TAUPYMOD"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+# File extension of models stored in this format.
+EXTENSION = "taupy"
+_PREAMBLE = struct.Struct("<8sII")
+
+_VELOCITY_LAYER_ATTRS = [
+    "layer_number", "topDepth", "botDepth", "topPVelocity", "botPVelocity",
+    "topSVelocity", "botSVelocity", "topDensity", "botDensity", "topQp",
+    "botQp", "topQs", "botQs"]
+_SMOD_ATTRS = ["minDeltaP", "maxDeltaP", "maxDepthInterval",
+               "maxRangeInterval", "maxInterpError", "allowInnerCoreS",
+               "slowness_tolerance", "radiusOfEarth", "minimal"]
+# The part of _SMOD_ATTRS that queries use.
+_SLIM_SMOD_ATTRS = ["allowInnerCoreS", "slowness_tolerance", "radiusOfEarth"]
+# The number of velocity layer columns that queries use, density and Q are
+# left to the VelocityLayer defaults.
+_SLIM_VELOCITY_COLUMNS = 7
+_VMOD_ATTRS = ["modelName", "radiusOfEarth", "mohoDepth", "cmbDepth",
+               "iocbDepth", "minRadius", "maxRadius", "isSpherical"]
+_TMOD_ATTRS = ["radiusOfEarth", "spherical", "sourceDepth", "sourceBranch",
+               "mohoBranch", "cmbBranch", "iocbBranch", "mohoDepth",
+               "cmbDepth", "iocbDepth", "noDisconDepths"]
+
+
+def _align(n):
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _slowness_layer_array(layers):
+    return SlownessLayerArray(layers).getArray()
+
+
+def _depth_range_array(ranges):
+    return np.array([[r.topDepth, r.botDepth, r.rayParam] for r in ranges],
+                    dtype=np.float64).reshape(-1, 3)
+
+
+# Floating point types the branch tables can be stored as.
+BRANCH_DTYPES = ["float64", "float32"]
+# The phase groups known to getPhaseNames, used by precision_report.
+PHASE_GROUPS = ["ttp", "tts", "ttp+", "tts+", "ttbasic", "ttall"]
+
+
+def _tau_from_arrays(arrays):
+    return (arrays["tau_time"] - arrays["rayParams"] * arrays["tau_dist"]
+            ).astype(arrays["tau_time"].dtype)
+
+
+def model_to_arrays(tMod, slim=False, dtype="float64"):
+    """
+    Collects everything needed to rebuild the given TauModel into a
+    dictionary of scalar attributes and a dictionary of NumPy arrays.
+
+    :param slim: Only collect what queries need, see the module docstring.
+    :param dtype: Floating point type of the branch tables, one of
+        BRANCH_DTYPES.
+    """
+    if dtype not in BRANCH_DTYPES:
+        raise TauModelError("Branch tables can't be stored as %s." % dtype)
+    sMod = tMod.sMod
+    vMod = sMod.vMod
+    numRays = len(tMod.rayParams)
+    for branches in tMod.tauBranches:
+        for tb in branches:
+            if len(tb.dist) != numRays:
+                raise TauModelError("Branch tables do not match rayParams, "
+                                    "can't store this TauModel as arrays.")
+    attrs = dict((k, getattr(tMod, k)) for k in _TMOD_ATTRS)
+    attrs["noDisconDepths"] = list(attrs["noDisconDepths"])
+    attrs["sMod"] = dict((k, getattr(sMod, k))
+                         for k in (_SLIM_SMOD_ATTRS if slim else _SMOD_ATTRS))
+    attrs["vMod"] = dict((k, getattr(vMod, k)) for k in _VMOD_ATTRS)
+
+    arrays = {}
+    arrays["rayParams"] = np.array(tMod.rayParams, dtype=np.float64)
+    for name in ("dist", "time", "tau"):
+        arrays["tau_" + name] = np.array(
+            [[getattr(tb, name) for tb in branches]
+             for branches in tMod.tauBranches],
+            dtype=np.float64).reshape(2, -1, numRays).astype(dtype)
+    arrays["branch_depths"] = np.array(
+        [[[tb.topDepth, tb.botDepth] for tb in branches]
+         for branches in tMod.tauBranches], dtype=np.float64)
+    arrays["branch_ray_params"] = np.array(
+        [[[tb.maxRayParam, tb.minTurnRayParam, tb.minRayParam]
+          for tb in branches] for branches in tMod.tauBranches],
+        dtype=np.float64)
+    arrays["p_layers"] = _slowness_layer_array(sMod.PLayers)
+    arrays["s_layers"] = _slowness_layer_array(sMod.SLayers)
+    # In fluids the P and S sampling share the very same layers, which
+    # SlownessModel relies on when it splits layers, see shared_layers.
+    arrays["s_layers_shared"] = np.array(
+        shared_layers(sMod.PLayers, sMod.SLayers), dtype=np.int64)
+    arrays["critical_depths"] = np.array(
+        [cd.depth for cd in sMod.criticalDepths], dtype=np.float64)
+    arrays["critical_layers"] = np.array(
+        [[cd.velLayerNum, cd.pLayerNum, cd.sLayerNum]
+         for cd in sMod.criticalDepths], dtype=np.int64).reshape(-1, 3)
+    arrays["high_slowness_p"] = _depth_range_array(
+        sMod.highSlownessLayerDepthsP)
+    arrays["high_slowness_s"] = _depth_range_array(
+        sMod.highSlownessLayerDepthsS)
+    arrays["fluid_layers"] = _depth_range_array(sMod.fluidLayerDepths)
+    velocityAttrs = _VELOCITY_LAYER_ATTRS[:_SLIM_VELOCITY_COLUMNS] if slim \
+        else _VELOCITY_LAYER_ATTRS
+    arrays["velocity_layers"] = np.array(
+        [[getattr(l, k) for k in velocityAttrs] for l in vMod.layers],
+        dtype=np.float64).reshape(-1, len(velocityAttrs))
+    if slim:
+        # Only needed to calculate the tau branches.
+        del arrays["critical_depths"], arrays["critical_layers"]
+        if np.array_equal(arrays["tau_tau"], _tau_from_arrays(arrays)):
+            del arrays["tau_tau"]
+    return attrs, arrays
+
+
+def pack_arrays(attrs, arrays):
+    """
+    Serializes attributes and arrays into a single record in the format
+    described in the module docstring and returns it as bytes.
+    """
+    arrays = dict((k, np.ascontiguousarray(v)) for k, v in arrays.items())
+    # The header contains the offsets which depend on the header length, so
+    # iterate until the size of the padded header is stable.
+    headerSize = ALIGNMENT
+    while True:
+        offset = headerSize
+        index = {}
+        for name in sorted(arrays):
+            arr = arrays[name]
+            index[name] = {"dtype": arr.dtype.str, "shape": list(arr.shape),
+                           "offset": offset}
+            offset = _align(offset + arr.nbytes)
+        header = json.dumps({"attrs": attrs, "arrays": index},
+                            sort_keys=True).encode("utf-8")
+        newHeaderSize = _align(_PREAMBLE.size + len(header))
+        if newHeaderSize == headerSize:
+            break
+        headerSize = newHeaderSize
+    record = bytearray(offset)
+    record[:_PREAMBLE.size] = _PREAMBLE.pack(MAGIC, FORMAT_VERSION,
+                                             len(header))
+    record[_PREAMBLE.size:_PREAMBLE.size + len(header)] = header
+    for name, arr in arrays.items():
+        start = index[name]["offset"]
+        record[start:start + arr.nbytes] = arr.tobytes()
+    return bytes(record)
+
+
+def unpack_arrays(buf, start=0):
+    """
+    Parses the record starting at byte ``start`` of the uint8 array ``buf``.
+    Returns the attributes and a dictionary of arrays, which are views into
+    ``buf`` and do not copy any data.
+    """
+    magic, version, headerLength = _PREAMBLE.unpack(
+        bytes(buf[start:start + _PREAMBLE.size]))
+    if magic != MAGIC:
+        raise TauModelError("Not a TauPy array model.")
+    if version != FORMAT_VERSION:
+        raise TauModelError("Unsupported TauPy array model version %i."
+                            % version)
+    headerStart = start + _PREAMBLE.size
+    header = json.loads(
+        bytes(buf[headerStart:headerStart + headerLength]).decode("utf-8"))
+    arrays = {}
+    for name, info in header["arrays"].items():
+        dtype = np.dtype(info["dtype"])
+        count = int(np.prod(info["shape"], dtype=np.int64))
+        offset = start + info["offset"]
+        arrays[name] = buf[offset:offset + count * dtype.itemsize].view(
+            dtype).reshape(info["shape"])
+    return header["attrs"], arrays
+
+
+def _slowness_layers_from_arrays(pLayers, sLayers, sLayersShared):
+    # Shared layers have the same values, which is all SlownessLayerArrays
+    # need, see SlownessLayerArray.
+    return SlownessLayerArray(pLayers), SlownessLayerArray(sLayers)
+
+
+class LazySlownessModel(SlownessModel):
+    """
+    SlownessModel read from arrays that only creates its layers, as
+    SlownessLayerArrays, when PLayers or SLayers are first used. Travel time
+    sums just need the tau branches, so many queries never pay for building
+    the layers.
+    """
+    def __init__(self, pLayers, sLayers, sLayersShared):
+        # Don't call SlownessModel.__init__, it would resample the model.
+        self._layerArrays = (pLayers, sLayers, sLayersShared)
+        self._PLayers = None
+        self._SLayers = None
+
+    def _createLayers(self):
+        PLayers, SLayers = _slowness_layers_from_arrays(*self._layerArrays)
+        if self._PLayers is None:
+            self._PLayers = PLayers
+        if self._SLayers is None:
+            self._SLayers = SLayers
+        self._layerArrays = None
+
+    @property
+    def PLayers(self):
+        if self._PLayers is None:
+            self._createLayers()
+        return self._PLayers
+
+    @PLayers.setter
+    def PLayers(self, layers):
+        self._PLayers = layers
+
+    @property
+    def SLayers(self):
+        if self._SLayers is None:
+            self._createLayers()
+        return self._SLayers
+
+    @SLayers.setter
+    def SLayers(self, layers):
+        self._SLayers = layers
+
+
+class LazyVelocityModel(VelocityModel):
+    """
+    VelocityModel read from arrays that only creates its VelocityLayers
+    when they are first used.
+    """
+    def __init__(self, layerArray, **kwargs):
+        VelocityModel.__init__(self, **kwargs)
+        self._layerArray = layerArray
+        self._layers = None
+
+    @property
+    def layers(self):
+        if self._layers is None:
+            self._layers = [VelocityLayer(*row)
+                            for row in self._layerArray.tolist()]
+            self._layerArray = None
+        return self._layers
+
+    @layers.setter
+    def layers(self, layers):
+        self._layers = layers
+
+
+def model_from_arrays(attrs, arrays, lazy=True):
+    """
+    Rebuilds a TauModel from the output of model_to_arrays. The branch
+    tables and rayParams of the returned model are the given arrays.
+
+    :param lazy: Only create the slowness and velocity layers once they
+        are used, see LazySlownessModel.
+    """
+    if lazy:
+        vMod = LazyVelocityModel(arrays["velocity_layers"], **attrs["vMod"])
+        sMod = LazySlownessModel(arrays["p_layers"], arrays["s_layers"],
+                                 arrays["s_layers_shared"])
+    else:
+        vMod = VelocityModel(layers=[
+            VelocityLayer(*row)
+            for row in arrays["velocity_layers"].tolist()], **attrs["vMod"])
+        # Bypass SlownessModel.__init__ as it would resample the velocity
+        # model.
+        sMod = SlownessModel.__new__(SlownessModel)
+        sMod.PLayers, sMod.SLayers = _slowness_layers_from_arrays(
+            arrays["p_layers"], arrays["s_layers"], arrays["s_layers_shared"])
+    sMod.vMod = vMod
+    for k, v in attrs["sMod"].items():
+        setattr(sMod, k, v)
+    if "critical_depths" in arrays:
+        sMod.criticalDepths = [
+            CriticalDepth(depth, *layers) for depth, layers in zip(
+                arrays["critical_depths"].tolist(),
+                arrays["critical_layers"].tolist())]
+    else:
+        sMod.criticalDepths = []
+    sMod.highSlownessLayerDepthsP = [
+        DepthRange(*row) for row in arrays["high_slowness_p"].tolist()]
+    sMod.highSlownessLayerDepthsS = [
+        DepthRange(*row) for row in arrays["high_slowness_s"].tolist()]
+    sMod.fluidLayerDepths = [
+        DepthRange(*row) for row in arrays["fluid_layers"].tolist()]
+
+    # Bypass TauModel.__init__ as it would recalculate the branches.
+    tMod = TauModel.__new__(TauModel)
+    tMod.debug = False
+    for k in _TMOD_ATTRS:
+        setattr(tMod, k, attrs[k])
+    tMod.sMod = sMod
+    tMod.rayParams = arrays["rayParams"]
+    if "tau_tau" not in arrays:
+        arrays = dict(arrays, tau_tau=_tau_from_arrays(arrays))
+    depths = arrays["branch_depths"].tolist()
+    rayParams = arrays["branch_ray_params"].tolist()
+    tMod.tauBranches = [[], []]
+    for waveNum, isPWave in enumerate([True, False]):
+        for branchNum, (topDepth, botDepth) in enumerate(depths[waveNum]):
+            tb = TauBranch(topDepth, botDepth, isPWave)
+            tb.maxRayParam, tb.minTurnRayParam, tb.minRayParam = \
+                rayParams[waveNum][branchNum]
+            tb.dist = arrays["tau_dist"][waveNum, branchNum]
+            tb.time = arrays["tau_time"][waveNum, branchNum]
+            tb.tau = arrays["tau_tau"][waveNum, branchNum]
+            tMod.tauBranches[waveNum].append(tb)
+    return tMod
+
+
+def write_model(tMod, filename, slim=False, dtype="float64"):
+    """
+    Writes the TauModel to filename in the array format.
+
+    :param slim: Only write what queries need, see the module docstring.
+    :param dtype: Floating point type of the branch tables, one of
+        BRANCH_DTYPES.
+    """
+    with open(filename, "wb") as f:
+        f.write(pack_arrays(*model_to_arrays(tMod, slim=slim, dtype=dtype)))
+
+
+def read_model(filename, mmap=False, lazy=True):
+    """
+    Reads a TauModel written by write_model.
+
+    :param mmap: Memory map the file instead of reading it. The branch
+        tables and rayParams are then read-only views of the page cache,
+        so all processes opening the same file share a single copy and
+        nothing is read until it is used.
+    :param lazy: Defer creating the slowness and velocity layers until they
+        are first used, see model_from_arrays.
+    """
+    if mmap:
+        buf = np.memmap(filename, dtype=np.uint8, mode="r").view(np.ndarray)
+    else:
+        with open(filename, "rb") as f:
+            buf = np.fromfile(f, dtype=np.uint8)
+    return model_from_arrays(*unpack_arrays(buf), lazy=lazy)
+
+
+def is_array_model(filename):
+    """
+    Checks whether the given file starts with the array format magic bytes.
+    """
+    with open(filename, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def size_report(filename):
+    """
+    Returns an OrderedDict with the number of bytes each part of an array
+    model file takes: the header, every array in file order and the
+    alignment padding. The values add up to the file size.
+    """
+    with open(filename, "rb") as f:
+        magic, version, headerLength = _PREAMBLE.unpack(
+            f.read(_PREAMBLE.size))
+        if magic != MAGIC:
+            raise TauModelError("Not a TauPy array model.")
+        header = json.loads(f.read(headerLength).decode("utf-8"))
+        f.seek(0, 2)
+        fileSize = f.tell()
+    report = OrderedDict([("header", _PREAMBLE.size + headerLength)])
+    for name, info in sorted(header["arrays"].items(),
+                             key=lambda item: item[1]["offset"]):
+        report[name] = int(np.prod(info["shape"], dtype=np.int64)) * \
+            np.dtype(info["dtype"]).itemsize
+    report["padding"] = fileSize - sum(report.values())
+    return report
+
+
+def precision_report(tMod, otherMod, depths=(0, 10, 35, 100, 300, 600),
+                     distances=range(0, 181, 5)):
+    """
+    Compares the travel times of two versions of a model, e.g. a full and
+    a float32 one, for all phases of getPhaseNames("ttall") over a grid of
+    source depths and distances.
+
+    Returns an OrderedDict with an entry for every group in PHASE_GROUPS.
+    Each entry is a dictionary with the largest absolute travel time
+    difference "max_dt" in seconds and the "phase", "depth" and "distance"
+    where it occurs. "mismatches" counts the grid points where a phase of
+    the group has a different number of arrivals in the two models, and
+    "failures" those where calculating the phase raised a ValueError in
+    either model, so that the times can't be compared.
+    """
+    from taupy.TauP_Time import TauP_Time, getPhaseNames, parsePhaseList
+    worst = {}
+    mismatches = {}
+    failures = {}
+    for depth in depths:
+        calculators = []
+        for model in (tMod, otherMod):
+            tt = TauP_Time(model, ["ttall"], depth, 0)
+            tt.phaseNames = parsePhaseList(["ttall"])
+            tt.depthCorrect(depth)
+            # depthCorrect only calculates the phases if the depth changed,
+            # which it doesn't for a surface source.
+            tt.recalcPhases()
+            calculators.append(tt)
+        for distance in distances:
+            times = []
+            for tt in calculators:
+                phaseTimes = {}
+                for phase in tt.phases:
+                    try:
+                        phaseTimes[phase.name] = sorted(
+                            a.time for a in phase.calcTime(distance))
+                    except ValueError:
+                        # E.g. math domain errors for takeoff angles of rays
+                        # grazing a discontinuity at the source depth.
+                        phaseTimes[phase.name] = None
+                times.append(phaseTimes)
+            for name in set(times[0]) | set(times[1]):
+                first, second = times[0].get(name), times[1].get(name)
+                if first is None or second is None:
+                    failures[name] = failures.get(name, 0) + 1
+                    continue
+                if len(first) != len(second):
+                    mismatches[name] = mismatches.get(name, 0) + 1
+                    continue
+                for t1, t2 in zip(first, second):
+                    dt = abs(t1 - t2)
+                    if name not in worst or dt > worst[name][0]:
+                        worst[name] = (dt, depth, distance)
+    report = OrderedDict()
+    for group in PHASE_GROUPS:
+        names = set(getPhaseNames(group))
+        entry = {"max_dt": 0.0, "phase": None, "depth": None,
+                 "distance": None,
+                 "mismatches": sum(mismatches.get(n, 0) for n in names),
+                 "failures": sum(failures.get(n, 0) for n in names)}
+        for name in names:
+            if name in worst and worst[name][0] > entry["max_dt"]:
+                entry.update(max_dt=worst[name][0], phase=name,
+                             depth=worst[name][1], distance=worst[name][2])
+        report[group] = entry
+    return report
+
+
+if __name__ == '__main__':
+    import sys
+    for filename in sys.argv[1:]:
+        report = size_report(filename)
+        total = sum(report.values())
+        print(filename)
+        for name, nbytes in report.items():
+            print("    {:<20s} {:>10d} {:>6.1f} %".format(
+                name, nbytes, 100.0 * nbytes / total))
+        print("    {:<20s} {:>10d}".format("total", total))
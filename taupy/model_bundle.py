@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Several TauModels in a single file with a table of contents.
+
+A bundle is a sequence of records in the format of taupy.model_arrays,
+preceded by a table of contents, so one model can be read without touching
+the others. Optionally, depth corrected variants of a model are stored as
+well and used instead of recalculating the depth correction.
+
+File layout (all integers little endian)::
+
+    offset  size  content
+    0       8     magic bytes b"TAUPYBDL"
+    8       4     uint32, format version (currently 1)
+    12      4     uint32, length n of the JSON table of contents in bytes
+    16      n     UTF-8 encoded JSON table of contents
+    ...           zero padding up to the next multiple of 64 bytes
+    ...           the records, each starting on a 64 byte boundary
+
+The table of contents maps every model name to the byte ``"offset"`` and
+``"size"`` of its record and to ``"depths"``, which maps source depths (as
+the repr of the float) to the offset and size of the depth corrected
+variant.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from future.builtins import *
+
+import json
+import os
+import struct
+
+import numpy as np
+
+from taupy.helper_classes import TauModelError
+from taupy.model_arrays import (ALIGNMENT, model_from_arrays,
+                                model_to_arrays, pack_arrays, unpack_arrays)
+from taupy.TauModel import DepthCache
+
+MAGIC = b"TAUPYBDL"
+FORMAT_VERSION = 1
+# File extension of bundles.
+EXTENSION = "taupyb"
+_PREAMBLE = struct.Struct("<8sII")
+
+# Tables of contents by filename, with the modification time they were read
+# at.
+_tocs = {}
+
+
+def _align(n):
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_bundle(models, filename, depths=(), **kwargs):
+    """
+    Writes TauModels to a bundle.
+
+    :param models: Dictionary of model names and TauModels, or a list of
+        TauModels which are then named after their velocity model.
+    :param depths: Source depths for which depth corrected variants of
+        every model are stored as well.
+    :param kwargs: Passed on to taupy.model_arrays.model_to_arrays, e.g.
+        slim=True or dtype="float32".
+    """
+    if not isinstance(models, dict):
+        models = dict((tMod.sMod.vMod.modelName, tMod) for tMod in models)
+    names = sorted(models)
+    records = []
+    for name in names:
+        tMod = models[name]
+        variants = [(repr(float(depth)), tMod.depthCorrect(depth))
+                    for depth in depths]
+        records.append((
+            pack_arrays(*model_to_arrays(tMod, **kwargs)),
+            [(key, pack_arrays(*model_to_arrays(variant, **kwargs)))
+             for key, variant in variants]))
+
+    # As in pack_arrays, the offsets depend on the length of the table of
+    # contents, so iterate until it is stable.
+    headerSize = ALIGNMENT
+    while True:
+        offset = headerSize
+        toc = {}
+        for name, (record, variants) in zip(names, records):
+            toc[name] = {"offset": offset, "size": len(record), "depths": {}}
+            offset = _align(offset + len(record))
+            for key, variant in variants:
+                toc[name]["depths"][key] = {"offset": offset,
+                                            "size": len(variant)}
+                offset = _align(offset + len(variant))
+        header = json.dumps({"models": toc}, sort_keys=True).encode("utf-8")
+        newHeaderSize = _align(_PREAMBLE.size + len(header))
+        if newHeaderSize == headerSize:
+            break
+        headerSize = newHeaderSize
+
+    with open(filename, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for name, (record, variants) in zip(names, records):
+            for entry, data in [(toc[name], record)] + [
+                    (toc[name]["depths"][key], variant)
+                    for key, variant in variants]:
+                f.write(b"\0" * (entry["offset"] - f.tell()))
+                f.write(data)
+
+
+def is_bundle(filename):
+    """
+    Checks whether the given file starts with the bundle magic bytes.
+    """
+    with open(filename, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def read_toc(filename):
+    """
+    Returns the table of contents of a bundle, see the module docstring.
+    It is only read again once the file has been modified.
+    """
+    mtime = os.stat(filename).st_mtime
+    if filename in _tocs and _tocs[filename][0] == mtime:
+        return _tocs[filename][1]
+    with open(filename, "rb") as f:
+        magic, version, headerLength = _PREAMBLE.unpack(
+            f.read(_PREAMBLE.size))
+        if magic != MAGIC:
+            raise TauModelError("Not a TauPy model bundle.")
+        if version != FORMAT_VERSION:
+            raise TauModelError("Unsupported TauPy model bundle version %i."
+                                % version)
+        toc = json.loads(f.read(headerLength).decode("utf-8"))["models"]
+    _tocs[filename] = (mtime, toc)
+    return toc
+
+
+def _read_record(filename, entry, mmap, lazy):
+    if mmap:
+        buf = np.memmap(filename, dtype=np.uint8, mode="r",
+                        offset=entry["offset"],
+                        shape=(entry["size"],)).view(np.ndarray)
+    else:
+        with open(filename, "rb") as f:
+            f.seek(entry["offset"])
+            buf = np.fromfile(f, dtype=np.uint8, count=entry["size"])
+    return model_from_arrays(*unpack_arrays(buf), lazy=lazy)
+
+
+class BundleDepthCache(DepthCache):
+    """
+    DepthCache of a bundled model that falls back to the depth corrected
+    variants in the bundle, which are read on first use.
+    """
+    def __init__(self, filename, entries, mmap=False, lazy=True, **kwargs):
+        DepthCache.__init__(self, **kwargs)
+        self.filename = filename
+        self.entries = entries
+        self.mmap = mmap
+        self.lazy = lazy
+
+    def depths(self):
+        """
+        Returns the depths of the variants in the bundle.
+        """
+        return sorted(float(key) for key in self.entries)
+
+    def get(self, depth):
+        """
+        Returns the model corrected for the given source depth, or None if
+        neither the cache nor the bundle contain it.
+        """
+        tMod = DepthCache.get(self, depth)
+        key = repr(float(depth))
+        if tMod is None and key in self.entries:
+            tMod = _read_record(self.filename, self.entries[key], self.mmap,
+                                self.lazy)
+            self.put(tMod)
+        return tMod
+
+
+def read_bundle_model(filename, name, mmap=False, lazy=True):
+    """
+    Reads a single model from a bundle, seeking straight to its record.
+    Arguments are the same as for taupy.model_arrays.read_model.
+    """
+    toc = read_toc(filename)
+    if name not in toc:
+        raise TauModelError("Model '%s' is not in bundle %s." % (name,
+                                                                  filename))
+    tMod = _read_record(filename, toc[name], mmap, lazy)
+    tMod.depthCache = BundleDepthCache(filename, toc[name]["depths"],
+                                       mmap=mmap, lazy=lazy)
+    return tMod
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Build-and-cache of TauModels for custom velocity model files.
+
+A velocity model is built with TauP_Create the first time it is used and
+stored in the array format of taupy.model_arrays in a cache directory. The
+cache key is a hash of the velocity file contents and of the TauP_Create
+parameters, so editing the file or changing a parameter gives a new build.
+Builds are written to a temporary file and renamed into place, and a lock
+file makes sure concurrent processes do not build the same model twice.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from future.builtins import *
+
+from contextlib import contextmanager
+import errno
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from taupy import model_arrays
+from taupy.TauP_Create import TauP_Create
+
+# The TauP_Create parameters that change the resulting model.
+CREATE_PARAMS = ["min_delta_p", "max_delta_p", "max_depth_interval",
+                 "max_range_interval", "max_interp_error",
+                 "allow_inner_core_s", "minimal"]
+
+
+def get_cache_dir():
+    """
+    Returns the cache directory, $TAUPY_CACHE_DIR or ~/.cache/taupy.
+    """
+    return os.environ.get("TAUPY_CACHE_DIR", os.path.join(
+        os.path.expanduser("~"), ".cache", "taupy"))
+
+
+def model_cache_key(filename, **kwargs):
+    """
+    Returns the hash identifying the build of the velocity model file with
+    the given TauP_Create keyword arguments.
+    """
+    creator = TauP_Create(filename, None, **kwargs)
+    params = dict((k, getattr(creator, k)) for k in CREATE_PARAMS)
+    params["format_version"] = model_arrays.FORMAT_VERSION
+    sha = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            sha.update(chunk)
+    sha.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    return sha.hexdigest()
+
+
+@contextmanager
+def _file_lock(lockfile, poll_interval=0.1):
+    """
+    Holds an exclusive lock on lockfile for the duration of the with block.
+    """
+    if fcntl is not None:
+        with open(lockfile, "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        return
+    # Without fcntl, fall back to the atomic creation of the lock file.
+    while True:
+        try:
+            fd = os.open(lockfile, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+            time.sleep(poll_interval)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(lockfile)
+
+
+def build_cached_model(filename, cache_dir=None, **kwargs):
+    """
+    Returns the filename of the array model built from the velocity model
+    file, building it first if the cache does not contain it yet.
+
+    :param filename: The velocity model file, e.g. a .tvel file.
+    :param cache_dir: The cache directory, defaults to get_cache_dir().
+    :param kwargs: Passed on to TauP_Create, e.g. max_interp_error.
+    """
+    cache_dir = cache_dir if cache_dir is not None else get_cache_dir()
+    modelName = os.path.splitext(os.path.basename(filename))[0]
+    output = os.path.join(cache_dir, "%s-%s%s%s" % (
+        modelName, model_cache_key(filename, **kwargs)[:20], os.path.extsep,
+        model_arrays.EXTENSION))
+    if os.path.exists(output):
+        return output
+    if not os.path.isdir(cache_dir):
+        try:
+            os.makedirs(cache_dir)
+        except OSError:
+            # Created by another process in the meantime.
+            if not os.path.isdir(cache_dir):
+                raise
+    with _file_lock(output + os.path.extsep + "lock"):
+        # Another process might have built it while we were waiting.
+        if os.path.exists(output):
+            return output
+        creator = TauP_Create(filename, output, **kwargs)
+        tMod = creator.createTauModel(creator.loadVMod())
+        fd, tempname = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        os.close(fd)
+        try:
+            tMod.writeArrays(tempname)
+            os.rename(tempname, output)
+        except Exception:
+            os.remove(tempname)
+            raise
+    return output
@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Ensembles of perturbed versions of one velocity model, e.g. for Monte-Carlo
+uncertainty estimates.
+
+The base model is created once and sent to every process of a pool, which
+creates the members from it with TauModel.rebuild, so the layers and
+branches a perturbation does not touch are shared instead of recalculated.
+The members are stored in a single file as the arrays of
+taupy.model_arrays with an extra leading member axis, so the same query
+can be evaluated for all members at once, see Ensemble.direct_times.
+
+File layout (all integers little endian)::
+
+    offset  size  content
+    0       8     magic bytes b"TAUPYENS"
+    8       4     uint32, format version (currently 1)
+    12      4     uint32, number of members
+    ...           zero padding up to byte 64
+    64            a record in the format of taupy.model_arrays
+
+The attributes of the record are a dictionary with the list of the
+attributes of every member (``"members"``) and the names of the
+``"stacked"`` arrays. Arrays that are the same for all members, e.g.
+``branch_depths`` and ``critical_depths`` if no perturbation changes the
+discontinuities, are stored once under their usual name. The others are
+stacked along a new first axis and padded to the largest shape with NaN,
+or -1 for integer arrays. The shape of the array of every member is in
+``<name>_shapes``, shape (nMember, ndim).
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from future.builtins import *
+
+import struct
+
+import numpy as np
+
+from taupy.helper_classes import TauModelError
+from taupy.model_arrays import (ALIGNMENT, model_from_arrays,
+                                model_to_arrays, pack_arrays, unpack_arrays)
+from taupy.TauP_Create import TauP_Create
+
+MAGIC = b"TAUPYENS"
+FORMAT_VERSION = 1
+# File extension of ensembles.
+EXTENSION = "taupye"
+_PREAMBLE = struct.Struct("<8sII")
+
+# The base model in the worker processes of build_ensemble.
+_base = None
+
+
+def _initMemberWorker(base):
+    global _base
+    _base = base
+
+
+def _buildMember(vMod):
+    return model_to_arrays(_base.rebuild(vMod))
+
+
+def build_ensemble(vMod, perturbations, filename=None, processes=None,
+                   **kwargs):
+    """
+    Creates the TauModels of perturbed versions of a velocity model and
+    returns them as an Ensemble.
+
+    :param vMod: The base VelocityModel.
+    :param perturbations: Iterable, e.g. a generator, of perturbed copies of
+        vMod. Each is created with TauModel.rebuild of the model of vMod.
+    :param filename: Also write the ensemble there, see write_ensemble.
+    :param processes: Size of the process pool, None for one process per
+        CPU. With 1 everything runs in this process.
+    :param kwargs: TauP_Create parameters, e.g. max_interp_error.
+    """
+    base = TauP_Create(None, None, **kwargs).createTauModel(vMod)
+    if processes == 1:
+        _initMemberWorker(base)
+        try:
+            members = [_buildMember(member) for member in perturbations]
+        finally:
+            _initMemberWorker(None)
+    else:
+        import multiprocessing
+        pool = multiprocessing.Pool(processes, _initMemberWorker, (base,))
+        try:
+            members = list(pool.imap(_buildMember, perturbations))
+        finally:
+            pool.close()
+            pool.join()
+    if not members:
+        raise TauModelError("An ensemble needs at least one member.")
+    attrs, arrays = stack_arrays(members)
+    if filename is not None:
+        _write(attrs, arrays, filename)
+    return Ensemble(attrs, arrays)
+
+
+def stack_arrays(members):
+    """
+    Combines the output of taupy.model_arrays.model_to_arrays for several
+    models into the attributes and arrays of an ensemble, see the module
+    docstring.
+    """
+    attrs = {"members": [memberAttrs for memberAttrs, _ in members],
+             "stacked": []}
+    arrays = {}
+    for name in sorted(members[0][1]):
+        values = [np.asarray(memberArrays[name])
+                  for _, memberArrays in members]
+        first = values[0]
+        if all(v.shape == first.shape and np.array_equal(v, first)
+               for v in values[1:]):
+            arrays[name] = first
+            continue
+        shapes = np.array([v.shape for v in values], dtype=np.int64)
+        fill = -1 if first.dtype.kind in "iu" else np.nan
+        stacked = np.full((len(values),) + tuple(shapes.max(axis=0)), fill,
+                          dtype=first.dtype)
+        for i, v in enumerate(values):
+            stacked[(i,) + tuple(slice(0, n) for n in v.shape)] = v
+        arrays[name] = stacked
+        arrays[name + "_shapes"] = shapes
+        attrs["stacked"].append(name)
+    return attrs, arrays
+
+
+def write_ensemble(tMods, filename):
+    """
+    Writes TauModels, e.g. the members of an Ensemble, to an ensemble file.
+    """
+    _write(*stack_arrays([model_to_arrays(tMod) for tMod in tMods]),
+           filename=filename)
+
+
+def _write(attrs, arrays, filename):
+    with open(filename, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION,
+                               len(attrs["members"])))
+        f.write(b"\0" * (ALIGNMENT - _PREAMBLE.size))
+        f.write(pack_arrays(attrs, arrays))
+
+
+def is_ensemble(filename):
+    """
+    Checks whether the given file starts with the ensemble magic bytes.
+    """
+    with open(filename, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def read_ensemble(filename, mmap=False):
+    """
+    Reads an ensemble written by build_ensemble or write_ensemble.
+
+    :param mmap: Memory map the file instead of reading it, see
+        taupy.model_arrays.read_model.
+    """
+    if mmap:
+        buf = np.memmap(filename, dtype=np.uint8, mode="r").view(np.ndarray)
+    else:
+        with open(filename, "rb") as f:
+            buf = np.fromfile(f, dtype=np.uint8)
+    magic, version, _ = _PREAMBLE.unpack(bytes(buf[:_PREAMBLE.size]))
+    if magic != MAGIC:
+        raise TauModelError("Not a TauPy model ensemble.")
+    if version != FORMAT_VERSION:
+        raise TauModelError("Unsupported TauPy model ensemble version %i."
+                            % version)
+    return Ensemble(*unpack_arrays(buf, ALIGNMENT))
+
+
+class Ensemble(object):
+    """
+    The stacked arrays of the TauModels of an ensemble, see the module
+    docstring.
+    """
+    def __init__(self, attrs, arrays):
+        self.attrs = attrs
+        self.arrays = arrays
+
+    def __len__(self):
+        return len(self.attrs["members"])
+
+    def stacked(self, name):
+        """
+        Returns the array of the given name with the member axis first,
+        also if it is the same for all members. Padding is NaN or -1.
+        """
+        array = self.arrays[name]
+        if name in self.attrs["stacked"]:
+            return array
+        return np.broadcast_to(array, (len(self),) + array.shape)
+
+    def member(self, i, lazy=True):
+        """
+        Returns the TauModel of member i, see
+        taupy.model_arrays.model_from_arrays.
+        """
+        arrays = {}
+        for name, array in self.arrays.items():
+            if name.endswith("_shapes") \
+                    and name[:-len("_shapes")] in self.attrs["stacked"]:
+                continue
+            if name in self.attrs["stacked"]:
+                shape = self.arrays[name + "_shapes"][i]
+                array = array[(i,) + tuple(slice(0, n) for n in shape)]
+            arrays[name] = array
+        return model_from_arrays(self.attrs["members"][i], arrays, lazy=lazy)
+
+    def direct_times(self, distances, isPWave=True, maxDepth=None):
+        """
+        Returns the travel times in seconds of the first arrival of the
+        direct wave from a surface source, e.g. the phase P or S, for all
+        members at once, as an array of shape (nMember, nDistance). Where a
+        member has no arrival, the time is NaN.
+
+        As in SeismicPhase, the time is linearly interpolated between the
+        rays of the tau model.
+
+        :param distances: Distances in degrees, between 0 and 180.
+        :param maxDepth: Depth the rays turn above, by default the core
+            mantle boundary of each member. It is rounded down to the bottom
+            of a branch.
+        """
+        waveNum = 0 if isPWave else 1
+        distances = np.radians(np.atleast_1d(np.asarray(distances,
+                                                        dtype=np.float64)))
+        rayParams = self.stacked("rayParams")
+        branchDepths = self.stacked("branch_depths")[:, waveNum]
+        branchRayParams = self.stacked("branch_ray_params")[:, waveNum]
+        tauDist = self.stacked("tau_dist")[:, waveNum]
+        tauTime = self.stacked("tau_time")[:, waveNum]
+        if maxDepth is None:
+            maxDepth = np.array([[member["cmbDepth"]]
+                                 for member in self.attrs["members"]])
+        with np.errstate(invalid="ignore"):
+            branches = branchDepths[:, :, 1] <= maxDepth
+        # The smallest ray parameter that turns or reflects in the deepest
+        # branch, i.e. that does not go below it.
+        lastBranch = branches.sum(axis=1) - 1
+        members = np.arange(len(self))
+        minRayParam = branchRayParams[members, lastBranch, 2]
+        maxRayParam = branchRayParams[:, 0, 0]
+        with np.errstate(invalid="ignore"):
+            rays = (rayParams >= minRayParam[:, None]) & \
+                (rayParams <= maxRayParam[:, None]) & \
+                (lastBranch >= 0)[:, None]
+        # Rays that do not reach a branch have zero increments in it. The
+        # padding of the branches of other members is NaN.
+        dist = 2 * np.where(branches[:, :, None], tauDist, 0).sum(axis=1)
+        time = 2 * np.where(branches[:, :, None], tauTime, 0).sum(axis=1)
+        dist[~rays] = np.nan
+        time[~rays] = np.nan
+
+        # The pairs of neighbouring rays to interpolate between, except for
+        # shadow zones.
+        segments = rayParams[:, :-1] != rayParams[:, 1:]
+        # As in SeismicPhase, the ray parameter of a high slowness zone the
+        # rays go through turns at its bottom in the branch tables. The ray
+        # turning at its top, i.e. with only the branches above it, ends the
+        # pair above it instead, and the gap between the two is a shadow.
+        zones = self.stacked("high_slowness_p" if isPWave
+                             else "high_slowness_s")
+        deepest = branchDepths[members, lastBranch, 1]
+        extra = []
+        for zoneNum in range(zones.shape[1]):
+            zoneTop = zones[:, zoneNum, 0]
+            zoneP = zones[:, zoneNum, 2]
+            with np.errstate(invalid="ignore"):
+                crossed = rays & (rayParams == zoneP[:, None]) & \
+                    ((zoneP < maxRayParam) & (zoneP > minRayParam) &
+                     (zoneTop < deepest))[:, None]
+            m, k = np.nonzero(crossed[:, 1:])
+            with np.errstate(invalid="ignore"):
+                above = branches[m] & (branchDepths[m, :, 0] <
+                                       zoneTop[m, None])
+            extra.append((m, dist[m, k], time[m, k],
+                          2 * np.where(above, tauDist[m, :, k + 1], 0).sum(1),
+                          2 * np.where(above, tauTime[m, :, k + 1], 0).sum(1)))
+            segments[m, k] = False
+
+        first = _interpolate(dist[:, :-1], time[:, :-1], dist[:, 1:],
+                             time[:, 1:], distances, segments).min(axis=1)
+        for m, d0, t0, d1, t1 in extra:
+            np.minimum.at(first, m, _interpolate(d0, t0, d1, t1, distances))
+        first[np.isinf(first)] = np.nan
+        return first
+
+
+def _interpolate(d0, t0, d1, t1, distances, mask=True):
+    """
+    Linearly interpolates the times of all the pairs of rays d0, t0 and d1,
+    t1 whose distances bracket each of the search distances, which is the
+    new last axis. Elsewhere, and where mask is False, the time is inf.
+    """
+    d0 = d0[..., None]
+    d1 = d1[..., None]
+    t0 = t0[..., None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bracket = (d0 - distances) * (distances - d1) >= 0
+        times = (distances - d0) / (d1 - d0) * (t1[..., None] - t0) + t0
+    return np.where(bracket & np.asarray(mask)[..., None] &
+                    ~np.isnan(times), times, np.inf)
+
+
+def main(argv=None):
+    """
+    Prints the spread of the direct P and S times of an ensemble file.
+    """
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Spread of the direct P and S times of an ensemble.")
+    parser.add_argument("filename", help="ensemble file")
+    parser.add_argument("--distances", type=float, nargs="+",
+                        default=[10, 30, 60, 90])
+    args = parser.parse_args(argv)
+    ensemble = read_ensemble(args.filename, mmap=True)
+    print("%i members" % len(ensemble))
+    print("%8s %10s %8s %10s %8s" % ("dist", "P mean", "P std", "S mean",
+                                     "S std"))
+    p = ensemble.direct_times(args.distances, True)
+    s = ensemble.direct_times(args.distances, False)
+    for i, distance in enumerate(args.distances):
+        print("%8.2f %10.3f %8.3f %10.3f %8.3f" % (
+            distance, np.nanmean(p[:, i]), np.nanstd(p[:, i]),
+            np.nanmean(s[:, i]), np.nanstd(s[:, i])))
+    return 0
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())
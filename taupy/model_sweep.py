@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Sweep of TauP_Create parameters for a velocity model.
+
+Every combination of a grid of creation parameters is built, in parallel
+on a process pool, and compared. For each combination the report has the
+build time, the number of ray parameters, the size of the model in the
+array format of taupy.model_arrays, the mean latency of a travel time
+query and the largest travel time deviation from the densest build, i.e.
+the one with the most ray parameters. The models are passed between the
+processes in the array format.
+
+Usage:
+    python -m taupy.model_sweep iasp91.tvel --max-interp-error 0.05 0.5 \\
+        --max-range-interval 2.5 10 [-n 4] [--budget 0.1] [-o sweep.json]
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from future.builtins import *
+
+from collections import OrderedDict
+import itertools
+import time
+
+import numpy as np
+
+from taupy.model_arrays import (model_from_arrays, model_to_arrays,
+                                pack_arrays, precision_report, unpack_arrays)
+from taupy.model_cache import CREATE_PARAMS
+from taupy.TauP_Create import TauP_Create
+
+# The creation parameters that can be swept.
+SWEEP_PARAMS = ["min_delta_p", "max_delta_p", "max_depth_interval",
+                "max_range_interval", "max_interp_error"]
+# Source depths and distances of the queries timed for the latency and of
+# the travel time comparison.
+DEFAULT_DEPTHS = (0, 100, 300)
+DEFAULT_DISTANCES = tuple(range(0, 181, 10))
+DEFAULT_PHASES = ("ttbasic",)
+
+
+def _unpack(buf):
+    return model_from_arrays(*unpack_arrays(np.frombuffer(buf,
+                                                          dtype=np.uint8)))
+
+
+def _build(args):
+    """
+    Builds one combination. Returns the build time, the number of ray
+    parameters and the model in the array format.
+    """
+    filename, params = args
+    start = time.time()
+    creator = TauP_Create(filename, None, **params)
+    tMod = creator.createTauModel(creator.loadVMod())
+    buildTime = time.time() - start
+    return (buildTime, len(tMod.rayParams),
+            pack_arrays(*model_to_arrays(tMod)))
+
+
+def query_latency(tMod, depths=DEFAULT_DEPTHS, distances=DEFAULT_DISTANCES,
+                  phases=DEFAULT_PHASES):
+    """
+    Returns the mean time in seconds of a travel time query on a model
+    without cached depth corrections, over all given source depths and
+    distances.
+    """
+    from taupy.TauP_Time import TauP_Time
+    times = []
+    for depth in depths:
+        for distance in distances:
+            tMod.depthCache = None
+            start = time.time()
+            try:
+                TauP_Time(tMod, list(phases), depth, distance).run()
+            except ValueError:
+                # See precision_report.
+                continue
+            times.append(time.time() - start)
+    return sum(times) / len(times) if times else float("nan")
+
+
+def _compare(args):
+    """
+    Times queries on one combination and compares it with the densest
+    build. Returns the latency and the precision_report entry of "ttall".
+    """
+    buf, densestBuf, depths, distances, phases = args
+    tMod = _unpack(buf)
+    latency = query_latency(tMod, depths, distances, phases)
+    tMod.depthCache = None
+    report = precision_report(tMod, _unpack(densestBuf), depths, distances)
+    return latency, report["ttall"]
+
+
+def _map(func, args, processes):
+    if processes == 1:
+        return [func(a) for a in args]
+    import multiprocessing
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(func, args)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def sweep(filename, grid, processes=None, depths=DEFAULT_DEPTHS,
+          distances=DEFAULT_DISTANCES, phases=DEFAULT_PHASES, **kwargs):
+    """
+    Builds every combination of creation parameters for the velocity model
+    file and returns a list with a report for each.
+
+    :param grid: Dictionary mapping names in SWEEP_PARAMS to lists of
+        values. Parameters not in it keep the TauP_Create defaults or the
+        value given in kwargs.
+    :param processes: Size of the process pool, None for one process per
+        CPU. With 1 everything runs in this process.
+    :param depths: Source depths of the timed queries and the comparison.
+    :param distances: Distances in degrees of the timed queries and the
+        comparison.
+    :param phases: Phases of the timed queries. The comparison always uses
+        all phases, see taupy.model_arrays.precision_report.
+    :return: List of OrderedDicts with the creation "params", "build_time"
+        in s, "ray_params", "size" in bytes, mean "query_time" in s and
+        the "max_dt" in s with the "phase", "depth" and "distance" it
+        occurs at, as well as the "mismatches" and "failures" of the
+        comparison.
+    """
+    for name in grid:
+        if name not in SWEEP_PARAMS:
+            raise ValueError("Can't sweep '%s', use one of %s." % (
+                name, ", ".join(SWEEP_PARAMS)))
+    names = [name for name in SWEEP_PARAMS if name in grid]
+    combinations = []
+    for values in itertools.product(*[grid[name] for name in names]):
+        params = dict((k, v) for k, v in kwargs.items()
+                      if k in CREATE_PARAMS)
+        params.update(zip(names, values))
+        combinations.append(params)
+
+    builds = _map(_build, [(filename, params) for params in combinations],
+                  processes)
+    densest = max(range(len(builds)), key=lambda i: builds[i][1])
+    comparisons = _map(_compare, [
+        (buf, builds[densest][2], depths, distances, phases)
+        for _, _, buf in builds], processes)
+
+    defaults = TauP_Create(filename, None)
+    rows = []
+    for params, (buildTime, rayParams, buf), (latency, report) in zip(
+            combinations, builds, comparisons):
+        row = OrderedDict([
+            ("params", OrderedDict(
+                (name, params.get(name, getattr(defaults, name)))
+                for name in SWEEP_PARAMS)),
+            ("build_time", buildTime), ("ray_params", rayParams),
+            ("size", len(buf)), ("query_time", latency)])
+        for key in ["max_dt", "phase", "depth", "distance", "mismatches",
+                    "failures"]:
+            row[key] = report[key]
+        rows.append(row)
+    return rows
+
+
+def fastest_within(rows, budget):
+    """
+    Returns the row of the sweep with the lowest query time whose maximum
+    travel time deviation is at most budget seconds without mismatched
+    arrivals, or None.
+    """
+    good = [row for row in rows
+            if row["max_dt"] <= budget and not row["mismatches"]]
+    if not good:
+        return None
+    return min(good, key=lambda row: row["query_time"])
+
+
+def main(argv=None):
+    import argparse
+    import json
+    parser = argparse.ArgumentParser(
+        description="Sweep of TauP_Create parameters for a velocity model.")
+    parser.add_argument("filename", help="velocity model file, e.g. .tvel")
+    defaults = TauP_Create(None, None)
+    for name in SWEEP_PARAMS:
+        parser.add_argument("--" + name.replace("_", "-"), type=float,
+                            nargs="+", default=[getattr(defaults, name)],
+                            help="values to sweep (default: %(default)s)")
+    parser.add_argument("-n", "--processes", type=int, default=None,
+                        help="size of the process pool (default: one per "
+                             "CPU)")
+    parser.add_argument("--depths", type=float, nargs="+",
+                        default=list(DEFAULT_DEPTHS))
+    parser.add_argument("--distances", type=float, nargs="+",
+                        default=list(DEFAULT_DISTANCES))
+    parser.add_argument("--budget", type=float, default=None,
+                        help="travel time accuracy budget in s, prints the "
+                             "fastest combination within it")
+    parser.add_argument("-o", "--output", help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    grid = dict((name, getattr(args, name)) for name in SWEEP_PARAMS)
+    rows = sweep(args.filename, grid, processes=args.processes,
+                 depths=args.depths, distances=args.distances)
+    print("%-34s %8s %6s %9s %9s %9s %5s  %s" % (
+        "min_dp max_dp depth_int range_int err", "build[s]", "rays",
+        "size[kB]", "query[ms]", "max_dt[s]", "mism.", "at"))
+    for row in rows:
+        print("%-34s %8.2f %6i %9.1f %9.2f %9.4f %5i  %s" % (
+            " ".join("%g" % v for v in row["params"].values()),
+            row["build_time"], row["ray_params"], row["size"] / 1024.0,
+            1000 * row["query_time"], row["max_dt"], row["mismatches"],
+            "%s %s km %s deg" % (row["phase"], row["depth"], row["distance"])
+            if row["phase"] else ""))
+    if args.budget is not None:
+        best = fastest_within(rows, args.budget)
+        print("\nFastest within %g s: %s" % (
+            args.budget, dict(best["params"]) if best else "none"))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=1)
+    return 0
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())
@@ -3,14 +3,15 @@
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 from future.builtins import *
-import inspect
-import os
 
+from .ModelPool import default_pool
+from .TauModel import DepthCache, TauModel
 from .TauModelLoader import load
 from .TauP_Time import TauP_Time
-from .TauP_Pierce import TauP_Pierce
-from .TauP_Path import TauP_Path
-from .TauP_Create import TauP_Create
+
+# TauP_Pierce, TauP_Path and TauP_Create are imported where they are used,
+# so that importing this module for travel times stays cheap. The budget is
+# checked by taupy/tests/test_import_time.py.
 
 
 class Arrivals(list):
@@ -41,12 +42,27 @@ class TauPyModel(object):
     >>> tt = i91.get_travel_timess(10, 20, ["P, S"])
     """
 
-    def __init__(self, model="iasp91", verbose=False):
+    def __init__(self, model="iasp91", verbose=False, mmap=False, cache=True,
+                 create_params=None):
         """
         Loads an already created TauPy model.
 
         :param model: The model name. Either an internal TauPy model or a
-            filename in the case of custom models.
+            filename in the case of custom models. A .tvel or .nd velocity
+            model file is built on first use and cached by its contents,
+            see taupy.model_cache.
+        :param mmap: Memory map the model file so that worker processes on
+            one host share the branch tables instead of each holding a
+            copy. Only has an effect for models in the array format.
+        :param cache: Take the model from the process wide
+            taupy.ModelPool.default_pool, so constructing the same model
+            again does not load it again. The pooled model is shared by all
+            instances using it, together with its cache of depth
+            corrections and SeismicPhases.
+        :param create_params: Dictionary of the TauP_Create keyword
+            arguments, e.g. max_interp_error, to build a .tvel or .nd model
+            file with. Each set of parameters is cached separately. Ignored
+            for other models.
 
         Usage:
         >>> from taupy import tau
@@ -69,7 +85,70 @@ class TauPyModel(object):
         ...                     [13,14,50,200], print_output=True)
         """
         self.verbose = verbose
-        self.model = load(model)
+        self.model_name = model
+        self.mmap = mmap
+        self.cache = cache
+        self.create_params = create_params
+        self.model = self._load(model, create_params=create_params)
+        # Whether self.model was loaded by this instance only, so nothing
+        # else uses it.
+        self._private = not cache
+
+    def _load(self, model, reload=False, create_params=None):
+        if model.endswith((".tvel", ".nd")):
+            from .model_cache import build_cached_model
+            model = build_cached_model(model, **(create_params or {}))
+        if self.cache and reload:
+            tMod = default_pool.reload(model, mmap=self.mmap)
+        elif self.cache:
+            tMod = default_pool.get(model, mmap=self.mmap)
+        else:
+            tMod = load(model, mmap=self.mmap)
+        if tMod.depthCache is None:
+            tMod.depthCache = DepthCache()
+        return tMod
+
+    def swap_model(self, model=None, create_params=None):
+        """
+        Replaces the underlying TauModel, e.g. after its file was rebuilt,
+        without restarting the process.
+
+        The new model is loaded completely before it replaces the old one
+        in a single assignment. Queries already running finish on the old
+        model. The depth corrections and SeismicPhases cached for the old
+        model are dropped if it was loaded by this instance, i.e. with
+        cache=False. A pooled model or a TauModel passed in may be used by
+        others, so it keeps its cache, which goes away with the model.
+        Other instances using the same pooled model keep using the old
+        one, even if it was replaced in the pool, until they swap it
+        themselves.
+
+        :param model: A model name or filename as for the constructor, or a
+            TauModel. By default the current model is loaded again from its
+            file, replacing it in the model pool as well.
+        :param create_params: As for the constructor. By default, those of
+            the current model are used.
+        :return: The old TauModel.
+        """
+        if create_params is None:
+            create_params = self.create_params
+        if model is None:
+            tMod = self._load(self.model_name, reload=True,
+                              create_params=create_params)
+        elif isinstance(model, TauModel):
+            tMod = model
+            if tMod.depthCache is None:
+                tMod.depthCache = DepthCache()
+        else:
+            tMod = self._load(model, create_params=create_params)
+            self.model_name = model
+        self.create_params = create_params
+        private = self._private
+        self._private = not self.cache and not isinstance(model, TauModel)
+        old, self.model = self.model, tMod
+        if private and old is not tMod and old.depthCache is not None:
+            old.depthCache.clear()
+        return old
 
     def get_travel_times(self, source_depth_in_km, distance_in_degree=None,
                          phase_list=None, coordinate_list=None,
@@ -104,6 +183,7 @@ class TauPyModel(object):
     def get_pierce_points(self, source_depth_in_km, distance_in_degree=None,
                           phase_list=None, coordinate_list=None,
                           print_output=False):
+        from .TauP_Pierce import TauP_Pierce
         phase_list = phase_list if phase_list is not None else ["ttall"]
         pp = TauP_Pierce(phase_list, self.model.sMod.vMod.modelName,
                          source_depth_in_km, distance_in_degree,
@@ -116,6 +196,7 @@ class TauPyModel(object):
     def get_ray_paths(self, source_depth_in_km, distance_in_degree=None,
                       phase_list=None, coordinate_list=None,
                       print_output=False):
+        from .TauP_Path import TauP_Path
         phase_list = phase_list if phase_list is not None else ["ttall"]
         rp = TauP_Path(phase_list, self.model.sMod.vMod.modelName,
                        source_depth_in_km, distance_in_degree,
@@ -132,6 +213,7 @@ def create_taup_model(model_name, output_dir, input_dir):
     :param model_name:
     :param output_dir:
     """
+    from .TauP_Create import TauP_Create
     if "." in model_name:
         model_file_name = model_name
     else:
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from future.builtins import *
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from taupy.ModelPool import ModelPool
+from taupy.TauModelLoader import load
+
+
+class TestModelPool(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.filenames = []
+        for name in ["iasp91", "ak135"]:
+            filename = os.path.join(self.tempdir, "pool_%s.taupy" % name)
+            load(name).writeArrays(filename)
+            self.filenames.append(filename)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_hits_and_misses(self):
+        pool = ModelPool()
+        tMod = pool.get(self.filenames[0])
+        self.assertIs(pool.get(self.filenames[0]), tMod)
+        self.assertEqual(pool.stats()["hits"], 1)
+        self.assertEqual(pool.stats()["misses"], 1)
+        self.assertEqual(pool.nbytes, os.path.getsize(self.filenames[0]))
+
+    def test_lru_eviction(self):
+        size = max(os.path.getsize(f) for f in self.filenames)
+        pool = ModelPool(max_bytes=size)
+        pool.get(self.filenames[0])
+        pool.get(self.filenames[1])
+        self.assertEqual(len(pool), 1)
+        self.assertEqual(pool.evictions, 1)
+        self.assertNotIn(self.filenames[0], pool)
+        self.assertIn(self.filenames[1], pool)
+        pool.resize(0)
+        self.assertEqual(len(pool), 0)
+        self.assertEqual(pool.nbytes, 0)
+
+    def test_modified_file_is_reloaded(self):
+        pool = ModelPool()
+        tMod = pool.get(self.filenames[0])
+        stat = os.stat(self.filenames[0])
+        os.utime(self.filenames[0], (stat.st_atime, stat.st_mtime + 10))
+        self.assertIsNot(pool.get(self.filenames[0]), tMod)
+        self.assertEqual(len(pool), 1)
+        self.assertEqual(pool.misses, 2)
+
+
+if __name__ == '__main__':
+    unittest.main(buffer=True)
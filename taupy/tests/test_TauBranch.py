@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from future.builtins import *
+
+from copy import deepcopy
+import inspect
+import os
+import unittest
+
+import numpy as np
+
+from taupy.model_arrays import precision_report
+from taupy.SlownessModel import SlownessModel
+from taupy.TauModel import TauModel
+from taupy.VelocityModel import VelocityModel
+
+# to get ./data:
+data_dir = os.path.join(os.path.dirname(os.path.abspath(
+    inspect.getfile(inspect.currentframe()))), "data")
+
+
+class TestTauBranch(unittest.TestCase):
+    def test_calctimedists(self):
+        """
+        The matrix form used by createBranch sums the same increments as
+        calcTimeDist does for every single ray parameter.
+        """
+        sMod = SlownessModel(VelocityModel.readVelocityFile(
+            os.path.join(data_dir, "iasp91.tvel")))
+        tMod = TauModel(sMod)
+        rayParams = np.asarray(tMod.rayParams)
+        for branches in tMod.tauBranches:
+            for branch in branches:
+                topLayerNum = sMod.layerNumberBelow(branch.topDepth,
+                                                    branch.isPWave)
+                botLayerNum = sMod.layerNumberAbove(branch.botDepth,
+                                                    branch.isPWave)
+                time, dist = branch.calcTimeDists(sMod, topLayerNum,
+                                                  botLayerNum, rayParams)
+                tds = [branch.calcTimeDist(sMod, topLayerNum, botLayerNum, p)
+                       for p in rayParams]
+                self.assertEqual(time.tolist(), [td.time for td in tds])
+                self.assertEqual(dist.tolist(), [td.distRadian for td in tds])
+                self.assertEqual(branch.time, time.tolist())
+                self.assertEqual(branch.tau,
+                                 (time - rayParams * dist).tolist())
+
+    def test_parallel_branches(self):
+        """
+        Creating the branches on a process pool gives the same model.
+        """
+        sMod = SlownessModel(VelocityModel.readVelocityFile(
+            os.path.join(data_dir, "iasp91.tvel")))
+        tMod = TauModel(sMod)
+        parallel = TauModel(sMod, processes=2)
+        self.assertEqual(parallel.rayParams, tMod.rayParams)
+        self.assertEqual(parallel.tauBranches, tMod.tauBranches)
+        self.assertEqual(parallel.cmbBranch, tMod.cmbBranch)
+
+    def test_rebuild(self):
+        """
+        Rebuilding for a perturbed velocity model reuses unchanged branches
+        and gives travel times close to those of a new model.
+        """
+        vMod = VelocityModel.readVelocityFile(
+            os.path.join(data_dir, "iasp91.tvel"))
+        tMod = TauModel(SlownessModel(vMod))
+        perturbed = deepcopy(vMod)
+        layer = perturbed.layers[100]
+        layer.topPVelocity *= 1.01
+        layer.botPVelocity *= 1.01
+        sMod = tMod.sMod.resample(perturbed)
+        rebuilt = TauModel(sMod, oldModel=tMod)
+        new = TauModel(sMod)
+        self.assertEqual(rebuilt.rayParams, new.rayParams)
+        self.assertEqual(rebuilt.tauBranches, new.tauBranches)
+        # The P branches above the perturbation are kept.
+        self.assertTrue(all(rebuilt._sameLayers(tMod.sMod, branch)
+                            for branch in tMod.tauBranches[0][:6]))
+        self.assertFalse(rebuilt._sameLayers(tMod.sMod,
+                                             tMod.tauBranches[0][6]))
+        report = precision_report(tMod.rebuild(perturbed),
+                                  TauModel(SlownessModel(perturbed)),
+                                  depths=(0,), distances=(30, 60, 90))
+        self.assertEqual(report["ttp"]["mismatches"], 0)
+        self.assertLess(report["ttall"]["max_dt"], 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main(buffer=True)
@@ -5,14 +5,17 @@ from __future__ import (absolute_import, division, print_function,
 from future.builtins import *
 
 import inspect
+import json
 import os
+import shutil
+import tempfile
 import unittest
 
-from taupy.TauP_Create import TauP_Create
+from taupy.TauP_Create import TauP_Create, report_filename
 
 # to get ./data:
-#data_dir = os.path.join(os.path.dirname(os.path.abspath(
-#    inspect.getfile(inspect.currentframe()))), "data")
+data_dir = os.path.join(os.path.dirname(os.path.abspath(
+    inspect.getfile(inspect.currentframe()))), "data")
 
 
 class TestTauPCreate(unittest.TestCase):
@@ -24,6 +27,40 @@ class TestTauPCreate(unittest.TestCase):
         pass
         # This is tested in test_tauPyModel, so commentd out here to save time.
 
+    def test_report(self):
+        """
+        The report written next to the model has the times of all stages
+        and the counters.
+        """
+        tempdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tempdir, "iasp91.taupy")
+            create = TauP_Create(os.path.join(data_dir, "iasp91.tvel"),
+                                 filename)
+            create.loadVMod()
+            create.run(report=True)
+            with open(report_filename(filename)) as f:
+                report = json.load(f)
+        finally:
+            shutil.rmtree(tempdir)
+        self.assertEqual(report["model"], "iasp91")
+        self.assertEqual(report["params"]["max_interp_error"], 0.05)
+        self.assertEqual(sorted(report["times"]), sorted([
+            "findCriticalPoints", "coarseSample", "rayParamIncCheck",
+            "depthIncCheck", "distanceCheck", "fixCriticalPoints",
+            "calcTauIncFrom", "total"]))
+        self.assertLessEqual(sum(report["times"].values()),
+                             2 * report["times"]["total"])
+        sMod = create.tMod.sMod
+        self.assertEqual(report["p_layers"], len(sMod.PLayers))
+        self.assertEqual(report["s_layers"], len(sMod.SLayers))
+        self.assertEqual(report["ray_params"], len(create.tMod.rayParams))
+        self.assertGreater(report["calls"]["addSlowness"], 0)
+        self.assertGreater(report["calls"]["approxDistance"], 0)
+        self.assertGreater(report["layer_splits"], 0)
+        # Only asked for.
+        self.assertIsNone(TauP_Create(None, None).report)
+
 
 if __name__ == '__main__':
     unittest.main(buffer=True)
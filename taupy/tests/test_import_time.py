@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Import-time budget of taupy.tau. Timings are recorded by
+benchmarks/import_time.py, this checks the budget given there with a margin
+for slow test machines, and that the modules which are not needed for
+travel times stay out of ``import taupy.tau``.
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from future.builtins import *
+
+import inspect
+import os
+import runpy
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(
+    inspect.getfile(inspect.currentframe())))))
+
+DEFERRED = ["argparse", "taupy.TauP_Pierce", "taupy.TauP_Path",
+            "taupy.TauP_Create", "taupy.model_cache"]
+
+# Factor by which the import may exceed the budget here.
+MARGIN = 4
+
+
+class TestImportTime(unittest.TestCase):
+    def test_deferred_imports(self):
+        code = ("import sys, taupy.tau; "
+                "print(' '.join(m for m in %r if m in sys.modules))"
+                % (DEFERRED,))
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        out = subprocess.check_output([sys.executable, "-c", code], env=env)
+        self.assertEqual(out.decode().split(), [])
+
+    def test_budget(self):
+        benchmark = runpy.run_path(
+            os.path.join(ROOT, "benchmarks", "import_time.py"))
+        # The first run may compile the bytecode, the best of the others
+        # is the least disturbed by other processes.
+        runs = [benchmark["import_times"]("taupy.tau") for _ in range(4)]
+        total = min(r["taupy.tau"][1] for r in runs[1:]) / 1000
+        self.assertLess(total, MARGIN * benchmark["BUDGET_MS"])
+
+
+if __name__ == '__main__':
+    unittest.main(buffer=True)
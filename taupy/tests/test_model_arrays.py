@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from future.builtins import *
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from taupy.TauModelLoader import load
+from taupy.TauP_Time import TauP_Time
+from taupy.model_arrays import (is_array_model, precision_report,
+                                read_model, size_report)
+
+
+class TestModelArrays(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tempdir, "iasp91.taupy")
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_round_trip(self):
+        """
+        Writing and reading a model must give back identical branch tables,
+        slowness layers and travel times.
+        """
+        tMod = load("iasp91")
+        tMod.writeArrays(self.filename)
+        self.assertTrue(is_array_model(self.filename))
+        newMod = read_model(self.filename)
+
+        self.assertEqual(list(tMod.rayParams), list(newMod.rayParams))
+        for branches, newBranches in zip(tMod.tauBranches,
+                                         newMod.tauBranches):
+            for tb, newTb in zip(branches, newBranches):
+                self.assertEqual(list(tb.dist), list(newTb.dist))
+                self.assertEqual(list(tb.time), list(newTb.time))
+                self.assertEqual(list(tb.tau), list(newTb.tau))
+                self.assertEqual(tb.minTurnRayParam, newTb.minTurnRayParam)
+        for isPWave in [True, False]:
+            for i in range(tMod.sMod.getNumLayers(isPWave)):
+                self.assertEqual(
+                    str(tMod.sMod.getSlownessLayer(i, isPWave)),
+                    str(newMod.sMod.getSlownessLayer(i, isPWave)))
+        # Fluid layers must still be shared between P and S.
+        self.assertEqual(
+            sum(l in newMod.sMod.PLayers for l in newMod.sMod.SLayers),
+            sum(l in tMod.sMod.PLayers for l in tMod.sMod.SLayers))
+        self.assertEqual(newMod.sMod.vMod.modelName, "iasp91")
+        self.assertEqual(len(newMod.sMod.vMod.layers), 129)
+
+        for depth in [0, 10, 600]:
+            times = []
+            for model in [tMod, newMod]:
+                tt = TauP_Time(model, ["ttall"], depth, 35)
+                tt.run()
+                times.append([(a.name, a.time, a.takeoffAngle)
+                              for a in tt.arrivals])
+            self.assertEqual(times[0], times[1])
+
+    def test_mmap(self):
+        """
+        Memory mapped models share the file pages instead of copying them.
+        """
+        load("iasp91").writeArrays(self.filename)
+        tMod = read_model(self.filename, mmap=True)
+        self.assertFalse(tMod.rayParams.flags.owndata)
+        self.assertFalse(tMod.rayParams.flags.writeable)
+        self.assertFalse(tMod.tauBranches[0][3].dist.flags.writeable)
+        tt = TauP_Time(tMod, ["P"], 10, 35)
+        tt.run()
+        self.assertEqual(round(tt.arrivals[0].time, 2), 412.43)
+
+    def test_lazy_layers(self):
+        """
+        Slowness and velocity layers are only created when needed and give
+        the same results as an eagerly read model.
+        """
+        load("iasp91").writeArrays(self.filename)
+        eager = read_model(self.filename, lazy=False)
+        lazy = read_model(self.filename)
+        self.assertIsNone(lazy.sMod._PLayers)
+        self.assertIsNone(lazy.sMod.vMod._layers)
+        self.assertEqual(lazy.sMod.vMod.modelName, "iasp91")
+        times = []
+        for model in [eager, lazy]:
+            tt = TauP_Time(model, ["ttall"], 10, 35)
+            tt.run()
+            times.append([(a.name, a.time, a.takeoffAngle)
+                          for a in tt.arrivals])
+        self.assertEqual(times[0], times[1])
+        self.assertEqual(len(lazy.sMod.PLayers), len(eager.sMod.PLayers))
+        self.assertEqual(len(lazy.sMod.vMod.layers), 129)
+
+    def test_slim(self):
+        """
+        Slim models are smaller and give the same query results.
+        """
+        tMod = load("iasp91")
+        tMod.writeArrays(self.filename)
+        slimFilename = os.path.join(self.tempdir, "slim.taupy")
+        tMod.writeArrays(slimFilename, slim=True)
+        full = size_report(self.filename)
+        slim = size_report(slimFilename)
+        self.assertEqual(sum(full.values()), os.path.getsize(self.filename))
+        self.assertEqual(sum(slim.values()), os.path.getsize(slimFilename))
+        self.assertNotIn("critical_depths", slim)
+        self.assertNotIn("tau_tau", slim)
+        self.assertLess(slim["velocity_layers"], full["velocity_layers"])
+
+        slimMod = read_model(slimFilename)
+        self.assertEqual(slimMod.sMod.criticalDepths, [])
+        self.assertEqual(list(slimMod.tauBranches[0][2].tau),
+                         list(tMod.tauBranches[0][2].tau))
+        for depth in [0, 300]:
+            times = []
+            for model in [tMod, slimMod]:
+                tt = TauP_Time(model, ["ttall"], depth, 35)
+                tt.run()
+                times.append([(a.name, a.time, a.takeoffAngle)
+                              for a in tt.arrivals])
+            self.assertEqual(times[0], times[1])
+
+    def test_float32(self):
+        """
+        Single precision branch tables take half the space and stay within
+        a millisecond of the full model.
+        """
+        tMod = load("iasp91")
+        tMod.writeArrays(self.filename)
+        smallFilename = os.path.join(self.tempdir, "float32.taupy")
+        tMod.writeArrays(smallFilename, dtype="float32")
+        full = size_report(self.filename)
+        small = size_report(smallFilename)
+        self.assertEqual(small["tau_time"] * 2, full["tau_time"])
+        self.assertEqual(small["rayParams"], full["rayParams"])
+
+        smallMod = read_model(smallFilename)
+        self.assertEqual(smallMod.tauBranches[0][0].dist.dtype.name,
+                         "float32")
+        report = precision_report(tMod, smallMod, depths=[0, 300],
+                                  distances=[10, 60, 150])
+        self.assertEqual(list(report), ["ttp", "tts", "ttp+", "tts+",
+                                        "ttbasic", "ttall"])
+        for entry in report.values():
+            self.assertGreater(entry["max_dt"], 0)
+            self.assertLess(entry["max_dt"], 1e-3)
+            self.assertEqual(entry["mismatches"], 0)
+        # Arrivals are compared for a surface source, too.
+        report = precision_report(tMod, smallMod, depths=[0],
+                                  distances=[10, 60, 150])
+        for entry in report.values():
+            self.assertGreater(entry["max_dt"], 0)
+            self.assertEqual(entry["depth"], 0)
+            self.assertIsNotNone(entry["phase"])
+        # Identical models don't differ at all.
+        report = precision_report(tMod, read_model(self.filename),
+                                  depths=[10], distances=[30])
+        self.assertEqual(report["ttall"]["max_dt"], 0)
+        self.assertIsNone(report["ttall"]["phase"])
+
+    def test_load_by_filename(self):
+        filename = os.path.join(self.tempdir, "custom.taupy")
+        load("ak135").writeArrays(filename)
+        tMod = load(filename)
+        self.assertEqual(tMod.sMod.vMod.modelName, "ak135")
+
+
+if __name__ == '__main__':
+    unittest.main(buffer=True)
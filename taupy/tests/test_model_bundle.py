@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from future.builtins import *
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from taupy.model_bundle import (is_bundle, read_bundle_model, read_toc,
+                                write_bundle)
+from taupy.ModelPool import ModelPool
+from taupy.TauModelLoader import find_model, load
+from taupy.TauP_Time import TauP_Time
+
+
+def travel_times(tMod, depth, distance):
+    tt = TauP_Time(tMod, ["ttall"], depth, distance)
+    tt.run()
+    return [(a.name, a.time, a.takeoffAngle) for a in tt.arrivals]
+
+
+class TestModelBundle(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tempdir, "models.taupyb")
+        self.models = dict((name, load(name)) for name in ["iasp91", "ak135"])
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_random_access(self):
+        write_bundle(self.models, self.filename)
+        self.assertTrue(is_bundle(self.filename))
+        toc = read_toc(self.filename)
+        self.assertEqual(sorted(toc), ["ak135", "iasp91"])
+        self.assertEqual(toc["iasp91"]["depths"], {})
+        for entry in toc.values():
+            self.assertEqual(entry["offset"] % 64, 0)
+        for mmap in [False, True]:
+            for name, tMod in self.models.items():
+                tBundled = read_bundle_model(self.filename, name, mmap=mmap)
+                self.assertEqual(tBundled.sMod.vMod.modelName, name)
+                self.assertEqual(tBundled.depthCache.depths(), [])
+                self.assertEqual(travel_times(tBundled, 10, 40),
+                                 travel_times(tMod, 10, 40))
+
+    def test_depth_variants(self):
+        write_bundle([self.models["iasp91"]], self.filename, depths=[100])
+        tMod = read_bundle_model(self.filename, "iasp91")
+        self.assertEqual(tMod.depthCache.depths(), [100.0])
+        self.assertIsNone(tMod.loadFromDepthCache(200))
+        corrected = tMod.depthCorrect(100)
+        self.assertEqual(corrected.sourceDepth, 100)
+        self.assertIs(tMod.depthCorrect(100), corrected)
+        self.assertEqual(travel_times(tMod, 100, 40),
+                         travel_times(self.models["iasp91"], 100, 40))
+
+    def test_internal_bundle(self):
+        filename, name = find_model("iasp91")
+        if name is None:
+            raise unittest.SkipTest("Internal models are not bundled.")
+        self.assertEqual(name, "iasp91")
+        pool = ModelPool()
+        iasp91 = pool.get("iasp91")
+        self.assertIsNot(pool.get("ak135"), iasp91)
+        self.assertIs(pool.get("iasp91"), iasp91)
+        self.assertEqual(pool.nbytes, sum(
+            entry["size"] for entry in read_toc(filename).values()))
+
+    def test_named_like_internal(self):
+        """
+        Files named like an internal model are read, not the internal model.
+        """
+        filename = os.path.join(self.tempdir, "iasp91.taupy")
+        self.models["ak135"].writeArrays(filename)
+        self.assertEqual(find_model(filename), (filename, None))
+        self.assertEqual(load(filename).sMod.vMod.modelName, "ak135")
+        self.assertEqual(
+            ModelPool().get(filename).sMod.vMod.modelName, "ak135")
+        # Relative paths, too.
+        cwd = os.getcwd()
+        try:
+            os.chdir(self.tempdir)
+            self.assertEqual(find_model("iasp91.taupy"),
+                             ("iasp91.taupy", None))
+            path = os.path.join(os.curdir, "iasp91.taupy")
+            self.assertEqual(load(path).sMod.vMod.modelName, "ak135")
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(load("iasp91").sMod.vMod.modelName, "iasp91")
+
+
+if __name__ == '__main__':
+    unittest.main(buffer=True)
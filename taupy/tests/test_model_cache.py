@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from future.builtins import *
+
+import inspect
+import os
+import shutil
+import tempfile
+import unittest
+
+from taupy.model_cache import build_cached_model, model_cache_key
+from taupy.tau import TauPyModel
+
+# Most generic way to get the data folder path.
+DATA = os.path.join(os.path.dirname(os.path.abspath(
+    inspect.getfile(inspect.currentframe()))), "data")
+
+
+class TestModelCache(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.tvel = os.path.join(DATA, "iasp91.tvel")
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_cache_key(self):
+        key = model_cache_key(self.tvel)
+        self.assertEqual(key, model_cache_key(self.tvel, max_delta_p=11.0))
+        self.assertNotEqual(key, model_cache_key(self.tvel,
+                                                 max_interp_error=0.01))
+        self.assertNotEqual(key, model_cache_key(
+            os.path.join(DATA, "iasp91_w_comment.tvel")))
+
+    def test_build_and_reuse(self):
+        filename = build_cached_model(self.tvel, cache_dir=self.tempdir)
+        self.assertTrue(os.path.exists(filename))
+        mtime = os.stat(filename).st_mtime
+        self.assertEqual(build_cached_model(self.tvel,
+                                            cache_dir=self.tempdir),
+                         filename)
+        self.assertEqual(os.stat(filename).st_mtime, mtime)
+        # Only the model and its lock file are left behind.
+        self.assertEqual(sorted(os.listdir(self.tempdir)),
+                         sorted([os.path.basename(filename),
+                                 os.path.basename(filename) + ".lock"]))
+
+        os.environ["TAUPY_CACHE_DIR"] = self.tempdir
+        try:
+            model = TauPyModel(self.tvel)
+        finally:
+            del os.environ["TAUPY_CACHE_DIR"]
+        self.assertEqual(round(model.get_travel_times(10, 35, ["P"])[0].time,
+                               2), 412.43)
+
+    def test_create_params(self):
+        """
+        TauPyModel builds velocity model files with the given parameters,
+        each set cached separately.
+        """
+        coarse = {"max_interp_error": 0.5}
+        os.environ["TAUPY_CACHE_DIR"] = self.tempdir
+        try:
+            default = TauPyModel(self.tvel)
+            model = TauPyModel(self.tvel, create_params=coarse)
+            self.assertEqual(len([f for f in os.listdir(self.tempdir)
+                                  if not f.endswith(".lock")]), 2)
+            self.assertLess(len(model.model.rayParams),
+                            len(default.model.rayParams))
+            # Swapping builds with the given parameters and keeps them.
+            default.swap_model(self.tvel, create_params=coarse)
+            self.assertIs(default.model, model.model)
+            default.swap_model()
+            self.assertEqual(default.create_params, coarse)
+            self.assertEqual(len(default.model.rayParams),
+                             len(model.model.rayParams))
+        finally:
+            del os.environ["TAUPY_CACHE_DIR"]
+
+
+if __name__ == '__main__':
+    unittest.main(buffer=True)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from future.builtins import *
+
+from copy import deepcopy
+import inspect
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from taupy.helper_classes import TauModelError
+from taupy.model_ensemble import (build_ensemble, is_ensemble, read_ensemble,
+                                  write_ensemble)
+from taupy.TauP_Time import TauP_Time
+from taupy.VelocityModel import VelocityModel
+
+# Most generic way to get the data folder path.
+DATA = os.path.join(os.path.dirname(os.path.abspath(
+    inspect.getfile(inspect.currentframe()))), "data")
+
+
+def perturbations(vMod, factors):
+    """
+    Scales the P velocities of the lower mantle layers between 1403.5 and
+    2443 km depth.
+    """
+    for factor in factors:
+        perturbed = deepcopy(vMod)
+        for layer in perturbed.layers[30:50]:
+            layer.topPVelocity *= factor
+            layer.botPVelocity *= factor
+        yield perturbed
+
+
+class TestModelEnsemble(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tempdir, "iasp91.taupye")
+        self.vMod = VelocityModel.readVelocityFile(
+            os.path.join(DATA, "iasp91.tvel"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_ensemble(self):
+        factors = [1.005, 1.01, 1.02]
+        ensemble = build_ensemble(self.vMod,
+                                  perturbations(self.vMod, factors),
+                                  self.filename, processes=1)
+        self.assertEqual(len(ensemble), 3)
+        # The discontinuities are the same for all members.
+        self.assertNotIn("branch_depths", ensemble.attrs["stacked"])
+        self.assertIn("rayParams", ensemble.attrs["stacked"])
+        self.assertTrue(is_ensemble(self.filename))
+        for mmap in [False, True]:
+            read = read_ensemble(self.filename, mmap=mmap)
+            self.assertEqual(read.attrs, ensemble.attrs)
+            for name, array in ensemble.arrays.items():
+                np.testing.assert_array_equal(read.arrays[name], array)
+
+        distances = [0, 30, 60, 90, 120]
+        for isPWave in [True, False]:
+            times = ensemble.direct_times(distances, isPWave)
+            self.assertEqual(times.shape, (3, 5))
+            # No direct wave in the core shadow.
+            self.assertTrue(np.isnan(times[:, -1]).all())
+            for i in range(3):
+                tMod = ensemble.member(i)
+                for j, distance in enumerate(distances[:-1]):
+                    tt = TauP_Time(tMod, ["P" if isPWave else "S"], 0,
+                                   distance)
+                    tt.run()
+                    self.assertAlmostEqual(times[i, j], min(
+                        a.time for a in tt.arrivals), delta=1e-9)
+        # Faster P velocities in the lower mantle give earlier arrivals at
+        # distances where the rays go through it, but not at shorter ones.
+        times = ensemble.direct_times([30, 60])
+        self.assertEqual(times[0, 0], times[2, 0])
+        self.assertGreater(times[0, 1], times[1, 1])
+        self.assertGreater(times[1, 1], times[2, 1])
+
+        # Writing the members again gives the same ensemble.
+        filename = os.path.join(self.tempdir, "copy.taupye")
+        write_ensemble([ensemble.member(i, lazy=False) for i in range(3)],
+                       filename)
+        np.testing.assert_array_equal(
+            read_ensemble(filename).stacked("tau_time"),
+            ensemble.stacked("tau_time"))
+
+    def test_process_pool(self):
+        factors = [1.005, 1.01]
+        serial = build_ensemble(self.vMod, perturbations(self.vMod, factors),
+                                processes=1)
+        parallel = build_ensemble(self.vMod,
+                                  perturbations(self.vMod, factors),
+                                  processes=2)
+        self.assertEqual(parallel.attrs, serial.attrs)
+        for name, array in serial.arrays.items():
+            np.testing.assert_array_equal(parallel.arrays[name], array)
+
+    def test_empty(self):
+        self.assertRaises(TauModelError, build_ensemble, self.vMod, [],
+                          processes=1)
+
+
+if __name__ == '__main__':
+    unittest.main(buffer=True)
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from future.builtins import *
+
+import inspect
+import os
+import unittest
+
+from taupy.model_sweep import fastest_within, sweep
+
+# Most generic way to get the data folder path.
+DATA = os.path.join(os.path.dirname(os.path.abspath(
+    inspect.getfile(inspect.currentframe()))), "data")
+
+
+class TestModelSweep(unittest.TestCase):
+    def test_sweep(self):
+        rows = sweep(os.path.join(DATA, "iasp91.tvel"),
+                     {"max_interp_error": [0.05, 0.5]}, processes=1,
+                     depths=(0,), distances=(30, 60))
+        self.assertEqual([row["params"]["max_interp_error"] for row in rows],
+                         [0.05, 0.5])
+        self.assertEqual(rows[0]["params"]["max_range_interval"], 2.5)
+        # The first is the densest build, which the others are compared to.
+        self.assertGreater(rows[0]["ray_params"], rows[1]["ray_params"])
+        self.assertGreater(rows[0]["size"], rows[1]["size"])
+        self.assertEqual(rows[0]["max_dt"], 0.0)
+        self.assertGreater(rows[1]["max_dt"], 0.0)
+        for row in rows:
+            self.assertGreater(row["build_time"], 0)
+            self.assertGreater(row["query_time"], 0)
+        self.assertIs(fastest_within(rows, 0.0), rows[0])
+        self.assertIsNone(fastest_within(rows, -1.0))
+
+    def test_invalid_param(self):
+        self.assertRaises(ValueError, sweep, os.path.join(DATA, "iasp91.tvel"),
+                          {"allow_inner_core_s": [True, False]})
+
+
+if __name__ == '__main__':
+    unittest.main(buffer=True)
@@ -3,10 +3,26 @@
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 from future.builtins import *
+from copy import deepcopy
+import inspect
+import os
 import unittest
 
-from taupy.SlownessLayer import create_from_vlayer
+import numpy as np
+
+from taupy.helper_classes import SlownessModelError
+from taupy.SlownessLayer import (SlownessLayer, SlownessLayerArray,
+                                 SlownessLayerList, create_from_vlayer,
+                                 shared_layers)
+from taupy.SlownessModel import SlownessModel
+from taupy.TauModel import TauModel
+from taupy.TauP_Time import TauP_Time
 from taupy.VelocityLayer import VelocityLayer
+from taupy.VelocityModel import VelocityModel
+
+# to get ./data:
+data_dir = os.path.join(os.path.dirname(os.path.abspath(
+    inspect.getfile(inspect.currentframe()))), "data")
 
 
 class TestSlownessModel(unittest.TestCase):
@@ -29,5 +45,362 @@ class TestSlownessModel(unittest.TestCase):
         b = create_from_vlayer(vLayer, False)
         self.assertEqual(b.topP, 3180.5)
 
+    def test_slownesslayerlist(self):
+        # Slowness decreasing, constant, then increasing with depth (as at
+        # the core mantle boundary for P) and decreasing again.
+        layers = SlownessLayerList([
+            SlownessLayer(10, 0, 8, 10), SlownessLayer(8, 10, 8, 20),
+            SlownessLayer(8, 20, 6, 30), SlownessLayer(6, 30, 9, 30),
+            SlownessLayer(9, 30, 7, 40), SlownessLayer(7, 40, 5, 50)])
+        for p in [4, 5, 6, 6.5, 7, 7.5, 8, 8.5, 9, 9.5, 10, 11]:
+            expected = [i for i, layer in enumerate(layers)
+                        if (layer.topP - p) * (p - layer.botP) > 0]
+            self.assertEqual(layers.findSlowness(p), expected)
+        for i, layer in enumerate(layers):
+            self.assertEqual(layers.index(layer), i)
+        self.assertRaises(ValueError, layers.index, SlownessLayer(8, 10, 8,
+                                                                  20))
+        # Splitting keeps the cached runs up to date.
+        layers.findSlowness(7)
+        layers.split(4, SlownessLayer(9, 30, 8, 35),
+                     SlownessLayer(8, 35, 7, 40))
+        self.assertEqual(layers.findSlowness(7.5), [2, 3, 5])
+        self.assertEqual(layers.findSlowness(6.5), [2, 3, 6])
+        # Any other change discards them.
+        layers.append(SlownessLayer(5, 50, 3, 60))
+        self.assertEqual(layers.findSlowness(4), [7])
+
+    def test_slownesslayerarray(self):
+        rows = [[10, 0, 8, 10], [8, 10, 8, 20], [8, 20, 6, 30],
+                [6, 30, 9, 30], [9, 30, 7, 40], [7, 40, 5, 50]]
+        rows = [[float(value) for value in row] for row in rows]
+        layers = SlownessLayerArray([SlownessLayer(*row) for row in rows])
+        self.assertEqual(len(layers), 6)
+        self.assertEqual(layers.getArray().tolist(), rows)
+        self.assertEqual(layers.botP.tolist(), [row[2] for row in rows])
+        self.assertEqual(str(layers[-1]), str(SlownessLayer(*rows[-1])))
+        self.assertEqual([str(l) for l in layers[1:3]],
+                         [str(SlownessLayer(*row)) for row in rows[1:3]])
+        for p in [4, 5, 6, 6.5, 7, 7.5, 8, 8.5, 9, 9.5, 10, 11]:
+            self.assertEqual(layers.findSlowness(p),
+                             SlownessLayerList(layers).findSlowness(p))
+        # Layers are found by their values.
+        self.assertEqual(layers.index(SlownessLayer(8, 10, 8, 20)), 1)
+        self.assertIn(layers[4], layers)
+        self.assertNotIn(SlownessLayer(8, 10, 8, 21), layers)
+        self.assertRaises(ValueError, layers.index, layers[0], 1)
+        # Copies don't share the array.
+        copied = deepcopy(layers)
+        layers.split(4, SlownessLayer(9, 30, 8, 35),
+                     SlownessLayer(8, 35, 7, 40))
+        del layers[0]
+        layers.insert(0, SlownessLayer(*rows[0]))
+        layers[-1] = SlownessLayer(7, 40, 4, 50)
+        self.assertEqual(layers.getArray().tolist(), rows[:4] + [
+            [9, 30, 8, 35], [8, 35, 7, 40], [7, 40, 4, 50]])
+        self.assertEqual(copied.getArray().tolist(), rows)
+        # Read only arrays, e.g. memory mapped ones, are copied on write.
+        array = np.array(rows, dtype=np.float64)
+        array.flags.writeable = False
+        layers = SlownessLayerArray(array)
+        layers[0] = SlownessLayer(11, 0, 8, 10)
+        self.assertEqual(array[0, 0], 10)
+
+    def test_uselayerarrays(self):
+        """
+        A slowness model keeps working the same with its layers in arrays.
+        """
+        tMod = TauModel(SlownessModel(VelocityModel.readVelocityFile(
+            os.path.join(data_dir, "iasp91.tvel"))))
+        arrayMod = deepcopy(tMod)
+        sMod = arrayMod.sMod
+        sMod.useLayerArrays()
+        self.assertIsInstance(sMod.SLayers, SlownessLayerArray)
+        for depth in [10, 100, 2900]:
+            times = []
+            for model in [tMod, arrayMod]:
+                tt = TauP_Time(model, ["ttbasic"], depth, 47)
+                tt.run()
+                times.append([(a.name, a.time, a.takeoffAngle)
+                              for a in tt.arrivals])
+            self.assertEqual(times[0], times[1])
+        # Back in lists, the fluid layers are shared again.
+        sMod.useLayerArrays(False)
+        self.assertIsInstance(sMod.SLayers, SlownessLayerList)
+        self.assertEqual(sum(l in sMod.PLayers for l in sMod.SLayers),
+                         sum(l in tMod.sMod.PLayers
+                             for l in tMod.sMod.SLayers))
+
+    def test_approxdistance_partialsums(self):
+        sMod = SlownessModel(VelocityModel.readVelocityFile(
+            os.path.join(data_dir, "iasp91.tvel")))
+        partialSums = {}
+        layerNum = sMod.getNumLayers(True) // 2
+        p = sMod.PLayers[layerNum].botP
+        for j in [layerNum - 10, layerNum - 20, layerNum]:
+            full = sMod.approxDistance(j, p, True)
+            partial = sMod.approxDistance(j, p, True, partialSums)
+            self.assertEqual((full.time, full.distRadian),
+                             (partial.time, partial.distRadian))
+        # Splitting a layer above invalidates the sums below it.
+        sMod.addSlowness((sMod.PLayers[5].topP + sMod.PLayers[5].botP) / 2,
+                         True)
+        full = sMod.approxDistance(layerNum + 1, p, True)
+        partial = sMod.approxDistance(layerNum + 1, p, True, partialSums)
+        self.assertEqual((full.time, full.distRadian),
+                         (partial.time, partial.distRadian))
+
+    def test_layertimedists(self):
+        sMod = SlownessModel(VelocityModel.readVelocityFile(
+            os.path.join(data_dir, "iasp91.tvel")))
+        for isPWave in [True, False]:
+            layers = sMod.PLayers if isPWave else sMod.SLayers
+            # Includes the centre of the Earth for p == 0, zero thickness
+            # and constant velocity layers.
+            for p in [0, 0.5 * layers[-1].topP, layers[40].botP,
+                      layers[300].botP]:
+                layerNums = [i for i, layer in enumerate(layers)
+                             if p <= min(layer.topP, layer.botP)]
+                time, distRadian = sMod.layerTimeDists(p, layerNums,
+                                                       isPWave)
+                tds = [sMod.layerTimeDist(p, i, isPWave) for i in layerNums]
+                np.testing.assert_allclose(time, [td.time for td in tds],
+                                           rtol=1e-12, atol=1e-14)
+                np.testing.assert_allclose(
+                    distRadian, [td.distRadian for td in tds], rtol=1e-12,
+                    atol=1e-14)
+            # Broadcasting ray parameters against layers.
+            p = np.array([0, min(min(layer.topP, layer.botP)
+                                 for layer in layers[:300])])
+            time, distRadian = sMod.layerTimeDists(p[:, None], range(300),
+                                                   isPWave)
+            self.assertEqual(time.shape, (2, 300))
+            self.assertAlmostEqual(time[1, 299], sMod.layerTimeDist(
+                p[1], 299, isPWave).time, delta=1e-12 * time[1, 299])
+        self.assertRaises(SlownessModelError, sMod.layerTimeDists,
+                          2 * sMod.PLayers[0].topP, [10], True)
+        # Plain lists of layers, e.g. of unpickled models, are converted, so
+        # the array is cached for them, too.
+        sMod.PLayers = list(sMod.PLayers)
+        self.assertIs(sMod.getLayerArray(True), sMod.getLayerArray(True))
+
+    def test_resample(self):
+        vMod = VelocityModel.readVelocityFile(
+            os.path.join(data_dir, "iasp91.tvel"))
+        sMod = SlownessModel(vMod)
+        oldLayers = [list(sMod.PLayers), list(sMod.SLayers)]
+        perturbed = deepcopy(vMod)
+        layer = perturbed.layers[100]
+        layer.topPVelocity *= 1.01
+        layer.botPVelocity *= 1.01
+        resampled = sMod.resample(perturbed)
+        self.assertIs(resampled.vMod, perturbed)
+        self.assertTrue(resampled.validate())
+        # The old model is left alone.
+        self.assertEqual([list(sMod.PLayers), list(sMod.SLayers)], oldLayers)
+        for isPWave, old in zip([True, False], oldLayers):
+            layers = resampled.PLayers if isPWave else resampled.SLayers
+            # The layers above the perturbation are kept unless a new ray
+            # parameter splits them, the ones within it are new.
+            kept = [l for l in layers if any(l is o for o in old)]
+            self.assertTrue(len(kept) > len(old) // 2)
+            self.assertFalse([l for l in kept if layer.topDepth <= l.topDepth
+                              and l.botDepth <= layer.botDepth])
+            # Every ray parameter of the old model is sampled in the
+            # perturbed layer.
+            ps = set(l.topP for l in layers
+                     if layer.topDepth <= l.topDepth < layer.botDepth)
+            for l in old:
+                if layer.topDepth <= l.topDepth < layer.botDepth \
+                        and min(ps) < l.topP < max(ps):
+                    self.assertIn(l.topP, ps)
+        # Critical depths are those of the perturbed model, which has a
+        # P discontinuity at the top and the bottom of the layer now.
+        self.assertEqual([cd.depth for cd in resampled.criticalDepths],
+                         [cd.depth for cd in SlownessModel(
+                             perturbed).criticalDepths])
+        # Without a change, the layers stay the same.
+        same = sMod.resample(deepcopy(vMod))
+        self.assertEqual([list(same.PLayers), list(same.SLayers)], oldLayers)
+
+    def test_resample_perturbed_range(self):
+        """
+        Perturbations of several layers, one in the upper mantle and one that
+        creates a high slowness zone in the lower mantle, give the same
+        travel times as a model created from scratch.
+        """
+        vMod = VelocityModel.readVelocityFile(
+            os.path.join(data_dir, "iasp91.tvel"))
+        tMod = TauModel(SlownessModel(vMod))
+        for start, stop, waves in [(3, 12, "PS"), (39, 44, "P")]:
+            perturbed = deepcopy(vMod)
+            for layer in perturbed.layers[start:stop]:
+                layer.topPVelocity *= 0.98
+                layer.botPVelocity *= 0.98
+                if "S" in waves:
+                    layer.topSVelocity *= 0.98
+                    layer.botSVelocity *= 0.98
+            rebuilt = tMod.rebuild(perturbed)
+            self.assertTrue(rebuilt.sMod.validate())
+            highZones = rebuilt.sMod.highSlownessLayerDepthsP
+            self.assertTrue(highZones)
+            for highZone in highZones:
+                self.assertIn(highZone.rayParam, rebuilt.rayParams)
+            fresh = TauModel(SlownessModel(perturbed))
+            for distance in [30, 60, 90]:
+                times = []
+                for model in [rebuilt, fresh]:
+                    tt = TauP_Time(model, ["P", "S"], 0, distance)
+                    tt.run()
+                    times.append([(a.name, a.time) for a in tt.arrivals])
+                self.assertEqual([a[0] for a in times[0]],
+                                 [a[0] for a in times[1]])
+                for a, b in zip(*times):
+                    self.assertAlmostEqual(a[1], b[1], delta=0.01)
+
+    def test_minimal(self):
+        """
+        The minimal sampling has fewer ray parameters and stays within the
+        error budget of the default one.
+        """
+        vMod = VelocityModel.readVelocityFile(
+            os.path.join(data_dir, "iasp91.tvel"))
+        tMod = TauModel(SlownessModel(vMod))
+        sMod = SlownessModel(vMod, report=True, minimal=True)
+        minimalMod = TauModel(sMod)
+        self.assertNotIn("depthIncCheck", sMod.report["times"])
+        self.assertGreater(sMod.report["removed_samples"], 0)
+        self.assertLess(len(minimalMod.rayParams), len(tMod.rayParams))
+        for depth in [0, 300]:
+            times = []
+            for model in [tMod, minimalMod]:
+                tt = TauP_Time(model, ["ttbasic"], depth, 47)
+                tt.run()
+                times.append([(a.name, a.time) for a in tt.arrivals])
+            self.assertEqual([a[0] for a in times[0]],
+                             [a[0] for a in times[1]])
+            for a, b in zip(*times):
+                self.assertAlmostEqual(a[1], b[1], delta=0.1)
+        # The sampling of P and S is consistent, i.e. the layers shared in
+        # fluids have been merged in both.
+        outerCore = sMod.fluidLayerDepths[0]
+        shared = [i for l, i in zip(sMod.SLayers, shared_layers(
+            sMod.PLayers, sMod.SLayers)) if outerCore.topDepth <= l.topDepth
+            < l.botDepth <= outerCore.botDepth]
+        self.assertTrue(shared)
+        self.assertNotIn(-1, shared)
+        # Resampling keeps the mode.
+        perturbed = deepcopy(vMod)
+        layer = perturbed.layers[100]
+        layer.topPVelocity *= 1.01
+        layer.botPVelocity *= 1.01
+        resampled = sMod.resample(perturbed)
+        self.assertTrue(resampled.minimal)
+        self.assertTrue(resampled.validate())
+        # Samples are removed the same way from layers in arrays.
+        lists = SlownessModel(vMod)
+        arrays = deepcopy(lists)
+        arrays.useLayerArrays()
+        lists.removeRedundantSamples()
+        arrays.removeRedundantSamples()
+        self.assertIsInstance(arrays.PLayers, SlownessLayerArray)
+        self.assertIsInstance(arrays.SLayers, SlownessLayerArray)
+        self.assertLess(len(arrays.PLayers), len(tMod.sMod.PLayers))
+        for isPWave in [True, False]:
+            np.testing.assert_array_equal(arrays.getLayerArray(isPWave),
+                                          lists.getLayerArray(isPWave))
+
+    def test_depthinccheck(self):
+        """
+        depthIncCheck evaluates the velocity model at the depths of all layers
+        at once, from the layers as they are when it runs.
+        """
+        vMod = VelocityModel.readVelocityFile(
+            os.path.join(data_dir, "iasp91.tvel"))
+        SlownessModel(vMod, maxDepthInterval=20)
+        for layer in vMod.layers[20:30]:
+            layer.topPVelocity *= 1.01
+            layer.botPVelocity *= 1.01
+        changed = SlownessModel(vMod, maxDepthInterval=20)
+        fresh = SlownessModel(deepcopy(vMod), maxDepthInterval=20)
+        for isPWave in [True, False]:
+            np.testing.assert_array_equal(changed.getLayerArray(isPWave),
+                                          fresh.getLayerArray(isPWave))
+
+    def test_batched_checks(self):
+        """
+        The increment checks give the same layers with and without batching
+        the new slownesses, also when the layers are split many times.
+        """
+        class UnbatchedModel(SlownessModel):
+            def rayParamIncCheck(self):
+                SlownessModel.rayParamIncCheck(self, batched=False)
+
+            def depthIncCheck(self):
+                SlownessModel.depthIncCheck(self, batched=False)
+
+        vMod = VelocityModel.readVelocityFile(
+            os.path.join(data_dir, "iasp91.tvel"))
+        for allowInnerCoreS in [True, False]:
+            sMods = [cls(vMod, maxDeltaP=1.0, maxDepthInterval=20.0,
+                         allowInnerCoreS=allowInnerCoreS, report=True)
+                     for cls in [SlownessModel, UnbatchedModel]]
+            for key in ["calls", "layer_splits"]:
+                self.assertEqual(sMods[0].report[key], sMods[1].report[key])
+            for isPWave in [True, False]:
+                np.testing.assert_array_equal(
+                    sMods[0].getLayerArray(isPWave),
+                    sMods[1].getLayerArray(isPWave))
+            # The same layers are shared between P and S, i.e. those of the
+            # outer core.
+            shared = [[i for i, l in enumerate(sMod.PLayers)
+                       if any(l is s for s in sMod.SLayers)]
+                      for sMod in sMods]
+            self.assertTrue(shared[0])
+            self.assertEqual(shared[0], shared[1])
+
+    def test_layernumber(self):
+        """
+        The layer lookups agree with walking the layers, also for the zero
+        thickness layers of total reflections, in scalar and batch form.
+        """
+        sMod = SlownessModel(VelocityModel.readVelocityFile(
+            os.path.join(data_dir, "iasp91.tvel")))
+
+        def check(isPWave):
+            layers = sMod.PLayers if isPWave else sMod.SLayers
+            depths = sorted(set(l.topDepth for l in layers)) + [
+                0.5, 1234.5, 6371.0]
+            above = [min(i for i, l in enumerate(layers)
+                         if l.topDepth < d <= l.botDepth or d == 0)
+                     for d in depths]
+            below = [max(i for i, l in enumerate(layers)
+                         if l.topDepth <= d < l.botDepth
+                         or d == layers[-1].botDepth)
+                     for d in depths]
+            self.assertEqual([sMod.layerNumberAbove(d, isPWave)
+                              for d in depths], above)
+            self.assertEqual([sMod.layerNumberBelow(d, isPWave)
+                              for d in depths], below)
+            self.assertEqual(
+                sMod.layerNumbersAbove(depths, isPWave).tolist(), above)
+            self.assertEqual(
+                sMod.layerNumbersBelow(depths, isPWave).tolist(), below)
+
+        for isPWave in [True, False]:
+            check(isPWave)
+            for depth in [-1.0, 6372.0, float("nan")]:
+                self.assertRaises(SlownessModelError, sMod.layerNumberAbove,
+                                  depth, isPWave)
+                self.assertRaises(SlownessModelError, sMod.layerNumbersBelow,
+                                  [0.0, depth], isPWave)
+        # The lookups follow the layers when they are split.
+        numLayers = len(sMod.SLayers)
+        layer = sMod.SLayers[100]
+        sMod.addSlowness((layer.topP + layer.botP) / 2, False)
+        self.assertGreater(len(sMod.SLayers), numLayers)
+        check(False)
+        check(True)
+
 if __name__ == '__main__':
     unittest.main(buffer=True)
@@ -106,3 +106,53 @@ def test_ak135():
                                   phase_list=["ttall"])
     _compare_arrivals_with_file(
         arrivals, "taup_time_-h_10_-ph_ttall_-deg_35_-mod_ak135")
+
+
+def test_swap_model():
+    """
+    Swapping the model drops the cached depth corrections of the old model
+    only.
+    """
+    model = tau.TauPyModel("iasp91", cache=False)
+    other = tau.TauPyModel("ak135", cache=False)
+    before = model.get_travel_times(100, 50, ["P"])[0].time
+    other.get_travel_times(100, 50, ["P"])
+    old = model.model
+    depthCorrected = old.depthCorrect(100)
+    assert depthCorrected.phaseCache
+    assert old.depthCorrect(100) is depthCorrected
+
+    assert model.swap_model() is old
+    assert model.model is not old
+    assert len(old.depthCache) == 0
+    assert len(model.model.depthCache) == 0
+    assert len(other.model.depthCache) == 1
+    assert model.get_travel_times(100, 50, ["P"])[0].time == before
+
+    model.swap_model("ak135")
+    assert model.model_name == "ak135"
+    assert model.model.sMod.vMod.modelName == "ak135"
+
+
+def test_swap_pooled_model():
+    """
+    Swapping the model of one instance leaves the pooled model and its
+    cached depth corrections to the other instances using it.
+    """
+    model = tau.TauPyModel("iasp91")
+    other = tau.TauPyModel("iasp91")
+    assert other.model is model.model
+    before = other.get_travel_times(123, 50, ["P"])[0].time
+    depthCorrected = other.model.depthCorrect(123)
+    assert depthCorrected.phaseCache
+
+    old = model.swap_model()
+    assert model.model is not old
+    assert other.model is old
+    assert old.depthCorrect(123) is depthCorrected
+    assert other.get_travel_times(123, 50, ["P"])[0].time == before
+
+    # Neither are models passed in.
+    model.swap_model(old)
+    model.swap_model("ak135")
+    assert old.depthCorrect(123) is depthCorrected
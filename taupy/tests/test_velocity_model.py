@@ -6,8 +6,11 @@ from future.builtins import *
 
 import inspect
 import os
+import shutil
+import tempfile
 import unittest
 
+from taupy.header import TauPException
 from taupy.VelocityModel import VelocityModel
 
 # to get ./data:
@@ -65,6 +68,127 @@ class TestVelocityModel(unittest.TestCase):
             # from IPython.core.debugger import Tracer; Tracer(
             # colors="Linux")()
 
+    def test_read_tvel_file_names(self):
+        """
+        Named discontinuities are only for nd files.
+        """
+        with open(os.path.join(data_dir, "iasp91.tvel")) as f:
+            lines = f.read().splitlines()
+        tempdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tempdir, "model.tvel")
+            with open(filename, "w") as f:
+                f.write("\n".join(lines[:6] + ["mantle"] + lines[6:]))
+            with self.assertRaisesRegex(TauPException, "mantle"):
+                VelocityModel.readTVelFile(filename)
+        finally:
+            shutil.rmtree(tempdir)
+
+    def test_read_nd_file(self):
+        tvel = VelocityModel.readVelocityFile(os.path.join(data_dir,
+                                                           "iasp91.tvel"))
+        nd = VelocityModel.readVelocityFile(os.path.join(data_dir,
+                                                         "iasp91.nd"))
+        self.assertEqual(nd.modelName, "iasp91")
+        self.assertEqual(nd.radiusOfEarth, 6371.0)
+        self.assertEqual((nd.mohoDepth, nd.cmbDepth, nd.iocbDepth),
+                         (35.0, 2889.0, 5153.9))
+        self.assertEqual([layer.__dict__ for layer in nd.layers],
+                         [layer.__dict__ for layer in tvel.layers])
+        self.assertEqual(nd.validate(), True)
+
+    def test_read_nd_file_names(self):
+        with open(os.path.join(data_dir, "iasp91.nd")) as f:
+            lines = f.read().splitlines()
+        tempdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tempdir, "model.nd")
+
+            def read(lines):
+                with open(filename, "w") as f:
+                    f.write("\n".join(lines))
+                return VelocityModel.readVelocityFile(filename)
+
+            # Named discontinuities are used as they are, the others are
+            # found as for tvel files.
+            vMod = read([l.replace("mantle", "moho  # comment")
+                         .replace("outer-core", "") for l in lines])
+            self.assertEqual((vMod.mohoDepth, vMod.cmbDepth),
+                             (35.0, 2889.0))
+            vMod = read([l.replace("mantle", "") for l in lines[:10]] +
+                        ["mantle"] + lines[10:])
+            self.assertEqual(vMod.mohoDepth, 210.0)
+            # With Qp and Qs.
+            vMod = read([l if l[:1].isalpha() else l + " 1500 600"
+                         for l in lines])
+            self.assertEqual(vMod.layers[10].topQp, 1500.0)
+            self.assertEqual(vMod.layers[10].botQs, 600.0)
+            for bad in [["unknown"] + lines, lines[:3] + [lines[3] + " 1"],
+                        ["mantle 1"] + lines, lines[:3] + ["1 a b c"],
+                        # S faster than P, depth decreasing.
+                        lines[:3] + ["30.0 3.0 4.0 2.9"],
+                        lines[:3] + ["10.0 6.5 3.75 2.92"],
+                        # Names of depths that aren't discontinuities, within
+                        # a gradient and after the last line.
+                        [l.replace("mantle", "") for l in lines[:7]] +
+                        ["mantle"] + lines[7:],
+                        lines[:1] + ["mantle"] + lines[1:4] + lines[5:],
+                        lines + ["iocb"],
+                        # Not numbers, which aren't names either.
+                        lines[:3] + ["30.0 nan 3.75 2.92"],
+                        lines[:3] + ["30.0 6.5 Infinity 2.92"]]:
+                self.assertRaises(TauPException, read, bad)
+            for bad in ["nan", "inf", "Infinity"]:
+                with self.assertRaisesRegex(TauPException, "Invalid number"):
+                    read(lines[:3] + ["30.0 6.5 3.75 " + bad] + lines[3:])
+        finally:
+            shutil.rmtree(tempdir)
+
+    def test_evaluate(self):
+        """
+        The bisected layers and the vectorized evaluation agree with a scan
+        of the layers and VelocityLayer.evaluateAt.
+        """
+        vMod = VelocityModel.readVelocityFile(
+            os.path.join(data_dir, "iasp91.tvel"))
+        depths = [layer.topDepth for layer in vMod.layers] + \
+            [0.5, 17.0, 1234.5, 6370.9, vMod.layers[-1].botDepth]
+        for depth in depths:
+            for above in [True, False]:
+                matches = [i for i, l in enumerate(vMod.layers)
+                           if (l.topDepth < depth <= l.botDepth if above
+                               else l.topDepth <= depth < l.botDepth)]
+                if not matches:
+                    func = (vMod.layerNumberAbove if above
+                            else vMod.layerNumberBelow)
+                    self.assertRaises(TauPException, func, depth)
+                    continue
+                if above:
+                    self.assertEqual(vMod.layerNumberAbove(depth), matches[0])
+                    values = vMod.evaluate_above([depth] * 2, "s")
+                else:
+                    self.assertEqual(vMod.layerNumberBelow(depth), matches[0])
+                    values = vMod.evaluate_below([depth] * 2, "s")
+                self.assertEqual(values.tolist(), [
+                    vMod.layers[matches[0]].evaluateAt(depth, "s")] * 2)
+        self.assertRaises(TauPException, vMod.evaluate_above, [0.0], "p")
+        self.assertRaises(TauPException, vMod.evaluate_below, [1e4], "p")
+        self.assertRaises(TauPException, vMod.evaluate_below, [10.0], "x")
+        self.assertRaises(TauPException, vMod.evaluate_below, [10.0], "rd")
+        self.assertEqual(vMod.evaluate_below([10.0], "r").tolist(),
+                         vMod.evaluate_below([10.0], "d").tolist())
+        # Changed layers are found, the arrays need clearCache.
+        layer = vMod.layers.pop(0)
+        vMod.layers[0].topDepth = 0.0
+        self.assertEqual(vMod.layerNumberBelow(5.0), 0)
+        vMod.layers.insert(0, layer)
+        vMod.layers[1].topDepth = layer.botDepth
+        self.assertEqual(vMod.layerNumberBelow(25.0), 1)
+        vMod.evaluate_below([0.0], "p")
+        vMod.layers[0].topPVelocity = 1.0
+        vMod.clearCache()
+        self.assertEqual(vMod.evaluate_below([0.0], "p")[0], 1.0)
+
 
 if __name__ == '__main__':
     unittest.main()
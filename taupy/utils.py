@@ -23,3 +23,22 @@ def _get_model_filename(model_name):
         model_dir, model_name +
         ("__py%i%i__tvel" % sys.version_info[:2]) + os.path.extsep + "pickle")
     return filename
+
+
+def _get_array_model_filename(model_name):
+    """
+    Filename of the version independent array model, see
+    taupy.model_arrays.
+    """
+    model_dir = os.path.join(ROOT, "data", "models")
+    model_name = os.path.splitext(os.path.basename(model_name))[0]
+    return os.path.join(model_dir, model_name + os.path.extsep + "taupy")
+
+
+def _get_bundle_filename():
+    """
+    Filename of the bundle with the internal models, see
+    taupy.model_bundle.
+    """
+    return os.path.join(ROOT, "data", "models", "models" + os.path.extsep +
+                        "taupyb")